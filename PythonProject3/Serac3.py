@@ -1,17 +1,16 @@
 from opcua import Client, ua
-import psycopg2
+from database_manager import conectar_banco, criar_tabelas, inserir_dados_iniciais
 from datetime import datetime
 import time
+from escritor_lote import EscritorLote
 
-conn = psycopg2.connect(
-    dbname="new_bd",
-    user="postgres",
-    password=" ",
-    host="localhost",
-    port="5432"
-)
+conn = conectar_banco()
 cursor = conn.cursor()
 
+# Criar tabelas automaticamente
+criar_tabelas(conn)
+inserir_dados_iniciais(conn)
+
 client = Client("opc.tcp://127.0.0.1:49320")
 
 try:
@@ -39,6 +38,8 @@ try:
     linha_name = "Serac3"
     maquina_name = "Palletizer"
 
+    escritor = EscritorLote(conn)
+
     while True:
         for var_node in maquina_node.get_children():
             try:
@@ -49,25 +50,27 @@ try:
                 if funcao.startswith("_"):
                     continue
 
-                valor = str(var_node.get_value())
+                valor = var_node.get_value()
                 qualidade = var_node.get_data_value().StatusCode.name
                 timestamp = datetime.now()
 
-                cursor.execute("""
-                    INSERT INTO dados_opcua (timestamp, linha, maquina, funcao, dado, qualidade)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                """, (timestamp, linha_name, maquina_name, funcao, valor, qualidade))
-                conn.commit()
+                escritor.adicionar(timestamp, linha_name, maquina_name, funcao, valor, qualidade)
 
             except Exception as e:
                 print(f"Erro ao ler/salvar: {e}")
-                conn.rollback()
+
+        try:
+            escritor.flush()
+        except Exception as e:
+            print(f"Erro ao gravar lote: {e}")
         time.sleep(2)
 
 except KeyboardInterrupt:
     print("Interrompido pelo usuário.")
 
 finally:
+    if 'escritor' in locals():
+        escritor.fechar()
     client.disconnect()
     cursor.close()
     conn.close()
@@ -1,139 +1,112 @@
-from opcua import Client, ua
-import psycopg2
-from datetime import datetime
+import database_manager
 import time
 import sys
+import contextlib
+import argparse
+from escritor_lote import EscritorLote, leitura_ruim, marcas_de_tempo, tipo_variante
+from assinatura_opcua import ManipuladorAssinatura, criar_assinatura
+from registro_tags import RegistroTags
+from filtro_excecao import FiltroExcecao
+from buffer_local import BufferLocal, DrenadorBuffer
+from fila_leituras import FilaLeituras, POLITICAS
+from agendador import Agendador, CLASSE_PADRAO
+from taxa_adaptativa import TaxaAdaptativa
+from metricas import iniciar_metricas, encerrar_metricas
+from supervisor import PoolBanco, SessaoOPCUA, Vigia, falha_de_conexao
+from snapshot_tags import SnapshotTags
 
 def conectar_banco():
     """Conecta ao banco de dados"""
     try:
-        conn = psycopg2.connect(
-            dbname="new_bd1",
-            user="postgres",
-            password="postgres",
-            host="localhost",
-            port="5432"
-        )
-        cursor = conn.cursor()
+        conn = database_manager.conectar_banco()
         
         # Criar tabelas automaticamente
         print("🔧 Criando tabelas...")
-        
-        # Criar tabela linhas_producao
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS linhas_producao (
-                id SERIAL PRIMARY KEY,
-                nome VARCHAR(100) NOT NULL UNIQUE
-            )
-        """)
-        
-        # Criar tabela maquinas
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS maquinas (
-                id SERIAL PRIMARY KEY,
-                nome VARCHAR(100) NOT NULL UNIQUE,
-                contador_produtos_ruins INTEGER DEFAULT 0,
-                linha_producao_id INTEGER REFERENCES linhas_producao(id)
-            )
-        """)
-        
-        # Criar tabela dados_opcua
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS dados_opcua (
-                id SERIAL PRIMARY KEY,
-                timestamp TIMESTAMP NOT NULL,
-                linha VARCHAR(100) NOT NULL,
-                maquina VARCHAR(100) NOT NULL,
-                funcao VARCHAR(100) NOT NULL,
-                dado TEXT NOT NULL,
-                qualidade VARCHAR(50) NOT NULL
-            )
-        """)
+        if not database_manager.criar_tabelas(conn):
+            conn.close()
+            return None, None
         
         # Inserir dados iniciais
-        cursor.execute("""
-            INSERT INTO linhas_producao (nome) 
-            VALUES ('Serac4') 
-            ON CONFLICT (nome) DO NOTHING
-        """)
-        
-        cursor.execute("SELECT id FROM linhas_producao WHERE nome = 'Serac4'")
-        linha_id = cursor.fetchone()[0]
-        
-        cursor.execute("""
-            INSERT INTO maquinas (nome, linha_producao_id) 
-            VALUES ('Palletizer', %s) 
-            ON CONFLICT (nome) DO NOTHING
-        """, (linha_id,))
-        
-        conn.commit()
+        database_manager.inserir_dados_iniciais(conn)
+        
         print("✅ Tabelas criadas/atualizadas com sucesso!")
         
-        return conn, cursor
+        return conn, conn.cursor()
         
     except Exception as e:
         print(f"❌ Erro ao conectar ao banco: {e}")
         return None, None
 
-def conectar_kepserver():
-    """Conecta ao KepServer"""
+ENDERECO_KEPSERVER = "opc.tcp://127.0.0.1:49320"
+
+# Intervalo entre as verificações da sessão no modo assinatura
+INTERVALO_VERIFICACAO_S = 2
+
+def conectar_kepserver(prazo_chamada=4):
+    """Conecta ao KepServer (sessão supervisionada: tenta de novo com backoff até conseguir)"""
     try:
         print("🔌 Conectando ao KepServer...")
-        client = Client("opc.tcp://127.0.0.1:49320")
-        client.connect()
+        sessao = SessaoOPCUA(ENDERECO_KEPSERVER, timeout_s=prazo_chamada)
+        sessao.conectar()
         print("✅ Conectado ao KepServer!")
-        return client
-    except Exception as e:
-        print(f"❌ Erro ao conectar ao KepServer: {e}")
+        return sessao
+    except KeyboardInterrupt:
+        print("\n👋 Interrompido pelo usuário.")
         return None
 
-def navegar_estrutura(client):
-    """Navega pela estrutura do KepServer"""
+def navegar_estrutura(client, caminho_snapshot=None):
+    """Navega pela estrutura do KepServer e guarda os nós da Palletizer em cache"""
     try:
         print("🗂️ Navegando pela estrutura...")
         
-        # Procurar Matics
-        matics_node = None
-        for node in client.get_objects_node().get_children():
-            if node.get_display_name().Text == "Matics":
-                matics_node = node
-                break
-        
-        if not matics_node:
-            print("❌ Nó 'Matics' não encontrado!")
-            return None, None, None
+        # Com snapshot, parte dos nós salvos e valida em segundo plano
+        snapshot = SnapshotTags(caminho_snapshot) if caminho_snapshot else None
+        registro = RegistroTags(client, ("Matics", "Serac4", "Palletizer"), snapshot)
+        tags = registro.resolver()
         
-        # Procurar Serac4
-        serac4_node = None
-        for node in matics_node.get_children():
-            if node.get_display_name().Text == "Serac4":
-                serac4_node = node
-                break
-        
-        if not serac4_node:
-            print("❌ Nó 'Serac4' não encontrado!")
-            return None, None, None
-        
-        # Procurar Palletizer
-        palletizer_node = None
-        for node in serac4_node.get_children():
-            if node.get_display_name().Text == "Palletizer":
-                palletizer_node = node
-                break
-        
-        if not palletizer_node:
-            print("❌ Nó 'Palletizer' não encontrado!")
-            return None, None, None
-        
-        print("✅ Estrutura navegada com sucesso!")
-        return matics_node, serac4_node, palletizer_node
+        if registro.origem == "snapshot":
+            print(f"✅ Estrutura carregada do snapshot {caminho_snapshot} ({len(tags)} variáveis, validando...)")
+        else:
+            print(f"✅ Estrutura navegada com sucesso! ({len(tags)} variáveis)")
+        return registro
         
     except Exception as e:
         print(f"❌ Erro ao navegar pela estrutura: {e}")
-        return None, None, None
+        return None
+
+def iniciar_buffer(escritor, caminho_buffer):
+    """Abre o buffer local e a thread que o drena para o banco (None, None se desativado)"""
+    if not caminho_buffer:
+        return None, None
+    buffer = BufferLocal(caminho_buffer)
+    drenador = DrenadorBuffer(buffer, escritor).iniciar()  # o pool do escritor refaz as conexões
+    print(f"📦 Buffer local ativo: {caminho_buffer}")
+    return buffer, drenador
 
-def fazer_scraping(client, palletizer_node, conn, cursor):
-    """Faz o scraping dos dados"""
+def encerrar_buffer(buffer, drenador):
+    """Envia o que restou do buffer ao banco e fecha o arquivo"""
+    if buffer:
+        drenador.parar()
+        buffer.fechar()
+        print(f"📦 Buffer local: {buffer.resumo()}")
+
+def iniciar_fila(saida, config_fila):
+    """Coloca a fila leitura → gravação na frente da saída (None se desativada)"""
+    if not config_fila:
+        return None
+    fila = FilaLeituras(saida, **config_fila).iniciar()
+    print(f"📥 Fila de leituras ativa: capacidade {fila.capacidade}, política {fila.politica}")
+    return fila
+
+def vigiar(vigia, registro, sessao, prazo_s):
+    """Contexto de uma chamada ao servidor: passando de prazo_s, o vigia aborta a sessão (sem vigia, nada)"""
+    if not vigia:
+        return contextlib.nullcontext()
+    return vigia.vigiar(registro.nome, prazo_s, sessao.abortar)
+
+def fazer_scraping(sessao, registro, pool, config_filtro=None, caminho_buffer=None, config_fila=None,
+                   periodo=2, config_adaptativo=None, vigia=None, prazo_ciclo=10):
+    """Faz o scraping dos dados (reconectando a sessão OPC UA sozinho se ela cair ou travar)"""
     try:
         print("🔄 Iniciando scraping...")
         print("   Pressione Ctrl+C para parar")
@@ -141,43 +114,100 @@ def fazer_scraping(client, palletizer_node, conn, cursor):
         
         leituras = 0
         erros = 0
+        escritor = EscritorLote(pool=pool)
+        # Com o buffer local, a aquisição grava em disco e o drenador envia ao banco
+        buffer, drenador = iniciar_buffer(escritor, caminho_buffer)
+        saida = buffer or escritor
+        # Com a fila, o loop de leitura só enfileira e uma thread separada grava
+        fila = iniciar_fila(saida, config_fila)
+        entrada = fila or saida
+        filtro = FiltroExcecao(entrada, **config_filtro) if config_filtro else None
+        destino = filtro or entrada
+        
+        # Depois de uma reconexão: nós refeitos na nova sessão e filtro sem os últimos valores
+        # (o que mudou enquanto a sessão estava fora é gravado na primeira leitura)
+        sessao.ao_reconectar.append(registro.reconectar)
+        if filtro:
+            sessao.ao_reconectar.append(lambda client: filtro.esquecer())
+        motivo_reconexao = None
+        
+        # Polling adaptativo: cada tag no período que sua frequência de mudança pede;
+        # o agendador passa a rodar no período mínimo e só lê as tags vencidas
+        taxa = TaxaAdaptativa(registro.tags, **config_adaptativo) if config_adaptativo else None
+        tags_taxa = registro.tags
+        if taxa:
+            periodo = taxa.periodo_min_s
+        
+        # Ciclos em taxa fixa na grade do relógio monotônico (sem acumular o tempo de leitura)
+        agendador = Agendador({CLASSE_PADRAO: periodo})
+        agendador.aguardar()
         
         while True:
             try:
-                for node in palletizer_node.get_children():
+                if motivo_reconexao:
+                    with vigiar(vigia, registro, sessao, prazo_ciclo):
+                        sessao.reconectar(motivo_reconexao)
+                    motivo_reconexao = None
+                
+                # A validação do snapshot (ou uma reconexão) pode ter trocado as tags: o polling adaptativo recomeça com elas
+                if taxa and registro.tags is not tags_taxa:
+                    tags_taxa = registro.tags
+                    taxa = TaxaAdaptativa(tags_taxa, **config_adaptativo)
+                
+                # Metadados vêm do cache; os valores chegam em uma única requisição Read (com prazo)
+                with vigiar(vigia, registro, sessao, prazo_ciclo):
+                    valores = registro.ler_valores(taxa.devidas() if taxa else None)
+                for tag, data_value in valores:
+                    display_name = tag.nome
                     try:
-                        if node.get_node_class() != ua.NodeClass.Variable:
-                            continue
+                        if leitura_ruim(data_value):
+                            raise ValueError(f"status {data_value.StatusCode.name}")
+                        value = data_value.Value.Value
+                        quality = data_value.StatusCode.name
+                        # Hora da coleta; SourceTimestamp/ServerTimestamp vão em colunas próprias
+                        timestamp, origem, servidor = marcas_de_tempo(data_value)
                         
-                        display_name = node.get_display_name().Text
-                        if display_name.startswith("_"):
-                            continue
-                        
-                        value = str(node.get_value())
-                        quality = node.get_data_value().StatusCode.name
-                        timestamp = datetime.now()
-                        
-                        # Salvar no banco
-                        cursor.execute("""
-                            INSERT INTO dados_opcua (timestamp, linha, maquina, funcao, dado, qualidade)
-                            VALUES (%s, %s, %s, %s, %s, %s)
-                        """, (timestamp, "Serac4", "Palletizer", display_name, value, quality))
-                        
-                        conn.commit()
+                        # Acumular no lote do ciclo (passando pelo filtro por exceção, se ativo)
+                        destino.adicionar(timestamp, registro.linha, registro.maquina, display_name, value, quality,
+                                          origem, servidor, tipo_variante(data_value))
                         leituras += 1
+                        if taxa:
+                            taxa.registrar(tag, value)
                         
                         print(f"✅ {timestamp.strftime('%H:%M:%S')} - {display_name} = {value}")
                         
                     except Exception as e:
                         erros += 1
                         print(f"❌ Erro ao ler/salvar {display_name}: {e}")
-                        conn.rollback()
                 
-                time.sleep(2)  # Pausa de 2 segundos
+                # Gravar o ciclo inteiro em uma única transação (no buffer local ou no banco)
+                try:
+                    entrada.flush()
+                except Exception as e:
+                    erros += 1
+                    print(f"❌ Erro ao gravar lote: {e}")
+                
+                # Aguardar o próximo ponto da grade; ciclo mais longo que o período é overrun
+                overruns = agendador.overruns[CLASSE_PADRAO]
+                agendador.concluir(CLASSE_PADRAO)
+                if agendador.overruns[CLASSE_PADRAO] > overruns:
+                    print(f"⏱️ Ciclo passou do período de {periodo} s "
+                          f"({agendador.perdidos[CLASSE_PADRAO]} ciclos perdidos até agora)")
+                agendador.aguardar()
                 
                 # Mostrar estatísticas a cada 10 leituras
                 if leituras % 10 == 0:
                     print(f"\n📊 Estatísticas: {leituras} leituras, {erros} erros")
+                    if filtro:
+                        print(f"   🔍 Filtro: {filtro.resumo()}")
+                    if fila:
+                        print(f"   📥 Fila: {fila.resumo()}")
+                    if buffer:
+                        print(f"   📦 Buffer: {buffer.resumo()}")
+                    print(f"   💾 Gravação: {escritor.resumo()}")
+                    print(f"   ⏱️ Agendador: {agendador.resumo()}")
+                    if taxa:
+                        print(f"   📶 Polling adaptativo: {taxa.resumo()}")
                 
             except KeyboardInterrupt:
                 print("\n👋 Interrompido pelo usuário.")
@@ -185,40 +215,250 @@ def fazer_scraping(client, palletizer_node, conn, cursor):
             except Exception as e:
                 erros += 1
                 print(f"❌ Erro geral: {e}")
-                time.sleep(5)  # Pausa antes de tentar novamente
+                if falha_de_conexao(e) or not sessao.verificar():
+                    # Sessão perdida: em vez de insistir nela, reconecta no início do próximo ciclo
+                    motivo_reconexao = str(e) or type(e).__name__
+                else:
+                    time.sleep(5)  # Pausa antes de tentar novamente
         
+        if fila:
+            fila.fechar()
+        encerrar_buffer(buffer, drenador)
+        escritor.fechar()
+        print(f"💾 Gravação: {escritor.resumo()}")
+        print(f"🔌 Sessão: {sessao.resumo()}")
         return leituras, erros
         
     except Exception as e:
         print(f"❌ Erro no scraping: {e}")
         return 0, 0
 
+def executar_assinatura(sessao, registro, pool, intervalo_amostragem=500, tamanho_fila=10, config_filtro=None,
+                        caminho_buffer=None, config_fila=None, vigia=None, prazo_ciclo=10):
+    """Coleta os dados por assinatura (notificação de mudança) em vez de polling
+
+    A sessão é verificada a cada INTERVALO_VERIFICACAO_S; se cair, é refeita e a assinatura recriada.
+    """
+    try:
+        print("🔔 Iniciando modo assinatura...")
+        print(f"   Amostragem: {intervalo_amostragem} ms, fila: {tamanho_fila}")
+        print("   Pressione Ctrl+C para parar")
+        print("=" * 50)
+        
+        escritor = EscritorLote(pool=pool)
+        buffer, drenador = iniciar_buffer(escritor, caminho_buffer)
+        if not buffer:
+            escritor.iniciar_flush_periodico()
+        saida = buffer or escritor
+        # A thread de notificações do OPC UA só enfileira; a gravação fica com a fila
+        fila = iniciar_fila(saida, config_fila)
+        entrada = fila or saida
+        filtro = FiltroExcecao(entrada, **config_filtro) if config_filtro else None
+        
+        manipulador = ManipuladorAssinatura(filtro or entrada, registro.linha, registro.maquina,
+                                            registro.nomes_por_nodeid())
+        assinatura = None
+        
+        def assinar(client):
+            """Cria a assinatura na sessão atual (a de uma sessão perdida morre com ela)"""
+            nonlocal assinatura
+            manipulador.nomes = registro.nomes_por_nodeid()
+            assinatura, monitorados = criar_assinatura(client, registro.tags, manipulador,
+                                                       intervalo_amostragem, tamanho_fila)
+            print(f"✅ {monitorados} variáveis monitoradas")
+        
+        assinar(sessao.client)
+        # Depois de uma reconexão: nós refeitos, filtro sem os últimos valores e assinatura recriada
+        sessao.ao_reconectar.append(registro.reconectar)
+        if filtro:
+            sessao.ao_reconectar.append(lambda client: filtro.esquecer())
+        sessao.ao_reconectar.append(assinar)
+        motivo_reconexao = None
+        verificacoes = 0
+        
+        try:
+            while True:
+                time.sleep(INTERVALO_VERIFICACAO_S)
+                if motivo_reconexao or not sessao.verificar():
+                    try:
+                        with vigiar(vigia, registro, sessao, prazo_ciclo):
+                            sessao.reconectar(motivo_reconexao or "servidor não respondeu")
+                        motivo_reconexao = None
+                    except Exception as e:
+                        motivo_reconexao = f"recuperação anterior falhou: {e}"
+                        print(f"❌ Erro ao recuperar a sessão: {e}")
+                verificacoes += 1
+                if verificacoes % 5:
+                    continue
+                print(f"\n📊 Estatísticas: {manipulador.notificacoes} notificações, {manipulador.erros} erros")
+                if filtro:
+                    print(f"   🔍 Filtro: {filtro.resumo()}")
+                if fila:
+                    print(f"   📥 Fila: {fila.resumo()}")
+                if buffer:
+                    print(f"   📦 Buffer: {buffer.resumo()}")
+                print(f"   💾 Gravação: {escritor.resumo()}")
+        except KeyboardInterrupt:
+            print("\n👋 Interrompido pelo usuário.")
+        finally:
+            try:
+                assinatura.delete()
+            except Exception:
+                pass
+            if fila:
+                fila.fechar()
+            encerrar_buffer(buffer, drenador)
+            escritor.fechar()
+            print(f"💾 Gravação: {escritor.resumo()}")
+            print(f"🔌 Sessão: {sessao.resumo()}")
+        
+        return manipulador.notificacoes, manipulador.erros
+        
+    except Exception as e:
+        print(f"❌ Erro na assinatura: {e}")
+        return 0, 0
+
+def ler_argumentos():
+    """Lê os argumentos de linha de comando"""
+    parser = argparse.ArgumentParser(description="Coleta OPC UA da Serac4/Palletizer para o PostgreSQL")
+    parser.add_argument("--modo", choices=["polling", "assinatura"], default="polling",
+                        help="polling (leitura a cada --periodo s) ou assinatura (notificação de mudança)")
+    parser.add_argument("--periodo", type=float, default=2,
+                        help="período de varredura em segundos (modo polling, taxa fixa sem deriva)")
+    parser.add_argument("--adaptativo", action="store_true",
+                        help="ajusta o período de cada tag pela frequência de mudança (entre --periodo-min e --periodo-max)")
+    parser.add_argument("--periodo-min", type=float, default=0.5,
+                        help="menor período por tag em segundos (com --adaptativo)")
+    parser.add_argument("--periodo-max", type=float, default=30,
+                        help="maior período por tag em segundos (com --adaptativo)")
+    parser.add_argument("--orcamento", type=float, default=None,
+                        help="máximo de leituras/s somando todas as tags (com --adaptativo)")
+    parser.add_argument("--amostragem", type=float, default=500,
+                        help="intervalo de amostragem no servidor em ms (modo assinatura)")
+    parser.add_argument("--fila", type=int, default=10,
+                        help="tamanho da fila de cada item monitorado (modo assinatura)")
+    parser.add_argument("--motor", choices=["sync", "async"], default="sync",
+                        help="sync (opcua + psycopg2) ou async (asyncua + asyncpg em um único event loop; "
+                             "não usa --adaptativo: um único --periodo por máquina)")
+    parser.add_argument("--filtro", action="store_true",
+                        help="grava só por exceção (banda morta / mudança de valor / heartbeat)")
+    parser.add_argument("--deadband", type=float, default=None,
+                        help="banda morta absoluta para variáveis numéricas (com --filtro)")
+    parser.add_argument("--deadband-pct", type=float, default=None,
+                        help="banda morta percentual para variáveis numéricas (com --filtro)")
+    parser.add_argument("--heartbeat", type=float, default=60,
+                        help="grava mesmo sem mudança após N segundos de silêncio (com --filtro)")
+    parser.add_argument("--buffer", default="buffer_opcua.db",
+                        help="arquivo do buffer local que guarda as leituras enquanto o banco estiver fora")
+    parser.add_argument("--sem-buffer", action="store_true",
+                        help="grava direto no banco, sem o buffer local")
+    parser.add_argument("--capacidade-fila", type=int, default=0,
+                        help="separa leitura e gravação em threads com uma fila de N leituras (0 desativa)")
+    parser.add_argument("--politica-fila", choices=POLITICAS, default="bloquear",
+                        help="o que fazer com a fila cheia: bloquear a leitura, descartar as antigas ou ir para o disco")
+    parser.add_argument("--snapshot", default="snapshot_opcua.json",
+                        help="arquivo com os nós resolvidos; a partida usa o arquivo e valida em segundo plano")
+    parser.add_argument("--sem-snapshot", action="store_true",
+                        help="sempre navega na partida, sem usar nem gravar o snapshot")
+    parser.add_argument("--prazo-chamada", type=float, default=4,
+                        help="prazo em segundos de cada requisição ao servidor OPC UA (Read, Browse...)")
+    parser.add_argument("--prazo-ciclo", type=float, default=10,
+                        help="leitura ou navegação parada por mais que isso é abortada e a sessão refeita (0 desativa)")
+    parser.add_argument("--metricas-porta", type=int, default=9108,
+                        help="porta local do endpoint Prometheus /metrics (0 desativa)")
+    parser.add_argument("--metricas-json", default="metricas_opcua.json",
+                        help="arquivo onde os histogramas são salvos ao encerrar (vazio desativa)")
+    return parser.parse_args()
+
+def config_adaptativo(args):
+    """Monta a configuração do polling adaptativo a partir dos argumentos"""
+    if not args.adaptativo:
+        return None
+    return {"periodo_min_s": args.periodo_min, "periodo_max_s": args.periodo_max,
+            "orcamento_leituras_s": args.orcamento, "periodo_inicial_s": args.periodo}
+
+def config_fila(args):
+    """Monta a configuração da fila leitura → gravação a partir dos argumentos"""
+    if args.capacidade_fila <= 0:
+        return None
+    return {"capacidade": args.capacidade_fila, "politica": args.politica_fila}
+
+def config_filtro(args):
+    """Monta a configuração do filtro por exceção a partir dos argumentos"""
+    if not args.filtro:
+        return None
+    return {"deadband_abs": args.deadband, "deadband_pct": args.deadband_pct, "heartbeat_s": args.heartbeat}
+
 def main():
     """Função principal"""
+    args = ler_argumentos()
+    
     print("🚀 INICIANDO SCRAPING OPC UA")
     print("=" * 50)
     
+    # Histogramas de navegação, leitura, lote, flush, commit, fila e ciclo
+    iniciar_metricas(args.metricas_porta)
+    
     # Conectar ao banco
     conn, cursor = conectar_banco()
     if not conn or not cursor:
         print("❌ Falha ao conectar ao banco. Saindo...")
         return
     
+    # As tabelas já foram criadas acima; a gravação usa um pool (conexões verificadas e refeitas sozinhas)
+    cursor.close()
+    conn.close()
+    
+    # Criar partições futuras e aplicar a retenção periodicamente (nos dois motores)
+    parar_manutencao = database_manager.iniciar_manutencao_periodica()
+    
+    if args.motor == "async":
+        # O motor assíncrono usa seu próprio pool
+        from motor_async import executar_motor_async
+        if args.adaptativo:
+            print("⚠️ --adaptativo não se aplica ao motor async: todas as tags no --periodo")
+        try:
+            executar_motor_async(ENDERECO_KEPSERVER, [("Matics", "Serac4", "Palletizer")],
+                                 modo=args.modo, intervalo=args.periodo, intervalo_amostragem=args.amostragem,
+                                 tamanho_fila=args.fila, config_filtro=config_filtro(args),
+                                 prazo_s=args.prazo_ciclo or None, prazo_chamada=args.prazo_chamada,
+                                 caminho_buffer=None if args.sem_buffer else args.buffer)
+        finally:
+            parar_manutencao.set()
+        encerrar_metricas(args.metricas_json)
+        print("👋 Programa finalizado.")
+        return
+    
     # Conectar ao KepServer
-    client = conectar_kepserver()
-    if not client:
+    sessao = conectar_kepserver(args.prazo_chamada)
+    if not sessao:
+        parar_manutencao.set()
         print("❌ Falha ao conectar ao KepServer. Saindo...")
         return
+    pool = None
+    # Vigia das chamadas ao servidor: uma leitura travada é abortada em vez de parar a coleta
+    vigia = Vigia().iniciar() if args.prazo_ciclo > 0 else None
     
     try:
+        pool = PoolBanco()
+        
         # Navegar pela estrutura
-        matics_node, serac4_node, palletizer_node = navegar_estrutura(client)
-        if not palletizer_node:
+        with vigia.vigiar("navegação", args.prazo_ciclo, sessao.abortar) if vigia else contextlib.nullcontext():
+            registro = navegar_estrutura(sessao.client, None if args.sem_snapshot else args.snapshot)
+        if not registro:
             print("❌ Falha ao navegar pela estrutura. Saindo...")
             return
         
         # Fazer scraping
-        leituras, erros = fazer_scraping(client, palletizer_node, conn, cursor)
+        caminho_buffer = None if args.sem_buffer else args.buffer
+        if args.modo == "assinatura":
+            leituras, erros = executar_assinatura(sessao, registro, pool,
+                                                  args.amostragem, args.fila, config_filtro(args), caminho_buffer,
+                                                  config_fila(args), vigia, args.prazo_ciclo)
+        else:
+            leituras, erros = fazer_scraping(sessao, registro, pool, config_filtro(args), caminho_buffer,
+                                             config_fila(args), args.periodo, config_adaptativo(args),
+                                             vigia, args.prazo_ciclo)
         
         print(f"\n📈 RESUMO FINAL:")
         print(f"   Leituras realizadas: {leituras}")
@@ -229,19 +469,20 @@ def main():
     
     finally:
         # Fechar conexões
-        try:
-            client.disconnect()
-            print("✅ Desconectado do KepServer")
-        except:
-            pass
+        parar_manutencao.set()
+        if vigia:
+            vigia.parar()
+            if vigia.travamentos:
+                print(f"⛔ Chamadas travadas abortadas: {vigia.travamentos}")
+        sessao.desconectar()
+        print("✅ Desconectado do KepServer")
         
-        try:
-            cursor.close()
-            conn.close()
+        if pool:
+            print(f"🔌 Pool do banco: {pool.resumo()}")
+            pool.fechar()
             print("✅ Desconectado do PostgreSQL")
-        except:
-            pass
         
+        encerrar_metricas(args.metricas_json)
         print("👋 Programa finalizado.")
 
 if __name__ == "__main__":
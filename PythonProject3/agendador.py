@@ -0,0 +1,148 @@
+import asyncio
+import fnmatch
+import heapq
+import time
+from metricas import METRICAS
+
+
+CLASSE_PADRAO = "padrao"
+
+
+def agrupar_por_classe(tags, classes, prefixo=""):
+    """Separa as tags em classes de varredura pelo nome (a primeira classe que casar vence)
+
+    classes: [{"nome": "rapida", "periodo_s": 0.1, "padroes": ["*Contador*"]}, ...]
+    Os padrões casam com o nome da tag ou com "linha/maquina/nome" (prefixo).
+    Tags que não casam com nenhuma classe ficam em CLASSE_PADRAO.
+    """
+    grupos = {}
+    for tag in tags:
+        nome = getattr(tag, "nome", tag)
+        classe = CLASSE_PADRAO
+        for definicao in classes:
+            if any(fnmatch.fnmatchcase(nome, padrao) or fnmatch.fnmatchcase(prefixo + nome, padrao)
+                   for padrao in definicao.get("padroes", [])):
+                classe = definicao["nome"]
+                break
+        grupos.setdefault(classe, []).append(tag)
+    return grupos
+
+
+class Agendador:
+    """Agenda ciclos em taxa fixa sobre uma grade do relógio monotônico, sem deriva
+
+    O ciclo k de uma classe começa em inicio + k * periodo, independente de quanto
+    o ciclo anterior demorou (ao contrário de ler + sleep(periodo), que acumula atraso).
+    Se um ciclo passa do período, conta um overrun e pula para o próximo ponto da grade.
+    """
+
+    def __init__(self, periodos, inicio=None):
+        # periodos: {"classe": periodo_s}
+        self.periodos = dict(periodos)
+        self._inicio = time.monotonic() if inicio is None else inicio
+        self._fila = [(self._inicio, nome) for nome in self.periodos]  # (próximo instante, classe)
+        heapq.heapify(self._fila)
+        self._previsto = {}  # classe -> instante previsto do ciclo em andamento
+
+        # Estatísticas por classe
+        self.ciclos = {nome: 0 for nome in self.periodos}
+        self.overruns = {nome: 0 for nome in self.periodos}
+        self.perdidos = {nome: 0 for nome in self.periodos}
+        self.atraso_inicio_max_ms = {nome: 0.0 for nome in self.periodos}
+        self.duracao_max_ms = {nome: 0.0 for nome in self.periodos}
+
+    def aguardar(self, parar=None):
+        """Espera o próximo ciclo devido e retorna o nome da classe (None se parar for setado)"""
+        previsto, nome = heapq.heappop(self._fila)
+        espera = previsto - time.monotonic()
+        if espera > 0:
+            if parar is not None:
+                if parar.wait(espera):
+                    heapq.heappush(self._fila, (previsto, nome))
+                    return None
+            else:
+                time.sleep(espera)
+        self._iniciar(previsto, nome)
+        return nome
+
+    async def aguardar_async(self):
+        """Igual a aguardar, para o motor assíncrono: espera com asyncio.sleep (loop.time() é o mesmo relógio monotônico)"""
+        previsto, nome = heapq.heappop(self._fila)
+        espera = previsto - time.monotonic()
+        if espera > 0:
+            try:
+                await asyncio.sleep(espera)
+            except asyncio.CancelledError:
+                heapq.heappush(self._fila, (previsto, nome))
+                raise
+        self._iniciar(previsto, nome)
+        return nome
+
+    def _iniciar(self, previsto, nome):
+        """Marca o início do ciclo previsto para o instante dado"""
+        atraso_ms = max(0.0, (time.monotonic() - previsto) * 1000)
+        self.atraso_inicio_max_ms[nome] = max(self.atraso_inicio_max_ms[nome], atraso_ms)
+        self._previsto[nome] = previsto
+
+    def concluir(self, nome):
+        """Registra o fim do ciclo da classe e agenda o próximo ponto da grade"""
+        previsto = self._previsto.pop(nome)
+        periodo = self.periodos[nome]
+        agora = time.monotonic()
+        self.ciclos[nome] += 1
+        self.duracao_max_ms[nome] = max(self.duracao_max_ms[nome], (agora - previsto) * 1000)
+        METRICAS.observar("ciclo_duracao_segundos", agora - previsto, nome)
+
+        proximo = previsto + periodo
+        if agora > proximo:
+            # Overrun: os pontos da grade que já passaram são pulados, não executados em rajada
+            perdidos = int((agora - proximo) // periodo) + 1
+            self.overruns[nome] += 1
+            METRICAS.observar("ciclo_overrun_segundos", agora - previsto - periodo, nome)
+            self.perdidos[nome] += perdidos
+            proximo += perdidos * periodo
+        heapq.heappush(self._fila, (proximo, nome))
+
+    def estatisticas(self):
+        """Retorna ciclos, overruns e atrasos por classe"""
+        return {
+            nome: {
+                "periodo_s": self.periodos[nome],
+                "ciclos": self.ciclos[nome],
+                "overruns": self.overruns[nome],
+                "ciclos_perdidos": self.perdidos[nome],
+                "atraso_inicio_max_ms": self.atraso_inicio_max_ms[nome],
+                "duracao_max_ms": self.duracao_max_ms[nome],
+            }
+            for nome in self.periodos
+        }
+
+    def resumo(self):
+        """Retorna as estatísticas formatadas para exibição"""
+        partes = []
+        for nome, est in self.estatisticas().items():
+            texto = f"{nome} ({est['periodo_s']:g} s): {est['ciclos']} ciclos"
+            if est["overruns"]:
+                texto += f", {est['overruns']} overruns ({est['ciclos_perdidos']} perdidos)"
+            partes.append(texto)
+        return "; ".join(partes)
+
+
+def executar_agendado(agendador, ciclo, parar, ao_overrun=None):
+    """Loop padrão: aguarda cada ciclo devido, chama ciclo(classe) e conclui
+
+    ao_overrun(classe, duracao_ms) é chamado quando um ciclo passa do período.
+    """
+    while not parar.is_set():
+        nome = agendador.aguardar(parar)
+        if nome is None:
+            break
+        overruns = agendador.overruns[nome]
+        inicio = time.monotonic()
+        try:
+            ciclo(nome)
+        finally:
+            agendador.concluir(nome)
+        if ao_overrun and agendador.overruns[nome] > overruns:
+            ao_overrun(nome, (time.monotonic() - inicio) * 1000)
+
@@ -0,0 +1,84 @@
+from opcua import ua
+from escritor_lote import leitura_ruim, marcas_de_tempo, tipo_variante
+
+
+class ManipuladorAssinatura:
+    """Recebe as notificações de mudança de dado e envia direto para o escritor"""
+
+    def __init__(self, escritor, linha, maquina, nomes):
+        self.escritor = escritor
+        self.linha = linha
+        self.maquina = maquina
+        self.nomes = nomes  # NodeId -> nome da variável
+        self.notificacoes = 0
+        self.erros = 0
+
+    def datachange_notification(self, node, val, data):
+        """Chamado pela thread de recepção do opcua a cada mudança de valor"""
+        try:
+            display_name = self.nomes.get(node.nodeid)
+            if display_name is None:
+                return
+            data_value = data.monitored_item.Value
+            if leitura_ruim(data_value):
+                raise ValueError(f"{display_name}: status {data_value.StatusCode.name}")
+            coleta, origem, servidor = marcas_de_tempo(data_value)
+            self.escritor.adicionar(coleta, self.linha, self.maquina, display_name, val,
+                                    data_value.StatusCode.name, origem, servidor, tipo_variante(data_value))
+            self.notificacoes += 1
+        except Exception as e:
+            self.erros += 1
+            print(f"❌ Erro ao processar notificação: {e}")
+
+    def status_change_notification(self, status):
+        """Chamado quando o estado da assinatura muda no servidor"""
+        print(f"⚠️ Estado da assinatura alterado: {status}")
+
+
+def parametros_assinatura(intervalo_publicacao, modulo_ua=ua):
+    """CreateSubscriptionParameters usados pelos dois motores (modulo_ua: ua do opcua ou do asyncua)"""
+    params = modulo_ua.CreateSubscriptionParameters()
+    params.RequestedPublishingInterval = intervalo_publicacao
+    params.RequestedLifetimeCount = 10000
+    params.RequestedMaxKeepAliveCount = 3000
+    params.MaxNotificationsPerPublish = 10000
+    params.PublishingEnabled = True
+    params.Priority = 0
+    return params
+
+
+def itens_monitorados(nodeids, intervalo_amostragem, tamanho_fila, modulo_ua=ua):
+    """Um MonitoredItemCreateRequest por nó (Value, fila descartando o mais antigo)"""
+    itens = []
+    for handle, nodeid in enumerate(nodeids, start=1):
+        leitura = modulo_ua.ReadValueId()
+        leitura.NodeId = nodeid
+        leitura.AttributeId = modulo_ua.AttributeIds.Value
+
+        parametros = modulo_ua.MonitoringParameters()
+        parametros.ClientHandle = handle
+        parametros.SamplingInterval = intervalo_amostragem
+        parametros.QueueSize = tamanho_fila
+        parametros.DiscardOldest = True
+
+        item = modulo_ua.MonitoredItemCreateRequest()
+        item.ItemToMonitor = leitura
+        item.MonitoringMode = modulo_ua.MonitoringMode.Reporting
+        item.RequestedParameters = parametros
+        itens.append(item)
+    return itens
+
+
+def criar_assinatura(client, tags, manipulador, intervalo_amostragem=500,
+                     tamanho_fila=10, intervalo_publicacao=None):
+    """Cria uma assinatura com um item monitorado por variável"""
+    params = parametros_assinatura(intervalo_publicacao or intervalo_amostragem)
+    assinatura = client.create_subscription(params, manipulador)
+
+    itens = itens_monitorados([tag.nodeid for tag in tags], intervalo_amostragem, tamanho_fila)
+    resultados = assinatura.create_monitored_items(itens) if itens else []
+    falhas = [r for r in resultados if isinstance(r, ua.StatusCode)]
+    if falhas:
+        print(f"⚠️ {len(falhas)} itens monitorados não puderam ser criados")
+
+    return assinatura, len(resultados) - len(falhas)
@@ -0,0 +1,231 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+import psycopg2
+from database_manager import CONFIG_BANCO_PADRAO, conectar_banco, criar_tabelas
+from coletor import montar_config, executar_coletor
+from metricas import METRICAS, percentil_buckets
+from simulador_opcua import TIPOS_PADRAO, ler_tipos, montar_estrutura
+
+# Métricas comparadas com a referência: (chave, maior é melhor)
+INDICADORES = [
+    ("amostras_s", True),
+    ("linhas_banco_s", True),
+    ("ciclo_p95_ms", False),
+]
+
+
+def preparar_banco(nome):
+    """Cria o banco do benchmark se ainda não existir (nunca usa o banco de produção por padrão)"""
+    parametros = dict(CONFIG_BANCO_PADRAO, dbname="postgres")
+    conn = psycopg2.connect(**parametros)
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", (nome,))
+    if not cursor.fetchone():
+        cursor.execute(f'CREATE DATABASE "{nome}"')
+        print(f"✅ Banco {nome} criado")
+    cursor.close()
+    conn.close()
+
+
+def iniciar_simulador(args):
+    """Sobe o simulador em outro processo (não disputa o GIL com o coletor) e espera a porta abrir"""
+    comando = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "simulador_opcua.py"),
+               "--endereco", args.endereco, "--linhas", str(args.linhas), "--maquinas", str(args.maquinas),
+               "--tags", str(args.tags), "--tipos", ",".join(f"{k}={v:g}" for k, v in args.tipos.items()),
+               "--mudancas-s", str(args.mudancas_s), "--fracao-estatica", str(args.fracao_estatica)]
+    processo = subprocess.Popen(comando, stdout=subprocess.DEVNULL)
+    endereco = urlparse(args.endereco)
+    limite = time.monotonic() + args.espera_simulador
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f"Simulador terminou com código {processo.returncode}")
+        try:
+            socket.create_connection((endereco.hostname, endereco.port), timeout=1).close()
+            return processo
+        except OSError:
+            time.sleep(0.5)
+    processo.terminate()
+    raise RuntimeError(f"Simulador não abriu {args.endereco} em {args.espera_simulador} s")
+
+
+def montar_config_benchmark(args):
+    """Configuração do coletor apontando para o simulador e o banco do benchmark"""
+    config = {}
+    if args.config:
+        with open(args.config, encoding="utf-8") as arquivo:
+            config = json.load(arquivo)
+    config["banco"] = dict(config.get("banco", {}), dbname=args.banco)
+    config["opcua"] = {"endereco": args.endereco, "pasta": "Matics"}
+    config["intervalo"] = args.intervalo
+    config["metricas"] = {"porta": 0, "arquivo_json": None}
+    # Mesmas linhas/máquinas que o simulador publica
+    linhas = {}
+    for linha, maquina, _ in montar_estrutura(args.linhas, args.maquinas, args.tags, args.tipos):
+        linhas.setdefault(linha, []).append(maquina)
+    config["linhas"] = [{"nome": linha, "maquinas": maquinas} for linha, maquinas in linhas.items()]
+    return montar_config(config)
+
+
+def percentis_ms(nome):
+    """p50/p95/p99 em ms de um histograma, somando todas as séries (None sem dados)"""
+    histograma = METRICAS.histogramas[nome]
+    total = [0] * (len(histograma.limites) + 1)
+    for contagens, _ in histograma.series().values():
+        total = [a + b for a, b in zip(total, contagens)]
+    resultado = {}
+    for q in (0.50, 0.95, 0.99):
+        valor = percentil_buckets(histograma.limites, total, q)
+        resultado[f"p{int(q * 100)}"] = valor * 1000 if valor is not None else None
+    return resultado
+
+
+def executar_benchmark(args):
+    """Roda o coletor contra o simulador pelo tempo pedido e calcula os indicadores"""
+    preparar_banco(args.banco)
+    config = montar_config_benchmark(args)
+
+    conn = conectar_banco(config["banco"])
+    criar_tabelas(conn, config.get("particoes"))
+    cursor = conn.cursor()
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM dados_opcua")
+    ultimo_id = cursor.fetchone()[0]
+
+    simulador = iniciar_simulador(args)
+    try:
+        execucao = executar_coletor(config, args.duracao)
+        fim_gravacao = time.monotonic()
+    finally:
+        simulador.terminate()
+        simulador.wait()
+    if not execucao:
+        raise RuntimeError("O coletor não executou (veja as mensagens acima)")
+
+    cursor.execute("SELECT COUNT(*) FROM dados_opcua WHERE id > %s", (ultimo_id,))
+    linhas_banco = cursor.fetchone()[0]
+    cursor.close()
+    conn.close()
+
+    # Taxa sustentada: cada máquina conta a partir da própria conexão (exclui navegação)
+    conectadas = [m for m in execucao["maquinas"] if m["conectado_em"]]
+    amostras_s = sum(m["leituras"] / max(execucao["fim_coleta"] - m["conectado_em"], 1e-9) for m in conectadas)
+    inicio_coleta = min((m["conectado_em"] for m in conectadas), default=fim_gravacao)
+    ciclo = percentis_ms("ciclo_duracao_segundos")
+    leitura = percentis_ms("opcua_leitura_segundos")
+    flush = percentis_ms("escritor_flush_segundos")
+    browse = percentis_ms("opcua_browse_segundos")
+
+    return {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "cenario": {"tags": args.tags, "linhas": args.linhas, "maquinas": args.maquinas,
+                    "tipos": args.tipos, "mudancas_s": args.mudancas_s, "fracao_estatica": args.fracao_estatica,
+                    "intervalo_s": args.intervalo, "duracao_s": args.duracao, "config": args.config},
+        "maquinas_conectadas": len(conectadas),
+        "leituras": execucao["leituras"],
+        "erros": execucao["erros"],
+        "overruns": execucao["overruns"],
+        "amostras_s": amostras_s,
+        "linhas_banco": linhas_banco,
+        "linhas_banco_s": linhas_banco / max(fim_gravacao - inicio_coleta, 1e-9),
+        "ciclo_p50_ms": ciclo["p50"],
+        "ciclo_p95_ms": ciclo["p95"],
+        "ciclo_p99_ms": ciclo["p99"],
+        "leitura_p95_ms": leitura["p95"],
+        "flush_p95_ms": flush["p95"],
+        "browse_p50_ms": browse["p50"],
+    }
+
+
+def comparar(resultado, referencia, tolerancia):
+    """Lista os indicadores que pioraram mais que a tolerância em relação à referência"""
+    regressoes = []
+    for chave, maior_melhor in INDICADORES:
+        atual, anterior = resultado.get(chave), referencia.get(chave)
+        if atual is None or not anterior:
+            continue
+        variacao = (atual - anterior) / anterior
+        if (maior_melhor and variacao < -tolerancia) or (not maior_melhor and variacao > tolerancia):
+            regressoes.append((chave, anterior, atual, variacao))
+    return regressoes
+
+
+def mostrar_resultado(resultado):
+    """Imprime os indicadores do benchmark"""
+    formatar = lambda v: "-" if v is None else f"{v:.1f}"
+    print("\n📈 RESULTADO DO BENCHMARK")
+    print("=" * 50)
+    print(f"   Máquinas conectadas: {resultado['maquinas_conectadas']}, "
+          f"{resultado['leituras']} leituras, {resultado['erros']} erros, {resultado['overruns']} overruns")
+    print(f"   Amostras/s (sustentado): {resultado['amostras_s']:.1f}")
+    print(f"   Linhas/s no banco: {resultado['linhas_banco_s']:.1f} ({resultado['linhas_banco']} linhas)")
+    print(f"   Ciclo p50/p95/p99: {formatar(resultado['ciclo_p50_ms'])} / "
+          f"{formatar(resultado['ciclo_p95_ms'])} / {formatar(resultado['ciclo_p99_ms'])} ms")
+    print(f"   Read p95: {formatar(resultado['leitura_p95_ms'])} ms, "
+          f"flush p95: {formatar(resultado['flush_p95_ms'])} ms, "
+          f"navegação p50: {formatar(resultado['browse_p50_ms'])} ms")
+
+
+def ler_argumentos():
+    """Lê os argumentos de linha de comando"""
+    parser = argparse.ArgumentParser(description="Benchmark do coletor contra o simulador OPC UA e um PostgreSQL local")
+    parser.add_argument("--tags", type=int, default=1000, help="total de tags no simulador (1 a 50000)")
+    parser.add_argument("--linhas", type=int, default=1, help="linhas no simulador")
+    parser.add_argument("--maquinas", type=int, default=2, help="máquinas por linha")
+    parser.add_argument("--tipos", type=ler_tipos, default=TIPOS_PADRAO,
+                        help="pesos dos tipos, ex.: float=60,int=20,bool=15,texto=5")
+    parser.add_argument("--mudancas-s", type=float, default=1.0, help="mudanças por segundo de cada tag")
+    parser.add_argument("--fracao-estatica", type=float, default=0.0, help="fração das tags que nunca muda")
+    parser.add_argument("--intervalo", type=float, default=1.0, help="período de varredura do coletor em segundos")
+    parser.add_argument("--duracao", type=float, default=60, help="duração da coleta em segundos")
+    parser.add_argument("--config", default=None,
+                        help="configuração base do coletor (filtro, fila, buffer, classes...); linhas e banco são substituídos")
+    parser.add_argument("--endereco", default="opc.tcp://127.0.0.1:4841", help="endpoint do simulador")
+    parser.add_argument("--espera-simulador", type=float, default=300,
+                        help="tempo máximo para o simulador montar o espaço de endereços")
+    parser.add_argument("--banco", default="opcua_benchmark", help="banco PostgreSQL usado no benchmark")
+    parser.add_argument("--resultado", default="benchmark_resultado.json", help="arquivo com o resultado")
+    parser.add_argument("--referencia", default=None, help="resultado anterior para detectar regressões")
+    parser.add_argument("--salvar-referencia", action="store_true", help="grava o resultado como nova referência")
+    parser.add_argument("--tolerancia", type=float, default=0.10,
+                        help="piora aceita em relação à referência (0.10 = 10%%)")
+    return parser.parse_args()
+
+
+def main():
+    """Função principal"""
+    args = ler_argumentos()
+    print("🏁 BENCHMARK DO COLETOR OPC UA")
+    print("=" * 50)
+
+    resultado = executar_benchmark(args)
+    mostrar_resultado(resultado)
+    with open(args.resultado, "w", encoding="utf-8") as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+    print(f"💾 Resultado salvo em {args.resultado}")
+
+    if args.referencia and args.salvar_referencia:
+        with open(args.referencia, "w", encoding="utf-8") as arquivo:
+            json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+        print(f"💾 Referência atualizada em {args.referencia}")
+    elif args.referencia and os.path.exists(args.referencia):
+        with open(args.referencia, encoding="utf-8") as arquivo:
+            referencia = json.load(arquivo)
+        if referencia.get("cenario") != resultado["cenario"]:
+            print("⚠️ A referência foi medida em outro cenário; a comparação pode não valer")
+        regressoes = comparar(resultado, referencia, args.tolerancia)
+        for chave, anterior, atual, variacao in regressoes:
+            print(f"❌ Regressão em {chave}: {anterior:.1f} → {atual:.1f} ({variacao:+.0%})")
+        if regressoes:
+            sys.exit(1)
+        print(f"✅ Sem regressões acima de {args.tolerancia:.0%} em relação a {args.referencia}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+
+def _codificar_valor(valor):
+    """Separa o valor em (tipo, valor) para guardar no SQLite sem perder o tipo original"""
+    if valor is None:
+        return "nulo", None
+    if isinstance(valor, bool):
+        return "bool", int(valor)
+    if isinstance(valor, int):
+        if -2**63 <= valor < 2**63:
+            return "int", valor
+        return "float", float(valor)
+    if isinstance(valor, float):
+        return "float", valor
+    return "texto", str(valor)
+
+
+def _texto_data(instante):
+    """datetime -> texto ISO (None continua None)"""
+    return instante.isoformat() if instante is not None else None
+
+
+def _data_texto(texto):
+    """Texto ISO -> datetime (None continua None)"""
+    return datetime.fromisoformat(texto) if texto is not None else None
+
+
+def _registro(timestamp, linha, maquina, funcao, dado, qualidade, origem=None, servidor=None, tipo=None):
+    """Leitura no formato do escritor -> linha da tabela leituras do SQLite"""
+    tipo_valor, valor = _codificar_valor(dado)
+    return (timestamp.isoformat(), linha, maquina, funcao, tipo_valor, valor, qualidade,
+            _texto_data(origem), _texto_data(servidor), tipo)
+
+
+def _decodificar_valor(tipo, valor):
+    """Reconstrói o valor no tipo original a partir do que foi guardado"""
+    if tipo == "bool":
+        return bool(valor)
+    if tipo == "int":
+        return int(valor)
+    if tipo == "float":
+        return float(valor)
+    return valor
+
+
+class BufferLocal:
+    """Fila durável em disco (SQLite em modo WAL) entre a aquisição e o PostgreSQL
+
+    A aquisição sempre grava aqui (mesma interface adicionar do escritor); o
+    DrenadorBuffer reenvia para o banco em lotes grandes quando ele está disponível.
+    O arquivo sobrevive a reinícios e é limitado a max_mb (descarta as leituras mais antigas).
+    """
+
+    def __init__(self, caminho="buffer_opcua.db", max_mb=500, max_linhas=1000, max_ms=200):
+        self.caminho = caminho
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_linhas = max_linhas
+        self.max_ms = max_ms
+
+        self._db = sqlite3.connect(caminho, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS leituras (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                linha TEXT NOT NULL,
+                maquina TEXT NOT NULL,
+                funcao TEXT NOT NULL,
+                tipo TEXT NOT NULL,
+                valor,
+                qualidade TEXT,
+                timestamp_origem TEXT,
+                timestamp_servidor TEXT,
+                tipo_variante TEXT
+            )
+        """)
+        # Arquivo de uma versão anterior: as leituras pendentes ficam sem as marcas de tempo do OPC UA
+        existentes = {coluna[1] for coluna in self._db.execute("PRAGMA table_info(leituras)")}
+        for coluna in ("timestamp_origem", "timestamp_servidor", "tipo_variante"):
+            if coluna not in existentes:
+                self._db.execute(f"ALTER TABLE leituras ADD COLUMN {coluna} TEXT")
+        self._db.commit()
+        self._tamanho_pagina = self._db.execute("PRAGMA page_size").fetchone()[0]
+
+        self._pendentes = []
+        self._inicio_lote = None
+        self._lock = threading.Lock()
+        self._restantes_ao_fechar = None  # contagem final, para o resumo depois de fechar
+
+        # Estatísticas
+        self.linhas_recebidas = 0
+        self.linhas_descartadas = 0
+
+        recuperadas = self.pendentes()
+        if recuperadas:
+            print(f"📦 Buffer local: {recuperadas} leituras pendentes recuperadas de {caminho}")
+
+    def adicionar(self, timestamp, linha, maquina, funcao, dado, qualidade, origem=None, servidor=None, tipo=None):
+        """Adiciona uma leitura à fila; persiste em disco a cada N linhas ou T ms"""
+        registro = _registro(timestamp, linha, maquina, funcao, dado, qualidade, origem, servidor, tipo)
+        with self._lock:
+            if not self._pendentes:
+                self._inicio_lote = time.monotonic()
+            self._pendentes.append(registro)
+            decorrido_ms = (time.monotonic() - self._inicio_lote) * 1000
+            if len(self._pendentes) >= self.max_linhas or decorrido_ms >= self.max_ms:
+                self._persistir()
+
+    def gravar(self, linhas):
+        """Grava as leituras informadas (formato do escritor) em uma única transação, como o EscritorLote.gravar
+
+        Tudo ou nada: se o SQLite falhar, nenhuma das linhas fica no buffer e o erro segue.
+        """
+        with self._lock:
+            self._persistir()  # as que já estavam em memória vêm antes
+            self._pendentes = [_registro(*leitura) for leitura in linhas]
+            try:
+                return self._persistir()
+            except sqlite3.Error:
+                self._pendentes = []
+                raise
+
+    def flush(self):
+        """Persiste em disco as leituras que ainda estão em memória"""
+        with self._lock:
+            return self._persistir()
+
+    def _persistir(self):
+        """Grava as leituras em memória em uma transação do SQLite (chamar com o lock)
+
+        Só esvazia a memória depois do commit: se o SQLite falhar (disco cheio, arquivo
+        travado), as leituras continuam pendentes para a próxima tentativa e o erro segue.
+        """
+        if not self._pendentes:
+            return 0
+        linhas = self._pendentes
+
+        try:
+            self._db.executemany("""
+                INSERT INTO leituras (timestamp, linha, maquina, funcao, tipo, valor, qualidade,
+                                      timestamp_origem, timestamp_servidor, tipo_variante)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, linhas)
+            self._db.commit()
+        except sqlite3.Error:
+            self._db.rollback()
+            raise
+        self._pendentes = []
+        self._inicio_lote = None
+        self.linhas_recebidas += len(linhas)
+        self._aplicar_limite()
+        return len(linhas)
+
+    def bytes_usados(self):
+        """Espaço ocupado pelos dados (páginas livres do arquivo são reaproveitadas)"""
+        paginas = self._db.execute("PRAGMA page_count").fetchone()[0]
+        livres = self._db.execute("PRAGMA freelist_count").fetchone()[0]
+        return (paginas - livres) * self._tamanho_pagina
+
+    def _aplicar_limite(self):
+        """Descarta as leituras mais antigas se o buffer passou de max_bytes (chamar com o lock)"""
+        usados = self.bytes_usados()
+        if usados <= self.max_bytes:
+            return
+        total = self._contar()
+        # Remove a fração excedente mais 10% de folga, para não descartar a cada lote
+        excesso = int(total * ((usados - self.max_bytes) / usados + 0.1)) + 1
+        self._db.execute("""
+            DELETE FROM leituras
+            WHERE seq <= (SELECT seq FROM leituras ORDER BY seq LIMIT 1 OFFSET ?)
+        """, (min(excesso, total) - 1,))
+        self._db.commit()
+        self.linhas_descartadas += min(excesso, total)
+        print(f"⚠️ Buffer local cheio ({usados / 1024 / 1024:.1f} MB): "
+              f"{min(excesso, total)} leituras mais antigas descartadas")
+
+    def _contar(self):
+        """Conta as leituras em disco (seq é contínuo: só removemos do início da fila)"""
+        minimo, maximo = self._db.execute("SELECT MIN(seq), MAX(seq) FROM leituras").fetchone()
+        return maximo - minimo + 1 if minimo is not None else 0
+
+    def pendentes(self):
+        """Leituras ainda não enviadas ao banco (em disco + em memória)"""
+        with self._lock:
+            if self._restantes_ao_fechar is not None:
+                return self._restantes_ao_fechar
+            return self._contar() + len(self._pendentes)
+
+    def ler_lote(self, limite=5000):
+        """Retorna (último seq, linhas) com as leituras mais antigas, no formato do escritor"""
+        with self._lock:
+            registros = self._db.execute("""
+                SELECT seq, timestamp, linha, maquina, funcao, tipo, valor, qualidade,
+                       timestamp_origem, timestamp_servidor, tipo_variante
+                FROM leituras
+                ORDER BY seq
+                LIMIT ?
+            """, (limite,)).fetchall()
+        if not registros:
+            return None, []
+        linhas = [(datetime.fromisoformat(timestamp), linha, maquina, funcao, _decodificar_valor(tipo, valor), qualidade,
+                   _data_texto(origem), _data_texto(servidor), tipo_variante)
+                  for _, timestamp, linha, maquina, funcao, tipo, valor, qualidade, origem, servidor, tipo_variante
+                  in registros]
+        return registros[-1][0], linhas
+
+    def confirmar(self, ultimo_seq):
+        """Remove da fila as leituras já gravadas no banco (até ultimo_seq)"""
+        with self._lock:
+            self._db.execute("DELETE FROM leituras WHERE seq <= ?", (ultimo_seq,))
+            self._db.commit()
+
+    def resumo(self):
+        """Retorna as estatísticas do buffer formatadas para exibição"""
+        return (f"{self.linhas_recebidas} recebidas, {self.pendentes()} pendentes, "
+                f"{self.linhas_descartadas} descartadas por limite de disco")
+
+    def fechar(self):
+        """Persiste o que estiver em memória e fecha o arquivo"""
+        with self._lock:
+            self._persistir()
+            self._restantes_ao_fechar = self._contar()
+            self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._db.close()
+
+
+class DrenadorBuffer:
+    """Thread que reenvia o buffer local para o PostgreSQL em lotes grandes
+
+    Cada lote é gravado pelo escritor em uma única transação e só então removido
+    do buffer; se o banco cair, espera com backoff exponencial e reconecta.
+    A entrega é "pelo menos uma vez": se o commit no PostgreSQL acontecer mas a confirmação
+    se perder (conexão caída na resposta, processo morto antes de confirmar), o lote é
+    reenviado e fica duplicado no histórico e somado duas vezes nas agregações.
+    """
+
+    def __init__(self, buffer, escritor, reconectar=None, tamanho_lote=5000, intervalo_s=1.0, espera_max_s=60):
+        self.buffer = buffer
+        self.escritor = escritor
+        self.reconectar = reconectar  # função que devolve uma nova conexão psycopg2 (escritor sem pool)
+        self.tamanho_lote = tamanho_lote
+        self.intervalo_s = intervalo_s
+        self.espera_max_s = espera_max_s
+
+        self._parar = threading.Event()
+        self._thread = None
+        self.banco_disponivel = True
+        self.falhas = 0
+
+    def iniciar(self):
+        """Inicia a thread de drenagem"""
+        if self._thread is None:
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._loop, name="drenador-buffer", daemon=True)
+            self._thread.start()
+        return self
+
+    def drenar_lote(self):
+        """Envia um lote do buffer para o banco; retorna quantas linhas foram gravadas"""
+        self.buffer.flush()
+        ultimo_seq, linhas = self.buffer.ler_lote(self.tamanho_lote)
+        if not linhas:
+            return 0
+        self.escritor.gravar(linhas)
+        self.buffer.confirmar(ultimo_seq)
+        return len(linhas)
+
+    def _loop(self):
+        """Drena continuamente; lotes cheios seguem sem pausa até esvaziar o atraso"""
+        espera = self.intervalo_s
+        while not self._parar.is_set():
+            try:
+                gravadas = self.drenar_lote()
+                if not self.banco_disponivel:
+                    print(f"✅ Banco disponível novamente, reenviando {self.buffer.pendentes()} leituras do buffer")
+                    self.banco_disponivel = True
+                espera = self.intervalo_s
+                if gravadas < self.tamanho_lote:
+                    self._parar.wait(self.intervalo_s)
+            except Exception as e:
+                self.falhas += 1
+                if self.banco_disponivel:
+                    print(f"⚠️ Banco indisponível, leituras ficam no buffer local: {e}")
+                    self.banco_disponivel = False
+                self._parar.wait(espera)
+                espera = min(espera * 2, self.espera_max_s)
+                self._reconectar()
+
+    def _reconectar(self):
+        """Troca a conexão do escritor por uma nova (a antiga pode ter caído)
+
+        Um escritor com pool não precisa: o pool já descartou a conexão que caiu.
+        """
+        if not self.reconectar or getattr(self.escritor, "pool", None):
+            return
+        try:
+            nova = self.reconectar()
+        except Exception:
+            return
+        try:
+            self.escritor.conn.close()
+        except Exception:
+            pass
+        self.escritor.conn = nova
+
+    def parar(self, drenar=True):
+        """Para a thread; se drenar=True, tenta enviar o que restou antes de sair"""
+        if self._thread:
+            self._parar.set()
+            self._thread.join()
+            self._thread = None
+        if not drenar:
+            return
+        try:
+            while self.drenar_lote():
+                pass
+        except Exception as e:
+            print(f"⚠️ {self.buffer.pendentes()} leituras ficam no buffer local para o próximo início: {e}")
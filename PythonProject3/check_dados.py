@@ -1,114 +1,206 @@
-import psycopg2
+import argparse
+import json
+import os
+import time
 from datetime import datetime, timedelta
+from database_manager import conectar_banco
 
-def verificar_dados_opcua():
-    """Verifica os dados na tabela dados_opcua"""
-    try:
-        # Conectar ao banco
-        conn = psycopg2.connect(
-            dbname="new_bd1",
-            user="postgres",
-            password="postgres",
-            host="localhost",
-            port="5432"
-        )
-        cursor = conn.cursor()
-        
-        print("🔍 VERIFICAÇÃO DOS DADOS OPC UA")
-        print("=" * 50)
-        
-        # 1. Contar total de registros
-        cursor.execute("SELECT COUNT(*) FROM dados_opcua")
-        total = cursor.fetchone()[0]
-        print(f"📊 Total de registros: {total}")
-        
-        if total == 0:
-            print("❌ Nenhum registro encontrado!")
-            return
-        
-        # 2. Ver últimos 10 registros
-        cursor.execute("""
-            SELECT id, timestamp, linha, maquina, funcao, dado, qualidade 
-            FROM dados_opcua 
-            ORDER BY timestamp DESC 
-            LIMIT 10
-        """)
-        registros = cursor.fetchall()
-        
-        print(f"\n📋 Últimos {len(registros)} registros:")
-        for reg in registros:
-            print(f"  ID: {reg[0]}, {reg[1]} - {reg[2]}/{reg[3]} - {reg[4]} = {reg[5]} ({reg[6]})")
-        
-        # 3. Verificar se há dados recentes (últimos 5 minutos)
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM dados_opcua 
-            WHERE timestamp >= NOW() - INTERVAL '5 minutes'
-        """)
+ARQUIVO_CACHE = "check_dados_cache.json"
+
+def _contagens_exatas(cursor, inicio):
+    """Uma única passada na janela: contagem por tag e qualidade e quantos são dos últimos 5 minutos"""
+    cursor.execute("""
+        CREATE TEMP TABLE contagem_tags ON COMMIT DROP AS
+        SELECT tag_id, qualidade, COUNT(*) AS total,
+               COUNT(*) FILTER (WHERE timestamp >= NOW() - INTERVAL '5 minutes') AS recentes
+        FROM dados_opcua
+        WHERE timestamp >= %s
+        GROUP BY tag_id, qualidade
+    """, (inicio,))
+
+def _contagens_aproximadas(cursor, inicio):
+    """Contagens pelas agregações de 1 hora / 1 minuto e qualidade por amostragem de 1% das páginas"""
+    cursor.execute("""
+        CREATE TEMP TABLE contagem_tags ON COMMIT DROP AS
+        SELECT tag_id, SUM(contagem) AS total
+        FROM dados_opcua_1h
+        WHERE inicio >= date_trunc('hour', %s::timestamp)
+        GROUP BY tag_id
+    """, (inicio,))
+    cursor.execute("""
+        SELECT COALESCE(SUM(contagem), 0)
+        FROM dados_opcua_1min
+        WHERE inicio >= date_trunc('minute', NOW()::timestamp - INTERVAL '5 minutes')
+    """)
+    recentes = cursor.fetchone()[0]
+    cursor.execute("""
+        SELECT qualidade, COUNT(*) * 100
+        FROM dados_opcua TABLESAMPLE SYSTEM (1)
+        WHERE timestamp >= %s
+        GROUP BY qualidade
+        ORDER BY 2 DESC
+    """, (inicio,))
+    return recentes, cursor.fetchall()
+
+def gerar_relatorio(cursor, horas=24, aproximado=False):
+    """Monta o relatório de saúde dos dados da janela (sem COUNT(*) da tabela inteira)"""
+    inicio = datetime.now() - timedelta(hours=horas)
+    relatorio = {"gerado_em": datetime.now().isoformat(timespec="seconds"), "horas": horas,
+                 "aproximado": aproximado}
+
+    # Total da tabela: estimativa do planejador (pg_class.reltuples de cada partição)
+    cursor.execute("""
+        SELECT COALESCE(SUM(c.reltuples) FILTER (WHERE c.reltuples > 0), 0)::bigint
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'dados_opcua'::regclass
+    """)
+    relatorio["total_estimado"] = cursor.fetchone()[0]
+
+    if aproximado:
+        recentes, qualidades = _contagens_aproximadas(cursor, inicio)
+    else:
+        _contagens_exatas(cursor, inicio)
+        cursor.execute("SELECT COALESCE(SUM(recentes), 0) FROM contagem_tags")
         recentes = cursor.fetchone()[0]
-        print(f"\n⏰ Registros dos últimos 5 minutos: {recentes}")
-        
-        # 4. Verificar dados por linha
         cursor.execute("""
-            SELECT linha, COUNT(*) as total 
-            FROM dados_opcua 
-            GROUP BY linha
+            SELECT qualidade, SUM(total) FROM contagem_tags GROUP BY qualidade ORDER BY 2 DESC
         """)
-        linhas = cursor.fetchall()
-        print(f"\n🏭 Dados por linha:")
-        for linha in linhas:
-            print(f"  {linha[0]}: {linha[1]} registros")
-        
-        # 5. Verificar dados por máquina
-        cursor.execute("""
-            SELECT maquina, COUNT(*) as total 
-            FROM dados_opcua 
-            GROUP BY maquina
+        qualidades = cursor.fetchall()
+
+    cursor.execute("SELECT COALESCE(SUM(total), 0) FROM contagem_tags")
+    relatorio["total_janela"] = int(cursor.fetchone()[0])
+    relatorio["recentes_5min"] = int(recentes)
+    relatorio["por_qualidade"] = [[q, int(n)] for q, n in qualidades]
+
+    # Por linha, máquina e função: a partir das contagens por tag (sem reler dados_opcua)
+    for chave, coluna, ordem in (("por_linha", "t.linha", "1"), ("por_maquina", "t.maquina", "1"),
+                                 ("por_funcao", "t.funcao", "2 DESC")):
+        cursor.execute(f"""
+            SELECT {coluna}, SUM(c.total)
+            FROM contagem_tags c
+            JOIN tags_opcua t ON t.id = c.tag_id
+            GROUP BY 1
+            ORDER BY {ordem}
         """)
-        maquinas = cursor.fetchall()
-        print(f"\n⚙️ Dados por máquina:")
-        for maquina in maquinas:
-            print(f"  {maquina[0]}: {maquina[1]} registros")
-        
-        # 6. Verificar dados por função
+        relatorio[chave] = [[nome, int(n)] for nome, n in cursor.fetchall()]
+
+    # Últimos valores atualizados (tabela de valores atuais, uma linha por tag)
+    cursor.execute("""
+        SELECT timestamp, linha, maquina, funcao, dado, qualidade
+        FROM vw_dados_opcua_atual
+        ORDER BY timestamp DESC
+        LIMIT 10
+    """)
+    relatorio["ultimos"] = [[str(r[0])] + list(r[1:]) for r in cursor.fetchall()]
+
+    # Duplicados: só na janela e só no modo exato (exige agrupar por timestamp)
+    relatorio["duplicados"] = None
+    if not aproximado:
         cursor.execute("""
-            SELECT funcao, COUNT(*) as total 
-            FROM dados_opcua 
-            GROUP BY funcao
-            ORDER BY total DESC
-        """)
-        funcoes = cursor.fetchall()
-        print(f"\n🔧 Dados por função:")
-        for funcao in funcoes:
-            print(f"  {funcao[0]}: {funcao[1]} registros")
+            SELECT d.timestamp, t.linha, t.maquina, t.funcao, d.total
+            FROM (
+                SELECT timestamp, tag_id, COUNT(*) as total
+                FROM dados_opcua
+                WHERE timestamp >= %s
+                GROUP BY timestamp, tag_id
+                HAVING COUNT(*) > 1
+                ORDER BY total DESC
+                LIMIT 5
+            ) d
+            JOIN tags_opcua t ON t.id = d.tag_id
+            ORDER BY d.total DESC
+        """, (inicio,))
+        relatorio["duplicados"] = [[str(r[0])] + list(r[1:]) for r in cursor.fetchall()]
+
+    cursor.connection.commit()  # descarta a tabela temporária
+    return relatorio
+
+def ler_cache(horas, aproximado, validade_s, arquivo=ARQUIVO_CACHE):
+    """Retorna o relatório salvo se for da mesma janela/modo e mais novo que validade_s"""
+    if validade_s <= 0 or not os.path.exists(arquivo):
+        return None
+    if time.time() - os.path.getmtime(arquivo) > validade_s:
+        return None
+    try:
+        with open(arquivo, encoding="utf-8") as f:
+            relatorio = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if relatorio.get("horas") != horas or relatorio.get("aproximado") != aproximado:
+        return None
+    return relatorio
+
+def salvar_cache(relatorio, arquivo=ARQUIVO_CACHE):
+    """Salva o relatório para as próximas execuções"""
+    try:
+        with open(arquivo, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    except OSError as e:
+        print(f"⚠️ Não foi possível salvar o cache: {e}")
+
+def mostrar_relatorio(relatorio, do_cache=False):
+    """Imprime o relatório de saúde dos dados"""
+    modo = "aproximado" if relatorio["aproximado"] else "exato"
+    origem = " (cache)" if do_cache else ""
+    print(f"📅 Janela: últimas {relatorio['horas']} h, modo {modo}, gerado em {relatorio['gerado_em']}{origem}")
+    print(f"📊 Total de registros (estimado): {relatorio['total_estimado']}")
+    print(f"📊 Registros na janela: {relatorio['total_janela']}")
+    
+    if relatorio["total_janela"] == 0:
+        print("❌ Nenhum registro encontrado na janela!")
+        return
+    
+    print(f"\n📋 Últimos {len(relatorio['ultimos'])} valores atualizados:")
+    for reg in relatorio["ultimos"]:
+        print(f"  {reg[0]} - {reg[1]}/{reg[2]} - {reg[3]} = {reg[4]} ({reg[5]})")
+    
+    print(f"\n⏰ Registros dos últimos 5 minutos: {relatorio['recentes_5min']}")
+    
+    print("\n🏭 Dados por linha:")
+    for linha, total in relatorio["por_linha"]:
+        print(f"  {linha}: {total} registros")
+    
+    print("\n⚙️ Dados por máquina:")
+    for maquina, total in relatorio["por_maquina"]:
+        print(f"  {maquina}: {total} registros")
+    
+    print("\n🔧 Dados por função:")
+    for funcao, total in relatorio["por_funcao"]:
+        print(f"  {funcao}: {total} registros")
+    
+    sufixo = " (amostra de 1%, extrapolada)" if relatorio["aproximado"] else ""
+    print(f"\n📈 Qualidade dos dados{sufixo}:")
+    for qualidade, total in relatorio["por_qualidade"]:
+        print(f"  {qualidade}: {total} registros")
+    
+    if relatorio["duplicados"] is not None:
+        print("\n🔄 Possíveis duplicados:")
+        for dup in relatorio["duplicados"]:
+            print(f"  {dup[0]} - {dup[1]}/{dup[2]} - {dup[3]}: {dup[4]} vezes")
+
+def verificar_dados_opcua(horas=24, aproximado=False, validade_cache_s=60):
+    """Verifica os dados na tabela dados_opcua"""
+    try:
+        print("🔍 VERIFICAÇÃO DOS DADOS OPC UA")
+        print("=" * 50)
         
-        # 7. Verificar qualidade dos dados
-        cursor.execute("""
-            SELECT qualidade, COUNT(*) as total 
-            FROM dados_opcua 
-            GROUP BY qualidade
-        """)
-        qualidades = cursor.fetchall()
-        print(f"\n📈 Qualidade dos dados:")
-        for qualidade in qualidades:
-            print(f"  {qualidade[0]}: {qualidade[1]} registros")
+        relatorio = ler_cache(horas, aproximado, validade_cache_s)
+        if relatorio:
+            mostrar_relatorio(relatorio, do_cache=True)
+            return relatorio
         
-        # 8. Verificar se há dados duplicados
-        cursor.execute("""
-            SELECT timestamp, linha, maquina, funcao, COUNT(*) as total
-            FROM dados_opcua 
-            GROUP BY timestamp, linha, maquina, funcao
-            HAVING COUNT(*) > 1
-            ORDER BY total DESC
-            LIMIT 5
-        """)
-        duplicados = cursor.fetchall()
-        print(f"\n🔄 Possíveis duplicados:")
-        for dup in duplicados:
-            print(f"  {dup[0]} - {dup[1]}/{dup[2]} - {dup[3]}: {dup[4]} vezes")
+        # Conectar ao banco
+        conn = conectar_banco()
+        cursor = conn.cursor()
+        
+        relatorio = gerar_relatorio(cursor, horas, aproximado)
+        salvar_cache(relatorio)
+        mostrar_relatorio(relatorio)
         
         cursor.close()
         conn.close()
+        return relatorio
         
     except Exception as e:
         print(f"❌ Erro: {e}")
@@ -163,6 +255,21 @@ def testar_scraping_manual():
     except Exception as e:
         print(f"❌ Erro no teste manual: {e}")
 
+def ler_argumentos():
+    """Lê os argumentos de linha de comando"""
+    parser = argparse.ArgumentParser(description="Relatório de saúde dos dados OPC UA")
+    parser.add_argument("--horas", type=float, default=24,
+                        help="janela do relatório em horas (padrão: 24)")
+    parser.add_argument("--aproximado", action="store_true",
+                        help="usa estatísticas do PostgreSQL, agregações e amostragem em vez de ler a janela inteira")
+    parser.add_argument("--cache", type=float, default=60,
+                        help="reaproveita o último relatório se tiver menos de N segundos (0 desativa)")
+    parser.add_argument("--sem-teste-manual", action="store_true",
+                        help="não faz a leitura manual no KepServer depois do relatório")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    verificar_dados_opcua()
-    testar_scraping_manual() 
\ No newline at end of file
+    args = ler_argumentos()
+    verificar_dados_opcua(args.horas, args.aproximado, args.cache)
+    if not args.sem_teste_manual:
+        testar_scraping_manual() 
\ No newline at end of file
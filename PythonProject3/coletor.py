@@ -0,0 +1,395 @@
+from opcua import Client
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import contextlib
+import json
+import threading
+import time
+from database_manager import conectar_banco, criar_tabelas, iniciar_manutencao_periodica
+from escritor_lote import EscritorLote, leitura_ruim, marcas_de_tempo, tipo_variante
+from registro_tags import RegistroTags, resolver_maquinas, obter_max_nodes_por_leitura, tag_para_snapshot
+from filtro_excecao import FiltroExcecao
+from buffer_local import BufferLocal, DrenadorBuffer
+from fila_leituras import FilaLeituras
+from agendador import Agendador, CLASSE_PADRAO, agrupar_por_classe, executar_agendado
+from taxa_adaptativa import TaxaAdaptativa
+from snapshot_tags import SnapshotTags
+from metricas import iniciar_metricas, encerrar_metricas
+from supervisor import PoolBanco, SessaoOPCUA, Vigia, falha_de_conexao
+
+# Tempo máximo de uma leitura ou navegação antes de o vigia abortar a sessão da máquina
+PRAZO_PADRAO_S = 10
+
+
+def carregar_config(caminho):
+    """Lê o arquivo de configuração e devolve a lista de máquinas a coletar"""
+    with open(caminho, encoding="utf-8") as arquivo:
+        return montar_config(json.load(arquivo))
+
+
+def montar_config(config):
+    """Expande linhas/máquinas da configuração em config["maquinas"] (herdando os padrões)"""
+    opcua = config.get("opcua", {})
+    prazo_padrao = config.get("vigia", {}).get("prazo_s", PRAZO_PADRAO_S)
+    maquinas = []
+    for linha in config.get("linhas", []):
+        for maquina in linha.get("maquinas", []):
+            if isinstance(maquina, str):
+                maquina = {"nome": maquina}
+            maquinas.append({
+                "linha": linha["nome"],
+                "maquina": maquina["nome"],
+                "endereco": maquina.get("endereco", linha.get("endereco", opcua.get("endereco"))),
+                "pasta": maquina.get("pasta", linha.get("pasta", opcua.get("pasta", "Matics"))),
+                "intervalo": maquina.get("intervalo", linha.get("intervalo", config.get("intervalo", 2))),
+                "classes": maquina.get("classes", linha.get("classes", config.get("classes_varredura", []))),
+                "prazo_s": maquina.get("prazo_s", linha.get("prazo_s", prazo_padrao)),
+                "sessao": config.get("sessao", {}),
+            })
+    # Polling adaptativo: o orçamento total de leituras/s é dividido entre as máquinas
+    if config.get("adaptativo") and maquinas:
+        adaptativo = dict(config["adaptativo"])
+        if adaptativo.get("orcamento_leituras_s"):
+            adaptativo["orcamento_leituras_s"] /= len(maquinas)
+        for maquina in maquinas:
+            maquina["adaptativo"] = adaptativo
+    config["maquinas"] = maquinas
+    return config
+
+
+def resolver_em_lote(maquinas, snapshot, vigia=None):
+    """Resolve de uma vez, por servidor, as máquinas que não estão no snapshot
+
+    Uma sessão por endereço: um TranslateBrowsePaths para todos os caminhos, um Browse para
+    todas as máquinas e um Read para os tipos. Cada ColetorMaquina parte do snapshot depois.
+    Com o vigia, um servidor que trava é abortado no prazo e suas máquinas navegam sozinhas.
+    """
+    por_endereco = {}
+    for definicao in maquinas:
+        caminho = (definicao["pasta"], definicao["linha"], definicao["maquina"])
+        if snapshot.obter("/".join(caminho)) is None:
+            por_endereco.setdefault(definicao["endereco"], []).append(caminho)
+
+    for endereco, caminhos in por_endereco.items():
+        inicio = time.monotonic()
+        client = Client(endereco)
+        prazo_s = max(d["prazo_s"] for d in maquinas if d["endereco"] == endereco)
+        vigiar = vigia.vigiar(endereco, prazo_s, client.disconnect_socket) if vigia else contextlib.nullcontext()
+        try:
+            client.connect()
+            with vigiar:
+                resolvidas = resolver_maquinas(client, caminhos, obter_max_nodes_por_leitura(client))
+            for caminho, (maquina, tags) in resolvidas.items():
+                snapshot.salvar("/".join(caminho), maquina.to_string(), [tag_para_snapshot(t) for t in tags])
+            print(f"🗂️ {endereco}: {len(resolvidas)} de {len(caminhos)} máquinas resolvidas "
+                  f"em {time.monotonic() - inicio:.1f} s")
+        except Exception as e:
+            # Cada máquina tenta de novo sozinha ao conectar
+            print(f"⚠️ {endereco}: resolução em lote falhou ({e})")
+        finally:
+            try:
+                client.disconnect()
+            except Exception:
+                pass
+
+
+class ColetorMaquina:
+    """Coleta uma máquina com sessão OPC UA própria; uma máquina lenta não atrasa as outras"""
+
+    def __init__(self, definicao, escritor, parar, snapshot=None, vigia=None):
+        # escritor: EscritorLote, BufferLocal ou FiltroExcecao (mesma interface adicionar)
+        self.linha = definicao["linha"]
+        self.maquina = definicao["maquina"]
+        self.endereco = definicao["endereco"]
+        self.pasta = definicao["pasta"]
+        self.intervalo = definicao["intervalo"]
+        self.classes = definicao.get("classes", [])
+        self.adaptativo = definicao.get("adaptativo")
+        self.escritor = escritor
+        self.parar = parar
+        self.snapshot = snapshot  # SnapshotTags compartilhado (partida sem navegar)
+        self.vigia = vigia  # Vigia compartilhado: aborta a sessão se uma chamada passar de prazo_s
+        self.prazo_s = definicao.get("prazo_s", PRAZO_PADRAO_S)
+
+        # Reconexão com backoff; depois dela, nós, grupos e filtro são refeitos em conectar()
+        self.sessao = SessaoOPCUA(self.endereco, **definicao.get("sessao", {}))
+        if isinstance(escritor, FiltroExcecao):
+            self.sessao.ao_reconectar.append(lambda client: escritor.esquecer(self.linha, self.maquina))
+        self.client = None
+        self.registro = None
+        self.grupos = {}
+        self.agendador = None
+        self.taxa = None
+        self.leituras = 0
+        self.erros = 0
+        self.overruns = 0
+        self.travamentos = 0
+        self.conectado_em = None  # time.monotonic() da primeira conexão
+        self._motivo_reconexao = None
+        self._tags_novas = None  # tags trocadas pela validação do snapshot, aplicadas no próximo ciclo
+
+    @property
+    def nome(self):
+        return f"{self.linha}/{self.maquina}"
+
+    def conectar(self):
+        """Abre (ou reabre) a sessão OPC UA com backoff e resolve as tags; False se parar antes de conectar"""
+        if self._motivo_reconexao:
+            self.client = self.sessao.reconectar(self._motivo_reconexao, self.parar)
+        else:
+            self.client = self.sessao.conectar(self.parar)
+        if not self.client:
+            return False
+        self._motivo_reconexao = None
+        self.registro = RegistroTags(self.client, (self.pasta, self.linha, self.maquina), self.snapshot)
+        self.registro.ao_atualizar = self._ao_atualizar_tags
+        try:
+            with self._vigiar():
+                tags = self.registro.resolver()
+        except Exception as e:
+            # Sessão aberta mas máquina não resolvida: a próxima tentativa começa de uma sessão nova
+            self._motivo_reconexao = f"resolução das tags falhou: {e}"
+            self.desconectar()
+            raise
+        origem = " pelo snapshot" if self.registro.origem == "snapshot" else ""
+        print(f"✅ {self.nome}: conectado ({len(tags)} variáveis{origem})")
+        if self.conectado_em is None:
+            self.conectado_em = time.monotonic()
+
+        # Cada classe de varredura tem seu período; as tags que não casam usam o intervalo da máquina
+        self.grupos = agrupar_por_classe(tags, self.classes, f"{self.linha}/{self.maquina}/") or {CLASSE_PADRAO: []}
+        periodos = {c["nome"]: c["periodo_s"] for c in self.classes}
+        periodos[CLASSE_PADRAO] = self.intervalo
+        if self.adaptativo and CLASSE_PADRAO in self.grupos:
+            # Tags sem classe fixa: cada uma no período que sua frequência de mudança pede
+            self.taxa = TaxaAdaptativa(self.grupos[CLASSE_PADRAO], **self.adaptativo)
+            periodos[CLASSE_PADRAO] = self.taxa.periodo_min_s
+        self.agendador = Agendador({nome: periodos[nome] for nome in self.grupos})
+        if len(self.grupos) > 1:
+            print(f"   {self.nome}: " + ", ".join(f"{nome} {len(tags_classe)} tags a cada {periodos[nome]:g} s"
+                                                   for nome, tags_classe in self.grupos.items()))
+        return True
+
+    def desconectar(self):
+        """Fecha a sessão OPC UA"""
+        self.sessao.desconectar()
+        self.client = None
+
+    def _vigiar(self):
+        """Contexto das chamadas ao servidor: o vigia aborta a sessão se passar do prazo"""
+        if not self.vigia:
+            return contextlib.nullcontext()
+        return self.vigia.vigiar(self.nome, self.prazo_s, self._ao_travar)
+
+    def _ao_travar(self):
+        """Chamado pelo vigia (outra thread): derruba o socket para a chamada presa falhar já"""
+        self.travamentos += 1
+        self._motivo_reconexao = f"chamada travada por mais de {self.prazo_s:g} s"
+        self.sessao.abortar()
+
+    def _ao_atualizar_tags(self, tags):
+        """Chamado pela validação do snapshot (outra thread): só anota, o ciclo aplica"""
+        self._tags_novas = tags
+
+    def _reagrupar(self, tags):
+        """Redistribui as tags validadas entre as classes já agendadas"""
+        grupos = agrupar_por_classe(tags, self.classes, f"{self.linha}/{self.maquina}/")
+        agendadas = list(self.agendador.periodos)
+        destino_extra = CLASSE_PADRAO if CLASSE_PADRAO in agendadas else agendadas[0]
+        self.grupos = {nome: [] for nome in agendadas}
+        for nome, tags_classe in grupos.items():
+            # Uma classe que não tinha tags na partida não tem ciclo: vai para a padrão
+            self.grupos[nome if nome in self.grupos else destino_extra].extend(tags_classe)
+        if self.taxa:
+            self.taxa = TaxaAdaptativa(self.grupos[CLASSE_PADRAO], **self.adaptativo)
+
+    def ler_ciclo(self, classe=None):
+        """Lê as tags da classe (todas, por padrão) e envia para o escritor compartilhado"""
+        if self._tags_novas is not None:
+            tags_novas, self._tags_novas = self._tags_novas, None
+            self._reagrupar(tags_novas)
+        tags = self.grupos.get(classe) if classe else None
+        adaptativa = self.taxa if classe == CLASSE_PADRAO else None
+        if adaptativa:
+            tags = adaptativa.devidas()
+            if not tags:
+                return
+        with self._vigiar():
+            valores = self.registro.ler_valores(tags)
+        for tag, data_value in valores:
+            try:
+                if leitura_ruim(data_value):
+                    raise ValueError(f"status {data_value.StatusCode.name}")
+                coleta, origem, servidor = marcas_de_tempo(data_value)
+                self.escritor.adicionar(coleta, self.linha, self.maquina, tag.nome,
+                                        data_value.Value.Value, data_value.StatusCode.name,
+                                        origem, servidor, tipo_variante(data_value))
+                self.leituras += 1
+                if adaptativa:
+                    adaptativa.registrar(tag, data_value.Value.Value)
+            except Exception as e:
+                self.erros += 1
+                print(f"❌ {self.nome}: erro ao ler {tag.nome}: {e}")
+
+    def _ao_overrun(self, classe, duracao_ms):
+        """Registra um ciclo que passou do período da classe"""
+        self.overruns += 1
+        print(f"⏱️ {self.nome}: ciclo {classe} levou {duracao_ms:.0f} ms "
+              f"(período {self.agendador.periodos[classe]:g} s)")
+
+    def executar(self):
+        """Loop de coleta da máquina (roda em uma thread do pool)"""
+        while not self.parar.is_set():
+            try:
+                if not self.client and not self.conectar():
+                    break  # parar sinalizado durante o backoff
+                # Taxa fixa por classe na grade do relógio monotônico (sem deriva)
+                executar_agendado(self.agendador, self.ler_ciclo, self.parar, self._ao_overrun)
+            except Exception as e:
+                self.erros += 1
+                print(f"❌ {self.nome}: erro geral: {e}")
+                if self.client and (falha_de_conexao(e) or not self.sessao.verificar()):
+                    # Sessão perdida (ou abortada pelo vigia): reconecta já, em vez de insistir na sessão morta
+                    self._motivo_reconexao = self._motivo_reconexao or str(e) or type(e).__name__
+                    self.desconectar()
+                    continue
+                self.parar.wait(5)  # Pausa antes de tentar novamente
+        self.desconectar()
+        return self.leituras, self.erros
+
+
+def executar_coletor(config, duracao_s=None):
+    """Coleta todas as máquinas configuradas em paralelo, com um único escritor
+
+    duracao_s encerra a coleta sozinho (usado pelo benchmark); retorna o resumo da execução.
+    """
+    maquinas = config["maquinas"]
+    if not maquinas:
+        print("❌ Nenhuma máquina configurada. Saindo...")
+        return
+
+    conn = conectar_banco(config.get("banco"))
+    if not criar_tabelas(conn, config.get("particoes")):
+        conn.close()
+        return
+    conn.close()
+    parar_manutencao = iniciar_manutencao_periodica(config.get("banco"), config.get("particoes"))
+    # Histogramas servidos em /metrics e salvos em JSON ao encerrar
+    config_metricas = config.get("metricas", {})
+    iniciar_metricas(config_metricas.get("porta", 9108), config_metricas.get("host", "127.0.0.1"))
+    # Cada lote sai por uma conexão verificada do pool; uma conexão que cair é trocada sozinha
+    pool_banco = PoolBanco(config.get("banco"), **config.get("pool", {}))
+    escritor = EscritorLote(pool=pool_banco, **config.get("escritor", {}))
+
+    # A aquisição grava no buffer local; o drenador envia ao banco quando ele estiver disponível
+    buffer = drenador = None
+    if config.get("buffer"):
+        opcoes_buffer = dict(config["buffer"])
+        opcoes_drenador = {k: opcoes_buffer.pop(k) for k in ("tamanho_lote", "espera_max_s") if k in opcoes_buffer}
+        buffer = BufferLocal(**opcoes_buffer)
+        drenador = DrenadorBuffer(buffer, escritor, **opcoes_drenador).iniciar()
+    else:
+        escritor.iniciar_flush_periodico()
+    saida = buffer or escritor
+
+    # As threads de leitura só enfileiram; uma thread de gravação consome a fila
+    fila = FilaLeituras(saida, **config["fila"]).iniciar() if config.get("fila") else None
+    entrada = fila or saida
+    filtro = FiltroExcecao(entrada, **config["filtro"]) if config.get("filtro") else None
+
+    # Snapshot do espaço de endereços: partida sem navegar, validação em segundo plano.
+    # Sem arquivo configurado fica só em memória, para a resolução em lote valer para todas
+    snapshot = SnapshotTags(**config["snapshot"]) if config.get("snapshot") else SnapshotTags(None)
+    # Vigia único: uma máquina travada tem a sessão abortada e reciclada, as outras seguem
+    vigia = Vigia(config.get("vigia", {}).get("intervalo_s", 1.0)).iniciar()
+    resolver_em_lote(maquinas, snapshot, vigia)
+
+    parar = threading.Event()
+    coletores = [ColetorMaquina(definicao, filtro or entrada, parar, snapshot, vigia) for definicao in maquinas]
+    print(f"🔄 Coletando {len(coletores)} máquinas... (Pressione Ctrl+C para parar)")
+    print("=" * 50)
+
+    with ThreadPoolExecutor(max_workers=len(coletores), thread_name_prefix="coletor") as pool:
+        futuros = [pool.submit(coletor.executar) for coletor in coletores]
+        fim = time.monotonic() + duracao_s if duracao_s else None
+        try:
+            while not all(f.done() for f in futuros):
+                if fim is not None and time.monotonic() >= fim:
+                    break
+                time.sleep(10 if fim is None else max(0.0, min(10, fim - time.monotonic())))
+                leituras = sum(c.leituras for c in coletores)
+                erros = sum(c.erros for c in coletores)
+                overruns = sum(c.overruns for c in coletores)
+                print(f"\n📊 Estatísticas: {leituras} leituras, {erros} erros, {overruns} overruns")
+                adaptativas = [c.taxa for c in coletores if c.taxa]
+                if adaptativas:
+                    previstas = sum(t.leituras_por_segundo() for t in adaptativas)
+                    print(f"   📶 Polling adaptativo: {previstas:.1f} leituras/s previstas")
+                if filtro:
+                    print(f"   🔍 Filtro: {filtro.resumo()}")
+                if fila:
+                    print(f"   📥 Fila: {fila.resumo()}")
+                if buffer:
+                    print(f"   📦 Buffer: {buffer.resumo()}")
+                print(f"   💾 Gravação: {escritor.resumo()}")
+                reconexoes = sum(c.sessao.reconexoes for c in coletores)
+                if reconexoes:
+                    print(f"   🔌 {reconexoes} reconexões OPC UA ({vigia.travamentos} por travamento); "
+                          f"banco: {pool_banco.resumo()}")
+        except KeyboardInterrupt:
+            print("\n👋 Interrompido pelo usuário.")
+        finally:
+            parar.set()
+    fim_coleta = time.monotonic()
+    vigia.parar()
+
+    parar_manutencao.set()
+    if fila:
+        fila.fechar()
+    if buffer:
+        drenador.parar()
+        buffer.fechar()
+    escritor.fechar()
+    pool_banco.fechar()
+
+    print("\n📈 RESUMO FINAL:")
+    for coletor in coletores:
+        print(f"   {coletor.nome}: {coletor.leituras} leituras, {coletor.erros} erros")
+        if coletor.sessao.reconexoes:
+            print(f"      🔌 {coletor.sessao.resumo()}, {coletor.travamentos} travamentos")
+        if coletor.agendador:
+            print(f"      ⏱️ {coletor.agendador.resumo()}")
+        if coletor.taxa:
+            print(f"      📶 {coletor.taxa.resumo()}")
+    if buffer:
+        print(f"   📦 Buffer: {buffer.resumo()}")
+    print(f"   💾 Gravação: {escritor.resumo()}")
+    print(f"   🔌 Banco: {pool_banco.resumo()}")
+    encerrar_metricas(config_metricas.get("arquivo_json", "metricas_opcua.json"))
+    return {
+        "leituras": sum(c.leituras for c in coletores),
+        "erros": sum(c.erros for c in coletores),
+        "overruns": sum(c.overruns for c in coletores),
+        "travamentos": vigia.travamentos,
+        "maquinas": [{"nome": c.nome, "leituras": c.leituras, "erros": c.erros, "conectado_em": c.conectado_em}
+                     for c in coletores],
+        "fim_coleta": fim_coleta,
+        "escritor": escritor.estatisticas(),
+    }
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Coletor OPC UA multi-linha/multi-máquina")
+    parser.add_argument("--config", default="coletor_config.json",
+                        help="arquivo JSON com as linhas e máquinas a coletar")
+    args = parser.parse_args()
+
+    print("🚀 INICIANDO COLETOR OPC UA")
+    print("=" * 50)
+    executar_coletor(carregar_config(args.config))
+    print("👋 Programa finalizado.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,281 @@
+import os
 import psycopg2
-from datetime import datetime
+import re
+import threading
+from datetime import datetime, date, timedelta
+from rollups import ROLLUPS, reconstruir_rollups
 
-def conectar_banco():
+# Parâmetros padrão de conexão: variáveis de ambiente do PostgreSQL (PGDATABASE, PGUSER...) ou os
+# valores abaixo; podem ser sobrescritos pelo arquivo de configuração do coletor
+CONFIG_BANCO_PADRAO = {
+    "dbname": os.environ.get("PGDATABASE", "new_bd1"),
+    "user": os.environ.get("PGUSER", "postgres"),
+    "password": os.environ.get("PGPASSWORD", "postgres"),
+    "host": os.environ.get("PGHOST", "localhost"),
+    "port": os.environ.get("PGPORT", "5432")
+}
+
+# Particionamento de dados_opcua por tempo e política de retenção
+CONFIG_PARTICOES_PADRAO = {
+    "granularidade": "diaria",     # "diaria" ou "semanal"
+    "futuras": 7,                  # dias à frente com partição já criada
+    "retencao_dias": 90,           # partições inteiramente mais antigas que isso são removidas
+    "modo_retencao": "drop",       # "drop" apaga a partição; "detach" só desanexa (para arquivar)
+    "retencao_1min_dias": 30       # agregação de 1 minuto mais antiga que isso é apagada (a de 1 hora fica)
+}
+
+# Índices de dados_opcua, cada um ligado às consultas de consultas_postgres.md que ele atende
+INDICES_DADOS_OPCUA = [
+    ("idx_dados_opcua_tag_timestamp",
+     "CREATE INDEX IF NOT EXISTS idx_dados_opcua_tag_timestamp ON dados_opcua (tag_id, timestamp DESC)",
+     "filtro por linha/máquina/função + período; último valor de cada função"),
+    ("idx_dados_opcua_timestamp_brin",
+     "CREATE INDEX IF NOT EXISTS idx_dados_opcua_timestamp_brin ON dados_opcua USING BRIN (timestamp)",
+     "filtros só por período (última hora, hoje, últimas 24 horas)"),
+    ("idx_dados_opcua_qualidade_ruim",
+     "CREATE INDEX IF NOT EXISTS idx_dados_opcua_qualidade_ruim ON dados_opcua (timestamp) "
+     "WHERE qualidade <> 'Good'",
+     "dados com qualidade diferente de 'Good'"),
+]
+
+def parametros_banco(config=None):
+    """Parâmetros de conexão: os padrões com o que vier da configuração por cima"""
+    parametros = dict(CONFIG_BANCO_PADRAO)
+    if config:
+        parametros.update(config)
+    return parametros
+
+def conectar_banco(config=None):
     """Conecta ao banco de dados PostgreSQL"""
-    return psycopg2.connect(
-        dbname="new_bd1",
-        user="postgres",
-        password="postgres",
-        host="localhost",
-        port="5432"
-    )
-
-def criar_tabelas():
+    return psycopg2.connect(**parametros_banco(config))
+
+def _renomear_tabela_legada(cursor):
+    """Renomeia a dados_opcua do formato antigo (linha/maquina/funcao/dado em texto)"""
+    cursor.execute("""
+        SELECT 1
+        FROM information_schema.columns
+        WHERE table_name = 'dados_opcua' AND column_name = 'linha'
+    """)
+    if not cursor.fetchone():
+        return False
+    
+    cursor.execute("ALTER TABLE dados_opcua RENAME TO dados_opcua_legado")
+    cursor.execute("ALTER SEQUENCE IF EXISTS dados_opcua_id_seq RENAME TO dados_opcua_legado_id_seq")
+    cursor.execute("ALTER INDEX IF EXISTS dados_opcua_pkey RENAME TO dados_opcua_legado_pkey")
+    print("⚠️ Tabela 'dados_opcua' no formato antigo renomeada para 'dados_opcua_legado'")
+    print("   Use a opção 'Migrar dados legados' para copiar o histórico")
+    return True
+
+def _renomear_tabela_sem_particao(cursor):
+    """Renomeia a dados_opcua normalizada criada antes do particionamento (tabela comum)
+
+    CREATE TABLE IF NOT EXISTS não a transformaria em particionada e a partição padrão
+    falharia; ela é renomeada (com sequência e índices) e copiada depois por
+    _copiar_tabela_sem_particao.
+    """
+    cursor.execute("""
+        SELECT c.relkind = 'r'
+        FROM pg_class c
+        WHERE c.oid = to_regclass('dados_opcua')
+    """)
+    linha = cursor.fetchone()
+    if not linha or not linha[0]:  # não existe ou já é particionada (relkind 'p')
+        return False
+    
+    cursor.execute("ALTER TABLE dados_opcua RENAME TO dados_opcua_sem_particao")
+    cursor.execute("ALTER SEQUENCE IF EXISTS dados_opcua_id_seq RENAME TO dados_opcua_sem_particao_id_seq")
+    # Libera os nomes dos índices para os índices da tabela particionada
+    cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = 'dados_opcua_sem_particao'")
+    for (indice,) in cursor.fetchall():
+        cursor.execute(f"ALTER INDEX {indice} RENAME TO "
+                       f"{indice.replace('dados_opcua', 'dados_opcua_sem_particao', 1)[:63]}")
+    print("⚠️ Tabela 'dados_opcua' sem particionamento renomeada para 'dados_opcua_sem_particao'")
+    return True
+
+def _copiar_tabela_sem_particao(cursor, granularidade):
+    """Copia dados_opcua_sem_particao para a dados_opcua particionada, mantendo os ids"""
+    cursor.execute("SELECT MIN(timestamp) FROM dados_opcua_sem_particao")
+    mais_antigo = cursor.fetchone()[0]
+    if mais_antigo:
+        criar_particoes(cursor, mais_antigo.date(), date.today(), granularidade)
+    
+    print("🔄 Copiando 'dados_opcua_sem_particao' para a tabela particionada...")
+    cursor.execute("""
+        INSERT INTO dados_opcua (id, timestamp, tag_id, valor_num, valor_int, valor_bool, valor_texto, qualidade)
+        SELECT id, timestamp, tag_id, valor_num, valor_int, valor_bool, valor_texto, qualidade
+        FROM dados_opcua_sem_particao
+    """)
+    copiados = cursor.rowcount
+    # A sequência nova continua de onde a antiga parou (ids novos acima dos copiados)
+    cursor.execute("""
+        SELECT setval(pg_get_serial_sequence('dados_opcua', 'id'),
+                      GREATEST((SELECT MAX(id) FROM dados_opcua), 1))
+    """)
+    print(f"✓ {copiados} registros copiados para 'dados_opcua'")
+    print("   Após conferir, a tabela 'dados_opcua_sem_particao' pode ser removida")
+    return copiados
+
+def _inicio_periodo(dia, granularidade):
+    """Início do período (dia ou semana começando na segunda) que contém o dia"""
+    if granularidade == "semanal":
+        return dia - timedelta(days=dia.weekday())
+    return dia
+
+def _duracao_periodo(granularidade):
+    """Tamanho de uma partição"""
+    return timedelta(days=7 if granularidade == "semanal" else 1)
+
+def listar_particoes(cursor):
+    """Retorna [(nome, inicio, fim)] das partições de dados_opcua (sem a padrão)"""
+    cursor.execute("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'dados_opcua'::regclass
+        ORDER BY c.relname
+    """)
+    particoes = []
+    for nome, limites in cursor.fetchall():
+        encontrado = re.search(r"FROM \('([^']+)'\) TO \('([^']+)'\)", limites or "")
+        if not encontrado:
+            continue
+        inicio, fim = (datetime.strptime(v[:10], "%Y-%m-%d").date() for v in encontrado.groups())
+        particoes.append((nome, inicio, fim))
+    return particoes
+
+def criar_particao(cursor, inicio, granularidade, existentes=None):
+    """Cria a partição que começa em 'inicio', se o período ainda não estiver coberto"""
+    fim = inicio + _duracao_periodo(granularidade)
+    if existentes is None:
+        existentes = listar_particoes(cursor)
+    if any(inicio < e_fim and e_inicio < fim for _, e_inicio, e_fim in existentes):
+        return False
+    
+    nome = f"dados_opcua_p{inicio:%Y%m%d}"
+    cursor.execute(f"CREATE TABLE {nome} (LIKE dados_opcua INCLUDING DEFAULTS)")
+    
+    # Linhas desse período que caíram na partição padrão passam para a nova partição
+    cursor.execute(f"""
+        WITH movidos AS (
+            DELETE FROM dados_opcua_padrao
+            WHERE timestamp >= %s AND timestamp < %s
+            RETURNING *
+        )
+        INSERT INTO {nome} SELECT * FROM movidos
+    """, (inicio, fim))
+    
+    cursor.execute(f"""
+        ALTER TABLE dados_opcua ATTACH PARTITION {nome}
+        FOR VALUES FROM ('{inicio:%Y-%m-%d}') TO ('{fim:%Y-%m-%d}')
+    """)
+    existentes.append((nome, inicio, fim))
+    return True
+
+def criar_particoes(cursor, inicio, fim, granularidade):
+    """Garante partições cobrindo o intervalo [inicio, fim]; retorna quantas foram criadas"""
+    existentes = listar_particoes(cursor)
+    criadas = 0
+    atual = _inicio_periodo(inicio, granularidade)
+    while atual <= fim:
+        if criar_particao(cursor, atual, granularidade, existentes):
+            criadas += 1
+        atual += _duracao_periodo(granularidade)
+    return criadas
+
+def aplicar_retencao(cursor, retencao_dias, modo="drop"):
+    """Remove (ou desanexa) partições inteiramente mais antigas que a retenção"""
+    limite = date.today() - timedelta(days=retencao_dias)
+    removidas = []
+    for nome, inicio, fim in listar_particoes(cursor):
+        if fim > limite:
+            continue
+        cursor.execute(f"ALTER TABLE dados_opcua DETACH PARTITION {nome}")
+        if modo == "drop":
+            cursor.execute(f"DROP TABLE {nome}")
+        removidas.append(nome)
+    return removidas
+
+def manutencao_particoes(conn=None, config_particoes=None):
+    """Cria as partições futuras e aplica a retenção (operações só de metadados)"""
+    config_particoes = dict(CONFIG_PARTICOES_PADRAO, **(config_particoes or {}))
+    conexao_propria = conn is None
+    if conexao_propria:
+        conn = conectar_banco()
+    cursor = conn.cursor()
+    
+    try:
+        hoje = date.today()
+        criadas = criar_particoes(cursor, hoje, hoje + timedelta(days=config_particoes["futuras"]),
+                                  config_particoes["granularidade"])
+        removidas = aplicar_retencao(cursor, config_particoes["retencao_dias"],
+                                     config_particoes["modo_retencao"])
+        cursor.execute("DELETE FROM dados_opcua_1min WHERE inicio < %s",
+                       (date.today() - timedelta(days=config_particoes["retencao_1min_dias"]),))
+        conn.commit()
+        
+        print(f"✓ Manutenção de partições: {criadas} criadas, {len(removidas)} "
+              f"{'removidas' if config_particoes['modo_retencao'] == 'drop' else 'desanexadas'}")
+        for nome in removidas:
+            print(f"  - {nome}")
+        return criadas, removidas
+        
+    except Exception as e:
+        print(f"❌ Erro na manutenção de partições: {e}")
+        conn.rollback()
+        return 0, []
+    finally:
+        cursor.close()
+        if conexao_propria:
+            conn.close()
+
+def iniciar_manutencao_periodica(config_banco=None, config_particoes=None, intervalo_s=3600):
+    """Roda a manutenção de partições em uma thread de fundo, com conexão própria"""
+    parar = threading.Event()
+    
+    def loop():
+        while not parar.wait(intervalo_s):
+            try:
+                conn = conectar_banco(config_banco)
+                try:
+                    manutencao_particoes(conn, config_particoes)
+                finally:
+                    conn.close()
+            except Exception as e:
+                print(f"❌ Erro na manutenção periódica: {e}")
+    
+    threading.Thread(target=loop, name="manutencao-particoes", daemon=True).start()
+    return parar
+
+def preencher_valores_atuais(cursor):
+    """Recalcula dados_opcua_atual a partir do histórico (uma busca no índice por tag)"""
+    cursor.execute("""
+        INSERT INTO dados_opcua_atual (tag_id, timestamp, valor_num, valor_int, valor_bool, valor_texto, qualidade)
+        SELECT t.id, u.timestamp, u.valor_num, u.valor_int, u.valor_bool, u.valor_texto, u.qualidade
+        FROM tags_opcua t
+        CROSS JOIN LATERAL (
+            SELECT d.timestamp, d.valor_num, d.valor_int, d.valor_bool, d.valor_texto, d.qualidade
+            FROM dados_opcua d
+            WHERE d.tag_id = t.id
+            ORDER BY d.timestamp DESC
+            LIMIT 1
+        ) u
+        ON CONFLICT (tag_id) DO UPDATE SET
+            timestamp = EXCLUDED.timestamp,
+            valor_num = EXCLUDED.valor_num,
+            valor_int = EXCLUDED.valor_int,
+            valor_bool = EXCLUDED.valor_bool,
+            valor_texto = EXCLUDED.valor_texto,
+            qualidade = EXCLUDED.qualidade
+        WHERE dados_opcua_atual.timestamp <= EXCLUDED.timestamp
+    """)
+    return cursor.rowcount
+
+def criar_tabelas(conn=None, config_particoes=None):
     """Cria todas as tabelas necessárias"""
-    conn = conectar_banco()
+    config_particoes = dict(CONFIG_PARTICOES_PADRAO, **(config_particoes or {}))
+    conexao_propria = conn is None
+    if conexao_propria:
+        conn = conectar_banco()
     cursor = conn.cursor()
     
     try:
@@ -37,33 +299,140 @@ def criar_tabelas():
         """)
         print("✓ Tabela 'maquinas' criada/verificada")
         
-        # Criar tabela dados_opcua
+        # Criar tabela tags_opcua (dimensão: um id inteiro por linha/máquina/função)
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS dados_opcua (
+            CREATE TABLE IF NOT EXISTS tags_opcua (
                 id SERIAL PRIMARY KEY,
-                timestamp TIMESTAMP NOT NULL,
                 linha VARCHAR(100) NOT NULL,
                 maquina VARCHAR(100) NOT NULL,
                 funcao VARCHAR(100) NOT NULL,
-                dado TEXT NOT NULL,
-                qualidade VARCHAR(50) NOT NULL
+                UNIQUE (linha, maquina, funcao)
             )
         """)
+        print("✓ Tabela 'tags_opcua' criada/verificada")
+        
+        # Criar tabela dados_opcua (valor tipado; só uma das colunas valor_* é preenchida)
+        _renomear_tabela_legada(cursor)
+        sem_particao = _renomear_tabela_sem_particao(cursor)
+        # Particionada por timestamp: consultas por período só leem as partições do período
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS dados_opcua (
+                id BIGSERIAL,
+                timestamp TIMESTAMP NOT NULL,
+                tag_id INTEGER NOT NULL REFERENCES tags_opcua(id),
+                valor_num DOUBLE PRECISION,
+                valor_int BIGINT,
+                valor_bool BOOLEAN,
+                valor_texto TEXT,
+                qualidade VARCHAR(50) NOT NULL,
+                timestamp_origem TIMESTAMP,
+                timestamp_servidor TIMESTAMP,
+                tipo_variante VARCHAR(20),
+                PRIMARY KEY (id, timestamp)
+            ) PARTITION BY RANGE (timestamp)
+        """)
+        # Tabelas criadas antes das marcas de tempo OPC UA (colunas nulas: só altera o catálogo)
+        for coluna, tipo in (("timestamp_origem", "TIMESTAMP"), ("timestamp_servidor", "TIMESTAMP"),
+                             ("tipo_variante", "VARCHAR(20)")):
+            cursor.execute(f"ALTER TABLE dados_opcua ADD COLUMN IF NOT EXISTS {coluna} {tipo}")
+        # Partição padrão: recebe o que chegar fora das partições criadas (ex.: relógio errado)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS dados_opcua_padrao
+            PARTITION OF dados_opcua DEFAULT
+        """)
+        if sem_particao:
+            _copiar_tabela_sem_particao(cursor, config_particoes["granularidade"])
         print("✓ Tabela 'dados_opcua' criada/verificada")
         
+        hoje = date.today()
+        criadas = criar_particoes(cursor, hoje, hoje + timedelta(days=config_particoes["futuras"]),
+                                  config_particoes["granularidade"])
+        print(f"✓ Partições de 'dados_opcua' verificadas ({criadas} novas)")
+        
+        # Índices no pai são replicados automaticamente em todas as partições
+        for nome, ddl, _ in INDICES_DADOS_OPCUA:
+            cursor.execute(ddl)
+        print(f"✓ Índices de 'dados_opcua' criados/verificados ({len(INDICES_DADOS_OPCUA)})")
+        
+        # View com as colunas no formato antigo, para consultas manuais
+        cursor.execute("""
+            CREATE OR REPLACE VIEW vw_dados_opcua AS
+            SELECT d.id, d.timestamp, t.linha, t.maquina, t.funcao,
+                   COALESCE(d.valor_texto, d.valor_num::text, d.valor_int::text, d.valor_bool::text) AS dado,
+                   d.qualidade, d.timestamp_origem, d.timestamp_servidor, d.tipo_variante
+            FROM dados_opcua d
+            JOIN tags_opcua t ON t.id = d.tag_id
+        """)
+        print("✓ View 'vw_dados_opcua' criada/verificada")
+        
+        # Criar tabela dados_opcua_atual (último valor de cada tag, atualizado junto com cada lote)
+        cursor.execute("SELECT to_regclass('dados_opcua_atual') IS NULL")
+        tabela_nova = cursor.fetchone()[0]
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS dados_opcua_atual (
+                tag_id INTEGER PRIMARY KEY REFERENCES tags_opcua(id),
+                timestamp TIMESTAMP NOT NULL,
+                valor_num DOUBLE PRECISION,
+                valor_int BIGINT,
+                valor_bool BOOLEAN,
+                valor_texto TEXT,
+                qualidade VARCHAR(50) NOT NULL
+            )
+        """)
+        if tabela_nova:
+            preencher_valores_atuais(cursor)
+        cursor.execute("""
+            CREATE OR REPLACE VIEW vw_dados_opcua_atual AS
+            SELECT a.timestamp, t.linha, t.maquina, t.funcao,
+                   COALESCE(a.valor_texto, a.valor_num::text, a.valor_int::text, a.valor_bool::text) AS dado,
+                   a.qualidade
+            FROM dados_opcua_atual a
+            JOIN tags_opcua t ON t.id = a.tag_id
+        """)
+        print("✓ Tabela 'dados_opcua_atual' e view 'vw_dados_opcua_atual' criadas/verificadas")
+        
+        # Criar tabelas de agregação (1 minuto e 1 hora), somadas a cada lote gravado
+        cursor.execute("SELECT to_regclass('dados_opcua_1min') IS NULL")
+        rollups_novos = cursor.fetchone()[0]
+        for tabela, _ in ROLLUPS:
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {tabela} (
+                    tag_id INTEGER NOT NULL REFERENCES tags_opcua(id),
+                    inicio TIMESTAMP NOT NULL,
+                    contagem INTEGER NOT NULL,
+                    contagem_num INTEGER NOT NULL,
+                    minimo DOUBLE PRECISION,
+                    maximo DOUBLE PRECISION,
+                    soma DOUBLE PRECISION NOT NULL,
+                    ultimo_timestamp TIMESTAMP NOT NULL,
+                    ultimo_num DOUBLE PRECISION,
+                    ultimo_texto TEXT,
+                    PRIMARY KEY (tag_id, inicio)
+                )
+            """)
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{tabela}_inicio ON {tabela} USING BRIN (inicio)")
+        if rollups_novos:
+            reconstruir_rollups(cursor)
+        print(f"✓ Tabelas de agregação criadas/verificadas ({', '.join(t for t, _ in ROLLUPS)})")
+        
         conn.commit()
         print("\n🎉 Todas as tabelas foram criadas com sucesso!")
+        return True
         
     except Exception as e:
         print(f"❌ Erro ao criar tabelas: {e}")
         conn.rollback()
+        return False
     finally:
         cursor.close()
-        conn.close()
+        if conexao_propria:
+            conn.close()
 
-def inserir_dados_iniciais():
+def inserir_dados_iniciais(conn=None):
     """Insere dados iniciais nas tabelas"""
-    conn = conectar_banco()
+    conexao_propria = conn is None
+    if conexao_propria:
+        conn = conectar_banco()
     cursor = conn.cursor()
     
     try:
@@ -91,6 +460,110 @@ def inserir_dados_iniciais():
     except Exception as e:
         print(f"❌ Erro ao inserir dados iniciais: {e}")
         conn.rollback()
+    finally:
+        cursor.close()
+        if conexao_propria:
+            conn.close()
+
+def migrar_dados_legados():
+    """Copia o histórico de dados_opcua_legado para o formato normalizado"""
+    conn = conectar_banco()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("SELECT to_regclass('dados_opcua_legado')")
+        if cursor.fetchone()[0] is None:
+            print("✓ Não há tabela legada para migrar")
+            return
+        
+        print("🔄 Migrando dados legados...")
+        
+        # Partições para todo o período do histórico antigo
+        cursor.execute("SELECT MIN(timestamp) FROM dados_opcua_legado")
+        mais_antigo = cursor.fetchone()[0]
+        if mais_antigo:
+            criar_particoes(cursor, mais_antigo.date(), date.today(),
+                            CONFIG_PARTICOES_PADRAO["granularidade"])
+        
+        cursor.execute("""
+            INSERT INTO tags_opcua (linha, maquina, funcao)
+            SELECT DISTINCT linha, maquina, funcao FROM dados_opcua_legado
+            ON CONFLICT (linha, maquina, funcao) DO NOTHING
+        """)
+        
+        # Converte o texto de volta para o tipo original quando possível
+        cursor.execute("""
+            INSERT INTO dados_opcua (timestamp, tag_id, valor_num, valor_int, valor_bool, valor_texto, qualidade)
+            SELECT l.timestamp, t.id,
+                   CASE WHEN l.dado ~ '^-?([0-9]+[.]?[0-9]*|[.][0-9]+)([eE][-+]?[0-9]+)?$'
+                         AND l.dado !~ '^-?[0-9]{1,18}$' THEN l.dado::double precision END,
+                   CASE WHEN l.dado ~ '^-?[0-9]{1,18}$' THEN l.dado::bigint END,
+                   CASE WHEN l.dado IN ('True', 'False') THEN l.dado::boolean END,
+                   CASE WHEN l.dado !~ '^-?([0-9]+[.]?[0-9]*|[.][0-9]+)([eE][-+]?[0-9]+)?$'
+                         AND l.dado NOT IN ('True', 'False') THEN l.dado END,
+                   l.qualidade
+            FROM dados_opcua_legado l
+            JOIN tags_opcua t ON t.linha = l.linha AND t.maquina = l.maquina AND t.funcao = l.funcao
+        """)
+        migrados = cursor.rowcount
+        preencher_valores_atuais(cursor)
+        if mais_antigo:
+            reconstruir_rollups(cursor, mais_antigo)
+        
+        conn.commit()
+        print(f"✓ {migrados} registros migrados para 'dados_opcua'")
+        print("   Após conferir, a tabela 'dados_opcua_legado' pode ser removida")
+        
+    except Exception as e:
+        print(f"❌ Erro ao migrar dados legados: {e}")
+        conn.rollback()
+    finally:
+        cursor.close()
+        conn.close()
+
+def verificar_indices():
+    """Mostra índices esperados que faltam e índices que nunca foram usados"""
+    conn = conectar_banco()
+    cursor = conn.cursor()
+    
+    try:
+        print("\n🔎 VERIFICAÇÃO DE ÍNDICES:")
+        print("=" * 50)
+        
+        cursor.execute("""
+            SELECT indexname FROM pg_indexes
+            WHERE schemaname = 'public' AND tablename = 'dados_opcua'
+        """)
+        existentes = {linha[0] for linha in cursor.fetchall()}
+        
+        print("\n📋 Índices esperados:")
+        for nome, _, consultas in INDICES_DADOS_OPCUA:
+            estado = "✓" if nome in existentes else "❌ FALTANDO"
+            print(f"  {estado} {nome} - {consultas}")
+        
+        # Índices das partições são somados no índice do pai (os nomes das partições variam)
+        cursor.execute("""
+            SELECT COALESCE(pai.relname, s.indexrelname) AS indice,
+                   SUM(s.idx_scan) AS leituras,
+                   pg_size_pretty(SUM(pg_relation_size(s.indexrelid))::bigint) AS tamanho
+            FROM pg_stat_user_indexes s
+            JOIN pg_index i ON i.indexrelid = s.indexrelid
+            LEFT JOIN pg_inherits h ON h.inhrelid = s.indexrelid
+            LEFT JOIN pg_class pai ON pai.oid = h.inhparent
+            WHERE s.schemaname = 'public'
+              AND NOT i.indisunique
+            GROUP BY 1
+            HAVING SUM(s.idx_scan) = 0
+            ORDER BY 1
+        """)
+        nao_usados = cursor.fetchall()
+        
+        print(f"\n💤 Índices sem nenhum uso desde o último reset de estatísticas ({len(nao_usados)}):")
+        for indice, _, tamanho in nao_usados:
+            print(f"  - {indice} ({tamanho})")
+        
+    except Exception as e:
+        print(f"❌ Erro ao verificar índices: {e}")
     finally:
         cursor.close()
         conn.close()
@@ -130,6 +603,19 @@ def visualizar_estrutura():
         for col in cursor.fetchall():
             print(f"  {col[0]}: {col[1]} {'(NULL)' if col[2] == 'YES' else '(NOT NULL)'}")
         
+        # Mostrar estrutura da tabela tags_opcua
+        cursor.execute("""
+            SELECT column_name, data_type, is_nullable, column_default
+            FROM information_schema.columns 
+            WHERE table_name = 'tags_opcua'
+            ORDER BY ordinal_position
+        """)
+        
+        print("\n📋 TABELA: tags_opcua")
+        print("-" * 30)
+        for col in cursor.fetchall():
+            print(f"  {col[0]}: {col[1]} {'(NULL)' if col[2] == 'YES' else '(NOT NULL)'}")
+        
         # Mostrar estrutura da tabela dados_opcua
         cursor.execute("""
             SELECT column_name, data_type, is_nullable, column_default
@@ -143,6 +629,19 @@ def visualizar_estrutura():
         for col in cursor.fetchall():
             print(f"  {col[0]}: {col[1]} {'(NULL)' if col[2] == 'YES' else '(NOT NULL)'}")
         
+        # Mostrar estrutura da tabela dados_opcua_atual
+        cursor.execute("""
+            SELECT column_name, data_type, is_nullable, column_default
+            FROM information_schema.columns 
+            WHERE table_name = 'dados_opcua_atual'
+            ORDER BY ordinal_position
+        """)
+        
+        print("\n📋 TABELA: dados_opcua_atual")
+        print("-" * 30)
+        for col in cursor.fetchall():
+            print(f"  {col[0]}: {col[1]} {'(NULL)' if col[2] == 'YES' else '(NOT NULL)'}")
+        
     except Exception as e:
         print(f"❌ Erro ao visualizar estrutura: {e}")
     finally:
@@ -181,8 +680,15 @@ def mostrar_dados():
         count = cursor.fetchone()[0]
         print(f"\n📊 Dados OPC UA: {count} registros")
         
+        cursor.execute("SELECT COUNT(*) FROM tags_opcua")
+        print(f"🏷️ Tags cadastradas: {cursor.fetchone()[0]}")
+        
+        cursor.execute("SELECT COUNT(*), MAX(timestamp) FROM dados_opcua_atual")
+        atuais, mais_recente = cursor.fetchone()
+        print(f"📍 Valores atuais: {atuais} tags (mais recente: {mais_recente})")
+        
         if count > 0:
-            cursor.execute("SELECT * FROM dados_opcua ORDER BY timestamp DESC LIMIT 5")
+            cursor.execute("SELECT * FROM vw_dados_opcua ORDER BY timestamp DESC LIMIT 5")
             dados = cursor.fetchall()
             print("Últimos 5 registros:")
             for dado in dados:
@@ -204,7 +710,10 @@ if __name__ == "__main__":
         print("2. Inserir dados iniciais")
         print("3. Visualizar estrutura")
         print("4. Mostrar dados")
-        print("5. Sair")
+        print("5. Migrar dados legados")
+        print("6. Manutenção de partições")
+        print("7. Verificar índices")
+        print("8. Sair")
         
         opcao = input("\nOpção: ").strip()
         
@@ -217,6 +726,12 @@ if __name__ == "__main__":
         elif opcao == "4":
             mostrar_dados()
         elif opcao == "5":
+            migrar_dados_legados()
+        elif opcao == "6":
+            manutencao_particoes()
+        elif opcao == "7":
+            verificar_indices()
+        elif opcao == "8":
             print("👋 Saindo...")
             break
         else:
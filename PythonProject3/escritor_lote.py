@@ -0,0 +1,376 @@
+import io
+import threading
+import time
+from collections import ChainMap
+from datetime import datetime, timezone
+from rollups import atualizar_rollups, colunas_do_lote, marcadores_unnest
+from metricas import METRICAS
+
+
+def _escapar_copy(valor):
+    """Converte um valor para o formato texto do COPY do PostgreSQL"""
+    if valor is None:
+        return "\\N"
+    texto = str(valor)
+    return (texto.replace("\\", "\\\\")
+                 .replace("\t", "\\t")
+                 .replace("\n", "\\n")
+                 .replace("\r", "\\r"))
+
+
+def valor_tipado(valor):
+    """Separa o valor nas colunas (valor_num, valor_int, valor_bool, valor_texto)"""
+    if valor is None:
+        return None, None, None, None
+    if isinstance(valor, bool):
+        return None, None, valor, None
+    if isinstance(valor, int):
+        if -2**63 <= valor < 2**63:
+            return None, valor, None, None
+        return float(valor), None, None, None
+    if isinstance(valor, float):
+        return valor, None, None, None
+    return None, None, None, str(valor)
+
+
+def _hora_local(instante):
+    """Converte um instante do OPC UA (UTC, sem fuso) para a hora local sem fuso usada nas tabelas"""
+    if instante is None or instante.year <= 1601:  # 1601-01-01 é o "sem data" do OPC UA
+        return None
+    if instante.tzinfo is None:
+        instante = instante.replace(tzinfo=timezone.utc)
+    return instante.astimezone().replace(tzinfo=None)
+
+
+def marcas_de_tempo(data_value, agora=None):
+    """(coleta, origem, servidor) de um DataValue lido ou notificado
+
+    coleta, que vai para a coluna timestamp (chave de partição), é a hora da amostragem;
+    origem é o SourceTimestamp (quando o valor mudou no dispositivo) e servidor o
+    ServerTimestamp, gravados só em timestamp_origem/timestamp_servidor. O SourceTimestamp
+    não anda enquanto o valor não muda, por isso não serve de chave de partição.
+    """
+    coleta = datetime.now() if agora is None else agora
+    return coleta, _hora_local(data_value.SourceTimestamp), _hora_local(data_value.ServerTimestamp)
+
+
+def hora_do_evento(leitura):
+    """Hora em que o valor da leitura mudou: origem, senão servidor, senão a coleta
+
+    leitura: (timestamp, linha, maquina, funcao, dado, qualidade, origem, servidor, tipo)
+    """
+    return leitura[6] or leitura[7] or leitura[0]
+
+
+def leitura_ruim(data_value):
+    """True se o StatusCode do DataValue é Bad (erro de leitura)
+
+    Regra dos dois motores: Good e Uncertain são gravados com o nome da qualidade; só Bad é descartado.
+    """
+    return bool(data_value.StatusCode.value & 0x80000000)  # severidade nos dois bits altos: 10 = Bad
+
+
+def tipo_variante(data_value):
+    """Nome do tipo do Variant lido (Double, Int32, Boolean, String...) ou None"""
+    tipo = getattr(data_value.Value, "VariantType", None)
+    return tipo.name if tipo is not None else None
+
+
+# Colunas gravadas em dados_opcua pelo COPY dos escritores (sync e async)
+COLUNAS_DADOS = ("timestamp", "tag_id", "valor_num", "valor_int", "valor_bool", "valor_texto", "qualidade",
+                 "timestamp_origem", "timestamp_servidor", "tipo_variante")
+
+CANAL_NOTIFICACAO = "dados_opcua"
+
+
+def sql_cadastrar_tags(marcador="%s"):
+    """INSERT das tags que faltam (parâmetros: arrays de linha, máquina e função)"""
+    return f"""
+        INSERT INTO tags_opcua (linha, maquina, funcao)
+        SELECT * FROM unnest({marcadores_unnest(("varchar",) * 3, marcador)})
+        ON CONFLICT (linha, maquina, funcao) DO NOTHING
+    """
+
+
+def sql_ids_das_tags(marcador="%s"):
+    """SELECT dos ids das tags informadas (mesmos parâmetros de sql_cadastrar_tags)"""
+    return f"""
+        SELECT t.id, t.linha, t.maquina, t.funcao
+        FROM tags_opcua t
+        JOIN unnest({marcadores_unnest(("varchar",) * 3, marcador)}) AS n(linha, maquina, funcao)
+          ON t.linha = n.linha AND t.maquina = n.maquina AND t.funcao = n.funcao
+    """
+
+
+def sql_valores_atuais(marcador="%s"):
+    """Upsert em dados_opcua_atual que não sobrescreve um valor mais novo"""
+    tipos = ("timestamp", "integer", "double precision", "bigint", "boolean", "text", "varchar")
+    return f"""
+        INSERT INTO dados_opcua_atual (timestamp, tag_id, valor_num, valor_int, valor_bool, valor_texto, qualidade)
+        SELECT * FROM unnest({marcadores_unnest(tipos, marcador)})
+        ON CONFLICT (tag_id) DO UPDATE SET
+            timestamp = EXCLUDED.timestamp,
+            valor_num = EXCLUDED.valor_num,
+            valor_int = EXCLUDED.valor_int,
+            valor_bool = EXCLUDED.valor_bool,
+            valor_texto = EXCLUDED.valor_texto,
+            qualidade = EXCLUDED.qualidade
+        WHERE dados_opcua_atual.timestamp <= EXCLUDED.timestamp
+    """
+
+
+def sql_notificar_lote(marcador="%s"):
+    """pg_notify com o resumo do lote (parâmetros de parametros_notificacao)
+
+    id_max é o último id do lote, não uma marca de commit: com escritores concorrentes, um lote
+    com ids menores pode ser confirmado depois (ver monitor_dados.novos_desde).
+    """
+    canal, linhas, tags, timestamp_max = ("$1", "$2", "$3", "$4") if marcador == "$" else ("%s",) * 4
+    return f"""
+        SELECT pg_notify({canal}, json_build_object(
+            'linhas', {linhas}::integer,
+            'tags', {tags}::integer,
+            'id_max', currval(pg_get_serial_sequence('dados_opcua', 'id')),
+            'timestamp_max', {timestamp_max}::timestamp
+        )::text)
+    """
+
+
+def preparar_registros(linhas, tag_ids):
+    """Converte as leituras do lote em registros de dados_opcua (COLUNAS_DADOS)
+
+    Em ordem de evento (o id segue a ordem em que os valores mudaram); timestamp continua a coleta.
+    """
+    return [(timestamp, tag_ids[(linha, maquina, funcao)]) + valor_tipado(dado) + (qualidade, origem, servidor, tipo)
+            for timestamp, linha, maquina, funcao, dado, qualidade, origem, servidor, tipo
+            in sorted(linhas, key=hora_do_evento)]
+
+
+def ultimos_por_tag(registros):
+    """Mantém só o registro mais recente de cada tag_id, ordenado por tag_id
+
+    registros: (timestamp, tag_id, valor_num, valor_int, valor_bool, valor_texto, qualidade, ...)
+    A ordenação por tag_id evita deadlock entre escritores que atualizam as mesmas linhas.
+    """
+    ultimos = {}
+    for registro in registros:
+        atual = ultimos.get(registro[1])
+        if atual is None or registro[0] >= atual[0]:
+            ultimos[registro[1]] = registro
+    return [ultimos[tag_id] for tag_id in sorted(ultimos)]
+
+
+def parametros_valores_atuais(registros):
+    """Parâmetros de sql_valores_atuais: o último registro de cada tag, por coluna"""
+    return colunas_do_lote(registro[:7] for registro in ultimos_por_tag(registros))
+
+
+def parametros_notificacao(registros):
+    """Parâmetros de sql_notificar_lote: canal, linhas, tags distintas e maior timestamp"""
+    return CANAL_NOTIFICACAO, len(registros), len({r[1] for r in registros}), max(r[0] for r in registros)
+
+
+def resolver_tag_ids(cursor, chaves):
+    """Cadastra as tags que faltam e retorna {(linha, maquina, funcao): id}"""
+    parametros = colunas_do_lote(chaves)
+    cursor.execute(sql_cadastrar_tags(), parametros)
+    cursor.execute(sql_ids_das_tags(), parametros)
+    return {(linha, maquina, funcao): tag_id for tag_id, linha, maquina, funcao in cursor.fetchall()}
+
+
+def atualizar_valores_atuais(cursor, registros):
+    """Upsert em dados_opcua_atual (uma linha por tag) com o último valor do lote
+
+    Não sobrescreve um valor mais novo (ex.: leituras antigas reenviadas pelo buffer local).
+    """
+    parametros = parametros_valores_atuais(registros)
+    if not parametros:
+        return 0
+    cursor.execute(sql_valores_atuais(), parametros)
+    return len(parametros[0])
+
+
+def notificar_lote(cursor, registros):
+    """NOTIFY com o resumo do lote; só é entregue aos ouvintes quando a transação faz commit"""
+    cursor.execute(sql_notificar_lote(), parametros_notificacao(registros))
+
+
+class EscritorLote:
+    """Acumula leituras e grava na tabela dados_opcua em lote (COPY + um único commit)
+
+    Com um PoolBanco, cada lote usa uma conexão emprestada do pool: se a conexão cair,
+    o lote falha, ela é descartada e o próximo lote já sai por uma conexão nova.
+    """
+
+    COLUNAS = COLUNAS_DADOS
+
+    def __init__(self, conn=None, max_linhas=1000, max_ms=1000, rollups=True, pool=None):
+        self.conn = conn
+        self.pool = pool  # PoolBanco (substitui conn)
+        self.max_linhas = max_linhas
+        self.max_ms = max_ms
+        self.rollups = rollups  # mantém dados_opcua_1min / dados_opcua_1h junto com cada lote
+
+        self._linhas = []
+        self._inicio_lote = None
+        self._lock = threading.Lock()
+        self._lock_gravacao = threading.Lock()
+        self._tag_ids = {}  # (linha, maquina, funcao) -> tags_opcua.id
+        self._thread = None
+        self._parar = threading.Event()
+        self._acordar = threading.Event()
+
+        # Estatísticas
+        self.linhas_gravadas = 0
+        self.lotes_gravados = 0
+        self.linhas_descartadas = 0
+        self.tempo_total_flush = 0.0
+        self.latencia_max_ms = 0.0
+        self.ultima_latencia_ms = 0.0
+        self._inicio = time.monotonic()
+
+    def adicionar(self, timestamp, linha, maquina, funcao, dado, qualidade, origem=None, servidor=None, tipo=None):
+        """Adiciona uma leitura ao lote (dado no tipo original); grava se atingir N linhas ou T ms
+
+        timestamp é a hora da coleta; origem/servidor são o SourceTimestamp/ServerTimestamp
+        do DataValue e tipo o nome do tipo do Variant (ver marcas_de_tempo e tipo_variante).
+        """
+        with self._lock:
+            if not self._linhas:
+                self._inicio_lote = time.monotonic()
+            self._linhas.append((timestamp, linha, maquina, funcao, dado, qualidade, origem, servidor, tipo))
+            cheio = len(self._linhas) >= self.max_linhas
+            vencido = (time.monotonic() - self._inicio_lote) * 1000 >= self.max_ms
+
+        if cheio or vencido:
+            if self._thread:
+                # Com flush periódico ativo quem grava é a thread de fundo
+                self._acordar.set()
+            else:
+                self.flush()
+
+    def iniciar_flush_periodico(self):
+        """Inicia uma thread que grava o lote a cada max_ms (usado no modo assinatura)"""
+        if self._thread:
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._loop_flush, name="escritor-lote", daemon=True)
+        self._thread.start()
+
+    def _loop_flush(self):
+        """Loop da thread de flush periódico"""
+        while not self._parar.is_set():
+            self._acordar.wait(self.max_ms / 1000)
+            self._acordar.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"❌ Erro ao gravar lote: {e}")
+
+    def pendentes(self):
+        """Retorna o número de linhas aguardando gravação"""
+        with self._lock:
+            return len(self._linhas)
+
+    def flush(self):
+        """Grava todas as linhas pendentes em uma única transação"""
+        with self._lock:
+            if not self._linhas:
+                return 0
+            linhas = self._linhas
+            self._linhas = []
+            self._inicio_lote = None
+
+        try:
+            return self.gravar(linhas)
+        except Exception:
+            self.linhas_descartadas += len(linhas)
+            raise
+
+    def gravar(self, linhas):
+        """Grava as linhas informadas em uma única transação (levanta exceção se falhar)"""
+        # A gravação acontece fora do lock de adicionar, para não travar quem produz leituras
+        with self._lock_gravacao:
+            if self.pool:
+                with self.pool.conexao() as conn:
+                    return self._gravar(conn, linhas)
+            return self._gravar(self.conn, linhas)
+
+    def _gravar(self, conn, linhas):
+        """COPY do lote, valores atuais, agregações e NOTIFY em uma transação na conexão informada"""
+        inicio = time.perf_counter()
+        cursor = conn.cursor()
+        try:
+            # Tags novas são cadastradas na mesma transação do lote
+            faltando = {r[1:4] for r in linhas} - self._tag_ids.keys()
+            novos_ids = resolver_tag_ids(cursor, faltando) if faltando else {}
+
+            registros = preparar_registros(linhas, ChainMap(novos_ids, self._tag_ids))
+            buffer = io.StringIO()
+            for registro in registros:
+                buffer.write("\t".join(_escapar_copy(v) for v in registro))
+                buffer.write("\n")
+            buffer.seek(0)
+
+            cursor.copy_expert(
+                f"COPY dados_opcua ({', '.join(self.COLUNAS)}) FROM STDIN",
+                buffer
+            )
+            # Último valor de cada tag e agregações na mesma transação do histórico
+            atualizar_valores_atuais(cursor, registros)
+            if self.rollups:
+                atualizar_rollups(cursor, registros)
+            notificar_lote(cursor, registros)
+            inicio_commit = time.perf_counter()
+            conn.commit()
+            METRICAS.observar("escritor_commit_segundos", time.perf_counter() - inicio_commit)
+            # Só entra no cache depois do commit (em caso de rollback o id não existe)
+            self._tag_ids.update(novos_ids)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+        latencia = time.perf_counter() - inicio
+        self.tempo_total_flush += latencia
+        self.ultima_latencia_ms = latencia * 1000
+        self.latencia_max_ms = max(self.latencia_max_ms, self.ultima_latencia_ms)
+        self.linhas_gravadas += len(linhas)
+        self.lotes_gravados += 1
+        METRICAS.observar("escritor_flush_segundos", latencia)
+        METRICAS.observar("escritor_lote_linhas", len(linhas))
+        return len(linhas)
+
+    def estatisticas(self):
+        """Retorna as estatísticas de gravação (linhas/s e latência de flush)"""
+        decorrido = time.monotonic() - self._inicio
+        return {
+            "linhas_gravadas": self.linhas_gravadas,
+            "lotes_gravados": self.lotes_gravados,
+            "linhas_descartadas": self.linhas_descartadas,
+            "linhas_por_segundo": self.linhas_gravadas / decorrido if decorrido > 0 else 0.0,
+            "latencia_media_ms": (self.tempo_total_flush * 1000 / self.lotes_gravados
+                                  if self.lotes_gravados else 0.0),
+            "latencia_max_ms": self.latencia_max_ms,
+            "ultima_latencia_ms": self.ultima_latencia_ms,
+        }
+
+    def resumo(self):
+        """Retorna as estatísticas formatadas para exibição"""
+        est = self.estatisticas()
+        return (f"{est['linhas_gravadas']} linhas em {est['lotes_gravados']} lotes, "
+                f"{est['linhas_por_segundo']:.1f} linhas/s, "
+                f"flush médio {est['latencia_media_ms']:.1f} ms (máx {est['latencia_max_ms']:.1f} ms)")
+
+    def fechar(self):
+        """Grava o que estiver pendente antes de encerrar"""
+        if self._thread:
+            self._parar.set()
+            self._acordar.set()
+            self._thread.join()
+            self._thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"❌ Erro ao gravar lote final: {e}")
@@ -0,0 +1,218 @@
+import threading
+import time
+from collections import deque
+from buffer_local import BufferLocal
+from metricas import METRICAS
+
+
+POLITICAS = ("bloquear", "descartar_antigas", "disco")
+
+
+class FilaLeituras:
+    """Fila limitada em memória entre as threads de leitura e as de gravação
+
+    As threads de leitura chamam adicionar (mesma interface do escritor) e seguem
+    lendo; cada thread de gravação consome a fila e repassa a um destino
+    (EscritorLote ou BufferLocal; o transbordo usa destino.gravar). Quando a fila enche, a política decide:
+    - bloquear: a leitura espera até abrir espaço (nada se perde)
+    - descartar_antigas: descarta a leitura mais antiga da fila
+    - disco: transborda para um BufferLocal e é reenviada depois, na ordem
+    """
+
+    def __init__(self, destinos, capacidade=10000, politica="bloquear", caminho_transbordo="transbordo_opcua.db",
+                 max_mb_transbordo=500, tamanho_lote=1000):
+        if politica not in POLITICAS:
+            raise ValueError(f"Política de fila inválida: {politica} (use {', '.join(POLITICAS)})")
+        self.destinos = destinos if isinstance(destinos, (list, tuple)) else [destinos]
+        self.capacidade = capacidade
+        self.politica = politica
+        self.tamanho_lote = tamanho_lote
+        self.transbordo = BufferLocal(caminho_transbordo, max_mb_transbordo) if politica == "disco" else None
+
+        self._fila = deque()  # (instante em que entrou, leitura)
+        self._cond = threading.Condition()
+        # Enquanto houver leituras no disco, as novas também vão para lá (inclusive as que sobraram
+        # no arquivo de uma execução anterior: elas são drenadas antes das novas)
+        self._transbordando = bool(self.transbordo and self.transbordo.pendentes())
+        self._gravando_no_disco = 0  # leituras já desviadas para o disco, ainda sendo gravadas (sem o lock)
+        self._lock_transbordo = threading.Lock()
+        self._parar = False
+        self._threads = []
+
+        # Estatísticas
+        self.enfileiradas = 0
+        self.processadas = 0
+        self.descartadas = 0
+        self.transbordadas = 0
+        self.bloqueios = 0
+        self.tempo_bloqueado = 0.0
+        self.erros = 0
+        self.profundidade_max = 0
+        self.ultimo_atraso_s = 0.0
+
+    def iniciar(self):
+        """Inicia uma thread de gravação por destino"""
+        if not self._threads:
+            self._parar = False
+            for i, destino in enumerate(self.destinos):
+                thread = threading.Thread(target=self._loop_gravacao, args=(destino,),
+                                          name=f"gravador-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        return self
+
+    def adicionar(self, timestamp, linha, maquina, funcao, dado, qualidade, origem=None, servidor=None, tipo=None):
+        """Enfileira uma leitura (chamado pelas threads de leitura)
+
+        No transbordo, só a decisão é tomada com o lock da fila; a gravação no SQLite
+        acontece depois de soltá-lo, para a espera do disco não parar as outras threads.
+        """
+        leitura = (timestamp, linha, maquina, funcao, dado, qualidade, origem, servidor, tipo)
+        with self._cond:
+            if self.transbordo and (self._transbordando or len(self._fila) >= self.capacidade):
+                self._transbordando = True
+                self._gravando_no_disco += 1
+            else:
+                self._enfileirar(leitura)
+                return
+
+        try:
+            self.transbordo.adicionar(*leitura)  # o BufferLocal tem lock próprio
+        finally:
+            with self._cond:
+                self._gravando_no_disco -= 1
+                self.transbordadas += 1  # se o SQLite falhou, a leitura ficou pendente na memória do buffer
+                self._cond.notify()
+
+    def _enfileirar(self, leitura):
+        """Põe a leitura na fila em memória, aplicando a política se estiver cheia (chamar com o lock)"""
+        if len(self._fila) >= self.capacidade:
+            if self.politica == "descartar_antigas":
+                self._fila.popleft()
+                self.descartadas += 1
+            else:
+                self.bloqueios += 1
+                inicio = time.perf_counter()
+                while len(self._fila) >= self.capacidade and not self._parar:
+                    self._cond.wait(0.5)
+                self.tempo_bloqueado += time.perf_counter() - inicio
+        self._fila.append((time.monotonic(), leitura))
+        self.enfileiradas += 1
+        self.profundidade_max = max(self.profundidade_max, len(self._fila))
+        self._cond.notify()
+
+    def flush(self):
+        """As threads de gravação já repassam sozinhas; só garante que estão acordadas"""
+        with self._cond:
+            self._cond.notify_all()
+        return 0
+
+    def _proximo_lote(self):
+        """Retira até tamanho_lote leituras da fila (espera se estiver vazia)"""
+        with self._cond:
+            while not self._fila and not self._transbordando and not self._parar:
+                self._cond.wait(0.5)
+            METRICAS.observar("fila_profundidade", len(self._fila))
+            lote = [self._fila.popleft() for _ in range(min(len(self._fila), self.tamanho_lote))]
+            self._cond.notify_all()  # abre espaço para quem estiver bloqueado
+            return lote
+
+    def _drenar_transbordo(self, destino):
+        """Repassa um lote do disco ao destino; desliga o transbordo quando o disco esvazia
+
+        O lote vai inteiro em um destino.gravar (uma transação): se falhar, nada foi gravado
+        e a próxima tentativa relê o mesmo lote do disco, sem duplicar leituras no destino.
+        """
+        with self._lock_transbordo:
+            self.transbordo.flush()
+            ultimo_seq, linhas = self.transbordo.ler_lote(self.tamanho_lote)
+            if linhas:
+                destino.gravar(linhas)
+                self.transbordo.confirmar(ultimo_seq)
+                self.processadas += len(linhas)
+                return len(linhas)
+            with self._cond:
+                # Confere de novo com o lock: uma leitura pode ter ido (ou estar indo) ao disco nesse meio tempo
+                if self._gravando_no_disco == 0 and self.transbordo.pendentes() == 0:
+                    self._transbordando = False
+            return 0
+
+    def _loop_gravacao(self, destino):
+        """Thread de gravação: consome a fila e repassa as leituras ao destino"""
+        while True:
+            lote = self._proximo_lote()
+            try:
+                if lote:
+                    for _, leitura in lote:
+                        destino.adicionar(*leitura)
+                    self.processadas += len(lote)
+                    self.ultimo_atraso_s = time.monotonic() - lote[-1][0]
+                    if not self._fila:
+                        destino.flush()
+                elif self._transbordando:
+                    try:
+                        self._drenar_transbordo(destino)
+                    except Exception as e:
+                        if self._parar:
+                            # Encerrando com o destino fora: as leituras ficam no disco para o próximo início
+                            print(f"⚠️ {self.transbordo.pendentes()} leituras ficam no transbordo em disco: {e}")
+                            return
+                        raise
+                elif self._parar:
+                    destino.flush()
+                    return
+            except Exception as e:
+                self.erros += 1
+                print(f"❌ Erro na thread de gravação: {e}")
+                time.sleep(1)  # Pausa antes de tentar novamente
+
+    def profundidade(self):
+        """Leituras aguardando gravação (memória + disco)"""
+        em_disco = self.transbordo.pendentes() if self.transbordo else 0
+        return len(self._fila) + em_disco
+
+    def atraso_s(self):
+        """Há quanto tempo a leitura mais antiga da fila em memória está esperando"""
+        with self._cond:
+            return time.monotonic() - self._fila[0][0] if self._fila else 0.0
+
+    def estatisticas(self):
+        """Retorna profundidade, atraso e contadores da fila"""
+        return {
+            "profundidade": self.profundidade(),
+            "profundidade_max": self.profundidade_max,
+            "capacidade": self.capacidade,
+            "atraso_s": self.atraso_s(),
+            "ultimo_atraso_s": self.ultimo_atraso_s,
+            "enfileiradas": self.enfileiradas,
+            "processadas": self.processadas,
+            "descartadas": self.descartadas,
+            "transbordadas": self.transbordadas,
+            "bloqueios": self.bloqueios,
+            "tempo_bloqueado_s": self.tempo_bloqueado,
+            "erros": self.erros,
+        }
+
+    def resumo(self):
+        """Retorna as estatísticas da fila formatadas para exibição"""
+        est = self.estatisticas()
+        texto = (f"profundidade {est['profundidade']}/{est['capacidade']} (máx {est['profundidade_max']}), "
+                 f"atraso {est['atraso_s'] * 1000:.0f} ms, {est['processadas']} processadas")
+        if est["descartadas"]:
+            texto += f", {est['descartadas']} descartadas"
+        if est["transbordadas"]:
+            texto += f", {est['transbordadas']} para o disco"
+        if est["bloqueios"]:
+            texto += f", leitura bloqueada {est['bloqueios']}x ({est['tempo_bloqueado_s']:.1f} s)"
+        return texto
+
+    def fechar(self):
+        """Espera as threads de gravação esvaziarem a fila e encerra"""
+        with self._cond:
+            self._parar = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self.transbordo:
+            self.transbordo.fechar()
@@ -0,0 +1,100 @@
+import fnmatch
+import threading
+import time
+
+
+class FiltroExcecao:
+    """Filtro por exceção entre a aquisição e o escritor: só repassa o que mudou
+
+    - Numéricos: grava quando a variação passa da banda morta absoluta e/ou percentual
+    - Booleanos, texto e demais tipos: grava quando o valor muda
+    - Mudança de qualidade sempre é gravada
+    - Heartbeat: grava mesmo sem mudança após heartbeat_s segundos de silêncio,
+      para o histórico continuar reconstruível (último valor conhecido)
+    """
+
+    def __init__(self, destino, deadband_abs=None, deadband_pct=None, heartbeat_s=60, regras=None):
+        self.destino = destino
+        self.padrao = {"deadband_abs": deadband_abs, "deadband_pct": deadband_pct, "heartbeat_s": heartbeat_s}
+        self.regras = regras or []  # [{"padrao": "Serac4/*/Temp*", "deadband_abs": 0.5, ...}]
+
+        self._ultimos = {}  # (linha, maquina, funcao) -> (valor, qualidade, instante)
+        self._parametros = {}  # (linha, maquina, funcao) -> parâmetros resolvidos
+        self._lock = threading.Lock()
+
+        self.recebidos = 0
+        self.repassados = 0
+
+    def _parametros_da_tag(self, chave):
+        """Resolve a banda morta e o heartbeat da tag (a primeira regra que casar vence)"""
+        parametros = self._parametros.get(chave)
+        if parametros is None:
+            nome = "/".join(chave)
+            parametros = dict(self.padrao)
+            for regra in self.regras:
+                if fnmatch.fnmatchcase(nome, regra["padrao"]) or fnmatch.fnmatchcase(chave[2], regra["padrao"]):
+                    parametros.update({k: v for k, v in regra.items() if k != "padrao"})
+                    break
+            self._parametros[chave] = parametros
+        return parametros
+
+    @staticmethod
+    def _mudou(valor, anterior, parametros):
+        """Decide se o valor saiu da banda morta em relação ao último gravado"""
+        numerico = (isinstance(valor, (int, float)) and not isinstance(valor, bool)
+                    and isinstance(anterior, (int, float)) and not isinstance(anterior, bool))
+        if not numerico:
+            return valor != anterior
+
+        deadband_abs = parametros["deadband_abs"]
+        deadband_pct = parametros["deadband_pct"]
+        if deadband_abs is None and deadband_pct is None:
+            return valor != anterior
+
+        variacao = abs(valor - anterior)
+        if deadband_abs is not None and variacao > deadband_abs:
+            return True
+        if deadband_pct is not None:
+            if anterior == 0:
+                return variacao > 0
+            if variacao * 100 / abs(anterior) > deadband_pct:
+                return True
+        return False
+
+    def deve_gravar(self, linha, maquina, funcao, valor, qualidade, agora=None):
+        """Retorna True se a leitura deve ir para o banco (e a registra como último valor)"""
+        agora = time.monotonic() if agora is None else agora
+        chave = (linha, maquina, funcao)
+        with self._lock:
+            self.recebidos += 1
+            parametros = self._parametros_da_tag(chave)
+            ultimo = self._ultimos.get(chave)
+
+            gravar = (ultimo is None
+                      or qualidade != ultimo[1]
+                      or agora - ultimo[2] >= parametros["heartbeat_s"]
+                      or self._mudou(valor, ultimo[0], parametros))
+            if gravar:
+                self._ultimos[chave] = (valor, qualidade, agora)
+                self.repassados += 1
+            return gravar
+
+    def adicionar(self, timestamp, linha, maquina, funcao, dado, qualidade, origem=None, servidor=None, tipo=None):
+        """Mesma interface do escritor: repassa a leitura só se ela passar no filtro"""
+        if self.deve_gravar(linha, maquina, funcao, dado, qualidade):
+            self.destino.adicionar(timestamp, linha, maquina, funcao, dado, qualidade, origem, servidor, tipo)
+            return True
+        return False
+
+    def esquecer(self, linha=None, maquina=None):
+        """Descarta o último valor (ex.: após reconexão), forçando a próxima gravação"""
+        with self._lock:
+            for chave in list(self._ultimos):
+                if (linha is None or chave[0] == linha) and (maquina is None or chave[1] == maquina):
+                    del self._ultimos[chave]
+
+    def resumo(self):
+        """Retorna as estatísticas do filtro formatadas para exibição"""
+        suprimidos = self.recebidos - self.repassados
+        taxa = suprimidos * 100 / self.recebidos if self.recebidos else 0.0
+        return f"{self.recebidos} recebidas, {self.repassados} gravadas, {suprimidos} suprimidas ({taxa:.1f}%)"
@@ -0,0 +1,211 @@
+import bisect
+import json
+import math
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Limites dos buckets (o último bucket, +Inf, é implícito)
+LIMITES_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+LIMITES_LINHAS = (1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000)
+LIMITES_PROFUNDIDADE = (0, 10, 100, 500, 1000, 5000, 10000, 20000, 50000, 100000)
+
+# Histogramas do coletor: nome -> (descrição, limites, rótulos)
+HISTOGRAMAS = {
+    "opcua_browse_segundos": ("Tempo para navegar até a máquina e resolver suas variáveis",
+                              LIMITES_SEGUNDOS, ("maquina",)),
+    "opcua_leitura_segundos": ("Ida e volta de uma requisição Read ao servidor OPC UA",
+                               LIMITES_SEGUNDOS, ("maquina",)),
+    "escritor_lote_linhas": ("Linhas por lote gravado no PostgreSQL", LIMITES_LINHAS, ()),
+    "escritor_flush_segundos": ("Duração da gravação de um lote (COPY, atualizações e commit)",
+                                LIMITES_SEGUNDOS, ()),
+    "escritor_commit_segundos": ("Duração do commit de um lote", LIMITES_SEGUNDOS, ()),
+    "fila_profundidade": ("Leituras na fila a cada lote retirado pela thread de gravação",
+                          LIMITES_PROFUNDIDADE, ()),
+    "ciclo_duracao_segundos": ("Duração de um ciclo de varredura, do ponto previsto da grade até o fim",
+                               LIMITES_SEGUNDOS, ("classe",)),
+    "ciclo_overrun_segundos": ("Quanto um ciclo passou do seu período", LIMITES_SEGUNDOS, ("classe",)),
+    "opcua_travamento_segundos": ("Há quanto tempo uma chamada de aquisição estava parada quando foi abortada",
+                                  LIMITES_SEGUNDOS, ("maquina",)),
+}
+
+
+class Histograma:
+    """Histograma com buckets fixos (formato Prometheus), uma série por combinação de rótulos"""
+
+    def __init__(self, nome, descricao, limites, rotulos=()):
+        self.nome = nome
+        self.descricao = descricao
+        self.limites = tuple(limites)
+        self.rotulos = tuple(rotulos)
+        self._series = {}  # valores dos rótulos -> [contagens por bucket..., +Inf], soma
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *rotulos):
+        """Registra uma observação (rótulos na ordem de self.rotulos)"""
+        indice = bisect.bisect_left(self.limites, valor)
+        with self._lock:
+            serie = self._series.get(rotulos)
+            if serie is None:
+                serie = self._series[rotulos] = [[0] * (len(self.limites) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += valor
+
+    def series(self):
+        """Cópia das séries: {rótulos: (contagens por bucket, soma)}"""
+        with self._lock:
+            return {rotulos: (list(contagens), soma) for rotulos, (contagens, soma) in self._series.items()}
+
+    def percentil(self, q, *rotulos):
+        """Estimativa do percentil q (0-1) por interpolação dentro do bucket (None sem dados)"""
+        serie = self.series().get(rotulos)
+        return percentil_buckets(self.limites, serie[0], q) if serie else None
+
+
+def percentil_buckets(limites, contagens, q):
+    """Percentil estimado a partir das contagens por bucket (como histogram_quantile)"""
+    total = sum(contagens)
+    if total == 0:
+        return None
+    alvo = q * total
+    acumulado = 0
+    for i, contagem in enumerate(contagens):
+        if contagem and acumulado + contagem >= alvo:
+            if i == len(limites):
+                return limites[-1]  # bucket +Inf: o melhor que dá para dizer é o último limite
+            inferior = limites[i - 1] if i > 0 else min(0, limites[0])
+            return inferior + (limites[i] - inferior) * (alvo - acumulado) / contagem
+        acumulado += contagem
+    return limites[-1]
+
+
+def _rotulos_prometheus(nomes, valores, extra=None):
+    """Monta {a="x",b="y"} com escape de aspas, barras e quebras de linha"""
+    pares = list(zip(nomes, valores)) + ([extra] if extra else [])
+    if not pares:
+        return ""
+    escapar = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{nome}="{escapar(valor)}"' for nome, valor in pares) + "}"
+
+
+def _numero(valor):
+    """Formata um número no padrão do formato texto do Prometheus"""
+    if math.isinf(valor):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Metricas:
+    """Conjunto de histogramas do processo, exportado em texto Prometheus e em JSON"""
+
+    def __init__(self, definicoes=None):
+        self.histogramas = {nome: Histograma(nome, *definicao)
+                            for nome, definicao in (definicoes or HISTOGRAMAS).items()}
+        self._servidor = None
+
+    def observar(self, nome, valor, *rotulos):
+        """Registra uma observação no histograma nome"""
+        self.histogramas[nome].observar(valor, *rotulos)
+
+    def texto_prometheus(self):
+        """Exporta todos os histogramas no formato texto do Prometheus (0.0.4)"""
+        linhas = []
+        for h in self.histogramas.values():
+            linhas.append(f"# HELP {h.nome} {h.descricao}")
+            linhas.append(f"# TYPE {h.nome} histogram")
+            for rotulos, (contagens, soma) in sorted(h.series().items()):
+                acumulado = 0
+                for limite, contagem in zip(h.limites + (math.inf,), contagens):
+                    acumulado += contagem
+                    le = _rotulos_prometheus(h.rotulos, rotulos, ("le", _numero(limite)))
+                    linhas.append(f"{h.nome}_bucket{le} {acumulado}")
+                sufixo = _rotulos_prometheus(h.rotulos, rotulos)
+                linhas.append(f"{h.nome}_sum{sufixo} {_numero(soma)}")
+                linhas.append(f"{h.nome}_count{sufixo} {acumulado}")
+        return "\n".join(linhas) + "\n"
+
+    def como_dict(self):
+        """Resumo de cada série: contagem, soma, média, p50/p95/p99 e buckets"""
+        resultado = {}
+        for h in self.histogramas.values():
+            series = []
+            for rotulos, (contagens, soma) in sorted(h.series().items()):
+                total = sum(contagens)
+                series.append({
+                    "rotulos": dict(zip(h.rotulos, rotulos)),
+                    "contagem": total,
+                    "soma": soma,
+                    "media": soma / total if total else None,
+                    "p50": percentil_buckets(h.limites, contagens, 0.50),
+                    "p95": percentil_buckets(h.limites, contagens, 0.95),
+                    "p99": percentil_buckets(h.limites, contagens, 0.99),
+                    "buckets": {_numero(limite): contagem
+                                for limite, contagem in zip(h.limites + (math.inf,), contagens)},
+                })
+            resultado[h.nome] = {"descricao": h.descricao, "series": series}
+        return resultado
+
+    def salvar_json(self, caminho):
+        """Grava o resumo das métricas em JSON (chamado no encerramento)"""
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            json.dump({"gerado_em": datetime.now().isoformat(timespec="seconds"),
+                       "histogramas": self.como_dict()}, arquivo, ensure_ascii=False, indent=2)
+
+    def iniciar_servidor(self, porta=9108, host="127.0.0.1"):
+        """Serve GET /metrics em texto Prometheus numa thread de fundo"""
+        metricas = self
+
+        class Manipulador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                corpo = metricas.texto_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, *args):
+                pass  # uma linha por scrape poluiria o log do coletor
+
+        self._servidor = ThreadingHTTPServer((host, porta), Manipulador)
+        self._servidor.daemon_threads = True
+        threading.Thread(target=self._servidor.serve_forever, name="metricas-http", daemon=True).start()
+        return self._servidor.server_address
+
+    def parar_servidor(self):
+        """Encerra o endpoint HTTP"""
+        if self._servidor:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
+
+
+# Instância única do processo: os módulos do coletor registram aqui
+METRICAS = Metricas()
+
+
+def iniciar_metricas(porta=9108, host="127.0.0.1"):
+    """Sobe o endpoint /metrics (porta 0 ou None desativa); retorna False se a porta estiver ocupada"""
+    if not porta:
+        return False
+    try:
+        endereco = METRICAS.iniciar_servidor(porta, host)
+    except OSError as e:
+        print(f"⚠️ Endpoint de métricas não iniciado na porta {porta}: {e}")
+        return False
+    print(f"📈 Métricas em http://{endereco[0]}:{endereco[1]}/metrics")
+    return True
+
+
+def encerrar_metricas(caminho_json=None):
+    """Para o endpoint e grava o JSON final das métricas"""
+    METRICAS.parar_servidor()
+    if caminho_json:
+        try:
+            METRICAS.salvar_json(caminho_json)
+            print(f"📈 Métricas salvas em {caminho_json}")
+        except OSError as e:
+            print(f"⚠️ Não foi possível salvar as métricas: {e}")
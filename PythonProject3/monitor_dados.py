@@ -1,65 +1,86 @@
-import psycopg2
-import time
+import json
+import select
 from datetime import datetime
+from database_manager import conectar_banco
+from escritor_lote import CANAL_NOTIFICACAO
 
-def monitor_dados():
+def novos_desde(cursor, ultimo_id):
+    """Conta só os registros com id acima da marca d'água (busca no índice, sem COUNT(*) da tabela)
+
+    Aproximado com vários escritores: os ids seguem a ordem de inserção, não a de commit, e um
+    lote com ids abaixo da marca confirmado depois dela não é contado. A contagem exata vem das
+    notificações (soma de "linhas"); esta só cobre períodos sem NOTIFY.
+    """
+    cursor.execute("SELECT COUNT(*), MAX(id) FROM dados_opcua WHERE id > %s", (ultimo_id,))
+    novos, id_max = cursor.fetchone()
+    return novos, id_max or ultimo_id
+
+def mostrar_ultimo(cursor):
+    """Mostra o registro mais recente (tabela de valores atuais: uma linha por tag)"""
+    cursor.execute("""
+        SELECT timestamp, linha, maquina, funcao, dado, qualidade
+        FROM vw_dados_opcua_atual
+        ORDER BY timestamp DESC
+        LIMIT 1
+    """)
+    ultimo = cursor.fetchone()
+    if ultimo:
+        print(f"   📋 Último: {ultimo[0]} - {ultimo[1]}/{ultimo[2]} - {ultimo[3]} = {ultimo[4]} ({ultimo[5]})")
+
+def monitor_dados(espera_s=5):
     """Monitora se novos dados estão sendo inseridos"""
     try:
         print("📊 MONITOR DE DADOS OPC UA")
         print("=" * 50)
-        
-        conn = psycopg2.connect(
-            dbname="new_bd1",
-            user="postgres",
-            password="postgres",
-            host="localhost",
-            port="5432"
-        )
+
+        conn = conectar_banco()
+        # LISTEN só recebe notificações fora de transação
+        conn.autocommit = True
         cursor = conn.cursor()
-        
-        # Contar registros iniciais
-        cursor.execute("SELECT COUNT(*) FROM dados_opcua")
-        total_inicial = cursor.fetchone()[0]
-        print(f"📊 Total inicial: {total_inicial} registros")
-        
+
+        # Marca d'água inicial: maior id já gravado (índice da chave primária, sem varrer a tabela)
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM dados_opcua")
+        ultimo_id = cursor.fetchone()[0]
+        print(f"📊 Último id gravado: {ultimo_id}")
+
+        # O escritor faz NOTIFY a cada lote confirmado
+        cursor.execute(f"LISTEN {CANAL_NOTIFICACAO}")
+
         print("\n🔄 Monitorando novos dados... (Pressione Ctrl+C para parar)")
         print("=" * 50)
-        
+
         while True:
-            # Contar registros atuais
-            cursor.execute("SELECT COUNT(*) FROM dados_opcua")
-            total_atual = cursor.fetchone()[0]
-            
-            # Verificar novos registros
-            novos = total_atual - total_inicial
-            
+            prontos, _, _ = select.select([conn], [], [], espera_s)
+            agora = datetime.now().strftime('%H:%M:%S')
+
+            if prontos:
+                conn.poll()
+                lotes = [json.loads(n.payload) for n in conn.notifies]
+                conn.notifies.clear()
+                if not lotes:
+                    continue
+                novos = sum(lote["linhas"] for lote in lotes)
+                ultimo_id = max([ultimo_id] + [lote["id_max"] for lote in lotes])
+                print(f"✅ {agora} - Novos registros: +{novos} em {len(lotes)} lote(s) (último id: {ultimo_id})")
+                mostrar_ultimo(cursor)
+                continue
+
+            # Sem notificação no período: confere pela marca d'água (escritor sem NOTIFY, conexão perdida...)
+            novos, ultimo_id = novos_desde(cursor, ultimo_id)
             if novos > 0:
-                print(f"✅ {datetime.now().strftime('%H:%M:%S')} - Novos registros: +{novos} (Total: {total_atual})")
-                
-                # Mostrar último registro
-                cursor.execute("""
-                    SELECT timestamp, linha, maquina, funcao, dado, qualidade 
-                    FROM dados_opcua 
-                    ORDER BY timestamp DESC 
-                    LIMIT 1
-                """)
-                ultimo = cursor.fetchone()
-                if ultimo:
-                    print(f"   📋 Último: {ultimo[0]} - {ultimo[1]}/{ultimo[2]} - {ultimo[3]} = {ultimo[4]} ({ultimo[5]})")
-                
-                total_inicial = total_atual
+                print(f"✅ {agora} - Novos registros: +{novos} (último id: {ultimo_id})")
+                mostrar_ultimo(cursor)
             else:
-                print(f"⏳ {datetime.now().strftime('%H:%M:%S')} - Aguardando novos dados...")
-            
-            time.sleep(5)  # Verificar a cada 5 segundos
-            
+                print(f"⏳ {agora} - Aguardando novos dados...")
+
     except KeyboardInterrupt:
         print("\n👋 Monitoramento interrompido pelo usuário.")
     except Exception as e:
         print(f"❌ Erro: {e}")
     finally:
-        cursor.close()
-        conn.close()
+        if 'conn' in locals():
+            cursor.close()
+            conn.close()
 
 if __name__ == "__main__":
-    monitor_dados() 
\ No newline at end of file
+    monitor_dados()
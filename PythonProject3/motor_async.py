@@ -0,0 +1,674 @@
+import asyncio
+import time
+from collections import ChainMap
+from concurrent.futures import ThreadPoolExecutor
+from asyncua import Client, ua
+import asyncpg
+from database_manager import CONFIG_BANCO_PADRAO
+from supervisor import CODIGOS_SESSAO_PERDIDA, EsperaExponencial, PoolBanco
+from buffer_local import BufferLocal, DrenadorBuffer
+from escritor_lote import (EscritorLote, COLUNAS_DADOS, leitura_ruim, marcas_de_tempo, tipo_variante, preparar_registros,
+                           sql_cadastrar_tags, sql_ids_das_tags, sql_valores_atuais, parametros_valores_atuais,
+                           sql_notificar_lote, parametros_notificacao)
+from rollups import colunas_do_lote, rollups_do_lote, sql_atualizar_rollup
+from filtro_excecao import FiltroExcecao
+from metricas import METRICAS
+from agendador import Agendador, CLASSE_PADRAO
+from registro_tags import (MAX_NODES_PADRAO, parametros_leitura, parametros_navegacao, caminhos_de_navegacao,
+                           nodeid_da_referencia, variaveis_das_referencias)
+from assinatura_opcua import parametros_assinatura, itens_monitorados
+
+# Prazo de uma navegação ou de um ciclo de leitura; passando dele a chamada é cancelada
+PRAZO_PADRAO_S = 10
+
+# Intervalo da verificação da sessão no modo assinatura (sem leituras, nada mais avisaria a queda)
+INTERVALO_VERIFICACAO_S = 5
+
+
+def falha_de_sessao(e):
+    """Versão do supervisor.falha_de_conexao para o asyncua: socket caído ou sessão perdida"""
+    if isinstance(e, OSError):
+        return True
+    if isinstance(e, ua.UaStatusCodeError):
+        return getattr(e, "code", None) in CODIGOS_SESSAO_PERDIDA
+    return False
+
+
+async def _verificar_conexao(conn):
+    """setup do pool asyncpg: SELECT 1 antes de emprestar; se falhar, o pool fecha a conexão"""
+    await conn.fetchval("SELECT 1")
+
+
+async def criar_pool(config_banco=None, minimo=1, maximo=4, verificar_apos_s=30):
+    """Pool asyncpg que só empresta conexões saudáveis (como o supervisor.PoolBanco)
+
+    Conexão parada há mais de verificar_apos_s é fechada pelo pool; as outras passam por um
+    SELECT 1 ao serem emprestadas e a que falhar é fechada e trocada na retirada seguinte.
+    """
+    banco = dict(CONFIG_BANCO_PADRAO)
+    banco.update(config_banco or {})
+    return await asyncpg.create_pool(database=banco["dbname"], user=banco["user"],
+                                     password=banco["password"], host=banco["host"],
+                                     port=int(banco["port"]), min_size=minimo, max_size=maximo,
+                                     setup=_verificar_conexao,
+                                     max_inactive_connection_lifetime=verificar_apos_s)
+
+
+class EscritorAsync:
+    """Versão assíncrona do EscritorLote: acumula leituras e grava com COPY via asyncpg"""
+
+    COLUNAS = COLUNAS_DADOS
+
+    def __init__(self, pool, max_linhas=5000, max_ms=1000):
+        self.pool = pool
+        self.max_linhas = max_linhas
+        self.max_ms = max_ms
+
+        self._linhas = []
+        self._acordar = asyncio.Event()
+        self._tarefa = None
+        self._tag_ids = {}  # (linha, maquina, funcao) -> tags_opcua.id
+
+        # Estatísticas
+        self.linhas_gravadas = 0
+        self.lotes_gravados = 0
+        self.linhas_descartadas = 0
+        self.tempo_total_flush = 0.0
+        self.latencia_max_ms = 0.0
+        self._inicio = time.monotonic()
+
+    def adicionar(self, timestamp, linha, maquina, funcao, dado, qualidade, origem=None, servidor=None, tipo=None):
+        """Adiciona uma leitura ao lote; acorda o flush se o lote encheu"""
+        self._linhas.append((timestamp, linha, maquina, funcao, dado, qualidade, origem, servidor, tipo))
+        if len(self._linhas) >= self.max_linhas:
+            self._acordar.set()
+
+    def iniciar(self):
+        """Inicia a tarefa de flush periódico no event loop"""
+        self._tarefa = asyncio.create_task(self._loop_flush())
+
+    async def _loop_flush(self):
+        """Grava o lote a cada max_ms ou quando ele encher"""
+        while True:
+            try:
+                await asyncio.wait_for(self._acordar.wait(), self.max_ms / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self._acordar.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"❌ Erro ao gravar lote: {e}")
+
+    async def flush(self):
+        """Grava todas as linhas pendentes com um único COPY (mesmo SQL do EscritorLote)"""
+        if not self._linhas:
+            return 0
+        linhas = self._linhas
+        self._linhas = []
+
+        inicio = time.perf_counter()
+        try:
+            conn = await self._emprestar()
+            try:
+                transacao = conn.transaction()
+                await transacao.start()
+                try:
+                    faltando = {r[1:4] for r in linhas} - self._tag_ids.keys()
+                    novos_ids = await self._resolver_tag_ids(conn, faltando) if faltando else {}
+                    registros = preparar_registros(linhas, ChainMap(novos_ids, self._tag_ids))
+                    await conn.copy_records_to_table("dados_opcua", records=registros, columns=self.COLUNAS)
+                    # Último valor de cada tag e agregações na mesma transação do histórico
+                    parametros = parametros_valores_atuais(registros)
+                    if parametros:
+                        await conn.execute(sql_valores_atuais("$"), *parametros)
+                    for tabela, colunas in rollups_do_lote(registros):
+                        await conn.execute(sql_atualizar_rollup(tabela, "$"), *colunas)
+                    # Entregue aos ouvintes (monitor_dados) só no commit
+                    await conn.execute(sql_notificar_lote("$"), *parametros_notificacao(registros))
+                except BaseException:
+                    await transacao.rollback()
+                    raise
+                inicio_commit = time.perf_counter()
+                await transacao.commit()
+                METRICAS.observar("escritor_commit_segundos", time.perf_counter() - inicio_commit)
+            finally:
+                await self.pool.release(conn)
+            self._tag_ids.update(novos_ids)
+        except Exception:
+            self.linhas_descartadas += len(linhas)
+            raise
+
+        latencia = time.perf_counter() - inicio
+        self.tempo_total_flush += latencia
+        self.latencia_max_ms = max(self.latencia_max_ms, latencia * 1000)
+        self.linhas_gravadas += len(linhas)
+        self.lotes_gravados += 1
+        METRICAS.observar("escritor_flush_segundos", latencia)
+        METRICAS.observar("escritor_lote_linhas", len(linhas))
+        return len(linhas)
+
+    async def _emprestar(self):
+        """Retira uma conexão; se a primeira falhar na verificação (banco reiniciado), tenta outra"""
+        try:
+            return await self.pool.acquire()
+        except (OSError, asyncpg.PostgresConnectionError, asyncpg.InterfaceError):
+            return await self.pool.acquire()
+
+    @staticmethod
+    async def _resolver_tag_ids(conn, chaves):
+        """Cadastra as tags que faltam e retorna {(linha, maquina, funcao): id}"""
+        parametros = colunas_do_lote(chaves)
+        await conn.execute(sql_cadastrar_tags("$"), *parametros)
+        registros = await conn.fetch(sql_ids_das_tags("$"), *parametros)
+        return {(r["linha"], r["maquina"], r["funcao"]): r["id"] for r in registros}
+
+    def resumo(self):
+        """Retorna as estatísticas formatadas para exibição"""
+        decorrido = time.monotonic() - self._inicio
+        por_segundo = self.linhas_gravadas / decorrido if decorrido > 0 else 0.0
+        media = self.tempo_total_flush * 1000 / self.lotes_gravados if self.lotes_gravados else 0.0
+        return (f"{self.linhas_gravadas} linhas em {self.lotes_gravados} lotes, "
+                f"{por_segundo:.1f} linhas/s, "
+                f"flush médio {media:.1f} ms (máx {self.latencia_max_ms:.1f} ms)")
+
+    async def fechar(self):
+        """Para o flush periódico e grava o que estiver pendente"""
+        if self._tarefa:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+            self._tarefa = None
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"❌ Erro ao gravar lote final: {e}")
+
+
+class SaidaEmThread:
+    """Entrega as leituras do event loop a um destino síncrono (o BufferLocal) em uma thread própria
+
+    O adicionar só enfileira no executor de uma thread (a ordem se mantém): a gravação no
+    SQLite não trava o event loop.
+    """
+
+    def __init__(self, destino):
+        self.destino = destino
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="saida-buffer")
+        self.erros = 0
+
+    def adicionar(self, *leitura):
+        """Enfileira a leitura para o destino"""
+        self._executor.submit(self._adicionar, leitura)
+
+    def _adicionar(self, leitura):
+        """Roda na thread: o buffer guarda em memória o que não conseguiu gravar e tenta de novo"""
+        try:
+            self.destino.adicionar(*leitura)
+        except Exception as e:
+            self.erros += 1
+            print(f"❌ Erro ao gravar no buffer local: {e}")
+
+    def resumo(self):
+        """Retorna as estatísticas do destino"""
+        return self.destino.resumo()
+
+    async def fechar(self):
+        """Espera as leituras enfileiradas chegarem ao destino e grava o que ficou pendente nele"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._executor.shutdown)
+        await loop.run_in_executor(None, self.destino.flush)
+
+
+async def navegar_filhos(client, nodeids, classes=ua.NodeClass.Variable):
+    """Versão assíncrona do registro_tags.navegar_filhos: Browse de vários nós, continuações com BrowseNext"""
+    resultados = []
+    for inicio in range(0, len(nodeids), MAX_NODES_PADRAO):
+        params = parametros_navegacao(nodeids[inicio:inicio + MAX_NODES_PADRAO], classes, ua)
+        for resultado in await client.uaclient.browse(params):
+            referencias = list(resultado.References) if resultado.StatusCode.is_good() else []
+            continuacao = resultado.ContinuationPoint
+            while continuacao:
+                proximo = ua.BrowseNextParameters()
+                proximo.ContinuationPoints = [continuacao]
+                seguinte = (await client.uaclient.browse_next(proximo))[0]
+                referencias.extend(seguinte.References)
+                continuacao = seguinte.ContinuationPoint
+            resultados.append(referencias)
+    return resultados
+
+
+async def navegar_estrutura(client, caminho):
+    """Navega pelos nomes exibidos do caminho, um Browse por nível (para o caminho que o Translate não casou)"""
+    atual = client.get_objects_node().nodeid
+    for nome in caminho:
+        referencias = (await navegar_filhos(client, [atual], ua.NodeClass.Unspecified))[0]
+        encontrado = next((ref for ref in referencias if ref.DisplayName.Text == nome), None)
+        if not encontrado:
+            print(f"❌ Nó '{nome}' não encontrado em {' → '.join(caminho)}")
+            return None
+        atual = nodeid_da_referencia(encontrado.NodeId, ua)
+    return atual
+
+
+async def traduzir_caminhos(client, caminhos):
+    """Resolve os caminhos com TranslateBrowsePathsToNodeIds: uma chamada por pasta raiz (ex.: Matics)
+
+    Retorna {caminho: NodeId da máquina}; os caminhos que não casaram ficam de fora.
+    """
+    raiz = (await navegar_filhos(client, [client.get_objects_node().nodeid], ua.NodeClass.Unspecified))[0]
+    maquinas = {}
+    for pasta in dict.fromkeys(caminho[0] for caminho in caminhos):
+        pasta_ref = next((ref for ref in raiz if pasta in (ref.DisplayName.Text, ref.BrowseName.Name)), None)
+        if pasta_ref is None:
+            continue
+        da_pasta = [caminho for caminho in caminhos if caminho[0] == pasta]
+        for inicio in range(0, len(da_pasta), MAX_NODES_PADRAO):
+            bloco = da_pasta[inicio:inicio + MAX_NODES_PADRAO]
+            caminhos_ua = caminhos_de_navegacao(bloco, pasta_ref.BrowseName.NamespaceIndex, ua)
+            for caminho, resultado in zip(bloco, await client.uaclient.translate_browsepaths_to_nodeids(caminhos_ua)):
+                alvos = resultado.Targets if resultado.StatusCode.is_good() else []
+                if alvos:
+                    maquinas[caminho] = nodeid_da_referencia(alvos[0].TargetId, ua)
+    return maquinas
+
+
+async def resolver_maquinas(client, caminhos):
+    """Resolve todas as máquinas de uma vez: um Translate para os caminhos e um Browse para as máquinas
+
+    Retorna {caminho: [(NodeId, nome)]} com as variáveis de cada máquina. Caminho que o Translate
+    não casou (BrowseName diferente do nome exibido) cai para navegar_estrutura; o que não existe fica de fora.
+    """
+    caminhos = [tuple(caminho) for caminho in caminhos]
+    maquinas = await traduzir_caminhos(client, caminhos)
+    for caminho in caminhos:
+        if caminho not in maquinas:
+            nodeid = await navegar_estrutura(client, caminho)
+            if nodeid is not None:
+                maquinas[caminho] = nodeid
+    referencias = await navegar_filhos(client, list(maquinas.values()))
+    return {caminho: [(nodeid, nome) for nodeid, nome, _ in variaveis_das_referencias(refs, ua)]
+            for caminho, refs in zip(maquinas, referencias)}
+
+
+async def obter_max_nodes_por_leitura(client):
+    """Lê o limite MaxNodesPerRead do servidor"""
+    try:
+        node = client.get_node(ua.NodeId(ua.ObjectIds.Server_ServerCapabilities_OperationLimits_MaxNodesPerRead))
+        limite = await node.read_value()
+        return limite if limite else MAX_NODES_PADRAO
+    except Exception:
+        return MAX_NODES_PADRAO
+
+
+async def ler_em_lote(client, nodeids, max_por_leitura, maquina=""):
+    """Lê o Value de vários nós; os blocos são enviados ao servidor em paralelo"""
+    async def ler_bloco(bloco):
+        inicio = time.perf_counter()
+        try:
+            valores = await client.uaclient.read(parametros_leitura(bloco, modulo_ua=ua))
+        except ua.UaStatusCodeError as e:
+            # Servidor recusou o tamanho do bloco: divide pela metade, como o registro_tags.ler_em_lote
+            if e.code == ua.StatusCodes.BadTooManyOperations and len(bloco) > 1:
+                meio = len(bloco) // 2
+                metades = await asyncio.gather(ler_bloco(bloco[:meio]), ler_bloco(bloco[meio:]))
+                return metades[0] + metades[1]
+            raise
+        METRICAS.observar("opcua_leitura_segundos", time.perf_counter() - inicio, maquina)
+        return valores
+
+    blocos = [nodeids[i:i + max_por_leitura] for i in range(0, len(nodeids), max_por_leitura)]
+    resultados = await asyncio.gather(*(ler_bloco(b) for b in blocos))
+    return [dv for bloco in resultados for dv in bloco]
+
+
+class SessaoAsync:
+    """Versão assíncrona do supervisor.SessaoOPCUA: uma sessão asyncua para todas as máquinas
+
+    Reconecta com backoff e chama as funções de ao_reconectar (corrotinas que recebem o novo
+    Client, ex.: resolver as tags de novo) antes de liberar a sessão. Cada tarefa guarda a
+    geração da sessão com que trabalha: só a primeira a ver a falha reconecta, as outras
+    esperam essa reconexão e recomeçam (refazendo leituras e assinaturas) na geração nova.
+    """
+
+    def __init__(self, endereco, espera_inicial_s=1.0, espera_max_s=30.0, timeout_s=4):
+        self.endereco = endereco
+        self.timeout_s = timeout_s  # prazo de cada requisição ao servidor
+        self.espera = EsperaExponencial(espera_inicial_s, espera_max_s)
+        self.client = None
+        self.geracao = 0
+        self.ao_reconectar = []
+        self._lock = asyncio.Lock()  # preso durante a reconexão
+        self._reconectada = asyncio.Event()
+
+        # Estatísticas
+        self.conexoes = 0
+        self.reconexoes = 0
+        self.tentativas_falhas = 0
+        self.ultima_recuperacao_s = None
+
+    async def conectar(self):
+        """Conecta, tentando de novo com backoff até conseguir"""
+        while True:
+            client = Client(self.endereco, timeout=self.timeout_s)
+            try:
+                await client.connect()
+            except Exception as e:
+                self.tentativas_falhas += 1
+                espera = self.espera.proxima()
+                print(f"⚠️ {self.endereco}: conexão falhou ({e}); nova tentativa em {espera:.1f} s")
+                await asyncio.sleep(espera)
+                continue
+            self.client = client
+            self.espera.reiniciar()
+            self.conexoes += 1
+            return client
+
+    async def cliente(self):
+        """Client da sessão atual (espera a reconexão em andamento, se houver)"""
+        async with self._lock:
+            return self.client
+
+    async def verificar(self):
+        """Lê ServerStatus.State com prazo; False se a sessão não responde ou o servidor não está Running"""
+        client = self.client
+        if not client:
+            return False
+        try:
+            node = client.get_node(ua.NodeId(ua.ObjectIds.Server_ServerStatus_State))
+            estado = await asyncio.wait_for(node.read_value(), self.timeout_s)
+            return estado == ua.ServerState.Running
+        except Exception:
+            return False
+
+    async def reconectar(self, motivo, geracao):
+        """Refaz a sessão da geração dada (se outra tarefa já refez, só espera); retorna o Client atual"""
+        async with self._lock:
+            if geracao != self.geracao:
+                return self.client
+            inicio = time.monotonic()
+            print(f"🔌 {self.endereco}: reconectando ({motivo})")
+            while True:
+                await self.desconectar()
+                client = await self.conectar()
+                try:
+                    for funcao in self.ao_reconectar:
+                        await funcao(client)
+                    break
+                except Exception as e:
+                    # A sessão nova caiu antes de ficar pronta: começa de novo
+                    self.tentativas_falhas += 1
+                    espera = self.espera.proxima()
+                    print(f"⚠️ {self.endereco}: sessão não ficou pronta ({e}); nova tentativa em {espera:.1f} s")
+                    await asyncio.sleep(espera)
+            self.reconexoes += 1
+            self.geracao += 1
+            evento, self._reconectada = self._reconectada, asyncio.Event()
+            evento.set()
+            self.ultima_recuperacao_s = time.monotonic() - inicio
+            print(f"✅ {self.endereco}: sessão recuperada em {self.ultima_recuperacao_s:.1f} s")
+            return client
+
+    async def aguardar_reconexao(self, geracao):
+        """Espera até a sessão da geração dada ser substituída"""
+        while self.geracao == geracao:
+            await self._reconectada.wait()
+
+    def abortar(self):
+        """Fecha o socket sem encerrar a sessão: quem estiver esperando uma resposta recebe erro na hora"""
+        client = self.client
+        if client:
+            try:
+                client.disconnect_socket()
+            except Exception:
+                pass
+
+    async def desconectar(self):
+        """Fecha a sessão com prazo; com o servidor mudo, só fecha o socket"""
+        client, self.client = self.client, None
+        if client:
+            try:
+                await asyncio.wait_for(client.disconnect(), self.timeout_s)
+            except Exception:
+                try:
+                    client.disconnect_socket()
+                except Exception:
+                    pass
+
+    def resumo(self):
+        """Retorna as estatísticas formatadas para exibição"""
+        texto = f"{self.conexoes} conexões, {self.reconexoes} reconexões, {self.tentativas_falhas} tentativas falhas"
+        if self.ultima_recuperacao_s is not None:
+            texto += f", última recuperação em {self.ultima_recuperacao_s:.1f} s"
+        return texto
+
+
+class ManipuladorAsync:
+    """Recebe notificações de mudança de dado e envia para o EscritorAsync"""
+
+    def __init__(self, escritor, linha, maquina, nomes):
+        self.escritor = escritor
+        self.linha = linha
+        self.maquina = maquina
+        self.nomes = nomes
+        self.notificacoes = 0
+        self.erros = 0
+
+    def datachange_notification(self, node, val, data):
+        display_name = self.nomes.get(node.nodeid)
+        if display_name is None:
+            return
+        data_value = data.monitored_item.Value
+        if leitura_ruim(data_value):
+            self.erros += 1
+            print(f"❌ {self.linha}/{self.maquina}: erro ao ler {display_name}: {data_value.StatusCode.name}")
+            return
+        coleta, origem, servidor = marcas_de_tempo(data_value)
+        self.escritor.adicionar(coleta, self.linha, self.maquina, display_name, val,
+                                data_value.StatusCode.name, origem, servidor, tipo_variante(data_value))
+        self.notificacoes += 1
+
+
+async def coletar_polling(sessao, caminho, resolvidas, escritor, intervalo, prazo_s=PRAZO_PADRAO_S):
+    """Lê todas as variáveis da máquina a cada intervalo (cada ciclo com prazo; só a máquina travada perde o ciclo)
+
+    Se a sessão cair, reconecta pela SessaoAsync; na geração nova as tags vêm de resolvidas,
+    que a sessão atualiza ao reconectar.
+    """
+    linha, maquina = caminho[-2], caminho[-1]
+    geracao = None
+
+    # Taxa fixa sobre a grade do relógio monotônico (o mesmo de loop.time()): a leitura não se soma ao intervalo
+    agendador = Agendador({CLASSE_PADRAO: intervalo})
+    while True:
+        classe = await agendador.aguardar_async()
+        overruns = agendador.overruns[classe]
+        inicio = time.perf_counter()
+        falhou = False
+        motivo_reconexao = None
+        try:
+            client = await sessao.cliente()
+            if geracao != sessao.geracao:
+                geracao = sessao.geracao
+                tags = resolvidas.get(tuple(caminho), [])
+                nodeids = [nodeid for nodeid, _ in tags]
+                max_por_leitura = await obter_max_nodes_por_leitura(client)
+            valores = await asyncio.wait_for(ler_em_lote(client, nodeids, max_por_leitura, f"{linha}/{maquina}"),
+                                             prazo_s)
+            for (_, nome), data_value in zip(tags, valores):
+                if leitura_ruim(data_value):
+                    print(f"❌ {linha}/{maquina}: erro ao ler {nome}: {data_value.StatusCode.name}")
+                    continue
+                coleta, origem, servidor = marcas_de_tempo(data_value)
+                escritor.adicionar(coleta, linha, maquina, nome, data_value.Value.Value,
+                                   data_value.StatusCode.name, origem, servidor, tipo_variante(data_value))
+        except asyncio.TimeoutError:
+            # Como o Vigia do motor sync: a sessão que travou é fechada e refeita, não reaproveitada
+            METRICAS.observar("opcua_travamento_segundos", time.perf_counter() - inicio, f"{linha}/{maquina}")
+            print(f"⛔ {linha}/{maquina}: leitura parada há mais de {prazo_s:g} s; reciclando a sessão")
+            motivo_reconexao = f"{linha}/{maquina}: leitura parada há mais de {prazo_s:g} s"
+        except Exception as e:
+            if falha_de_sessao(e):
+                motivo_reconexao = f"{linha}/{maquina}: {str(e) or type(e).__name__}"
+            else:
+                print(f"❌ {linha}/{maquina}: erro geral: {e}")
+                falhou = True
+        finally:
+            agendador.concluir(classe)
+        if agendador.overruns[classe] > overruns:
+            print(f"⏱️ {linha}/{maquina}: ciclo levou {(time.perf_counter() - inicio) * 1000:.0f} ms "
+                  f"(período {intervalo:g} s)")
+        if motivo_reconexao:
+            await sessao.reconectar(motivo_reconexao, geracao)
+        elif falhou:
+            await asyncio.sleep(5)  # Pausa antes de tentar novamente
+
+
+async def coletar_assinatura(sessao, caminho, resolvidas, escritor, intervalo_amostragem, tamanho_fila,
+                             prazo_s=PRAZO_PADRAO_S):
+    """Assina todas as variáveis da máquina (notificação de mudança) e assina de novo a cada sessão nova
+
+    A criação da assinatura tem prazo; se passar dele, a sessão é reciclada como no polling.
+    """
+    linha, maquina = caminho[-2], caminho[-1]
+    while True:
+        client = await sessao.cliente()
+        geracao = sessao.geracao
+        tags = resolvidas.get(tuple(caminho), [])
+        manipulador = ManipuladorAsync(escritor, linha, maquina, dict(tags))
+        assinatura = None
+        inicio = time.perf_counter()
+        try:
+            assinatura = await asyncio.wait_for(
+                client.create_subscription(parametros_assinatura(intervalo_amostragem, ua), manipulador), prazo_s)
+            itens = itens_monitorados([nodeid for nodeid, _ in tags], intervalo_amostragem, tamanho_fila, ua)
+            await asyncio.wait_for(assinatura.create_monitored_items(itens), prazo_s)
+        except asyncio.TimeoutError:
+            METRICAS.observar("opcua_travamento_segundos", time.perf_counter() - inicio, f"{linha}/{maquina}")
+            print(f"⛔ {linha}/{maquina}: assinatura parada há mais de {prazo_s:g} s; reciclando a sessão")
+            await sessao.reconectar(f"{linha}/{maquina}: assinatura parada há mais de {prazo_s:g} s", geracao)
+            continue
+        except Exception as e:
+            if falha_de_sessao(e):
+                await sessao.reconectar(f"{linha}/{maquina}: {str(e) or type(e).__name__}", geracao)
+                continue
+            print(f"❌ {linha}/{maquina}: erro ao assinar: {e}")
+            if assinatura is not None:
+                try:
+                    await assinatura.delete()
+                except Exception:
+                    pass
+            await asyncio.sleep(5)  # Pausa antes de tentar novamente
+            continue
+        print(f"✅ {linha}/{maquina}: {len(itens)} variáveis monitoradas")
+        try:
+            await sessao.aguardar_reconexao(geracao)
+        finally:
+            if sessao.geracao == geracao:
+                # Encerrando com a sessão ainda de pé: remove a assinatura (a de uma sessão antiga já se foi com ela)
+                try:
+                    await asyncio.wait_for(assinatura.delete(), prazo_s)
+                except Exception:
+                    pass
+
+
+async def vigiar_sessao(sessao, intervalo_s=INTERVALO_VERIFICACAO_S):
+    """Confere a sessão a cada intervalo_s e reconecta se ela não responder (modo assinatura)"""
+    while True:
+        await asyncio.sleep(intervalo_s)
+        geracao = sessao.geracao
+        if not await sessao.verificar():
+            await sessao.reconectar("servidor não responde", geracao)
+
+
+async def executar(endereco, caminhos, modo="polling", intervalo=2, intervalo_amostragem=500,
+                   tamanho_fila=10, config_banco=None, config_filtro=None, prazo_s=PRAZO_PADRAO_S, prazo_chamada=4,
+                   caminho_buffer=None):
+    """Executa a coleta de todas as máquinas em um único event loop
+
+    prazo_chamada: prazo de cada requisição ao servidor; prazo_s: de uma navegação, um ciclo de
+    leitura ou a criação de uma assinatura (passou dele, a sessão é reciclada).
+    Com caminho_buffer, as leituras vão para o buffer local e o DrenadorBuffer as envia ao banco
+    (como no motor sync); sem ele, o EscritorAsync grava direto e perde o lote se o banco cair.
+    """
+    pool = pool_banco = buffer = drenador = None
+    if caminho_buffer:
+        pool_banco = PoolBanco(config_banco)
+        buffer = BufferLocal(caminho_buffer)
+        drenador = DrenadorBuffer(buffer, EscritorLote(pool=pool_banco)).iniciar()  # o pool refaz as conexões
+        escritor = SaidaEmThread(buffer)
+        print(f"📦 Buffer local ativo: {caminho_buffer}")
+    else:
+        pool = await criar_pool(config_banco)
+        escritor = EscritorAsync(pool)
+        escritor.iniciar()
+    filtro = FiltroExcecao(escritor, **config_filtro) if config_filtro else None
+    destino = filtro or escritor
+
+    sessao = SessaoAsync(endereco, timeout_s=prazo_chamada)
+    await sessao.conectar()
+    print("✅ Conectado ao KepServer (asyncua)!")
+
+    # Todas as máquinas resolvidas de uma vez (Translate + Browse em lote), não nível a nível por máquina;
+    # de novo a cada reconexão, antes de as tarefas voltarem a ler ou assinar
+    resolvidas = {}
+
+    # Com prazo: uma sessão nova que trava na navegação é refeita pela SessaoAsync
+    async def resolver_todas(client):
+        inicio = time.perf_counter()
+        novas = await asyncio.wait_for(resolver_maquinas(client, caminhos), prazo_s)
+        METRICAS.observar("opcua_browse_segundos", time.perf_counter() - inicio, "todas")
+        resolvidas.clear()
+        resolvidas.update(novas)
+        if filtro:
+            filtro.esquecer()  # Sessão nova: o primeiro valor de cada tag é gravado de novo
+        for (*_, linha, maquina), tags in novas.items():
+            print(f"✅ {linha}/{maquina}: {len(tags)} variáveis")
+
+    sessao.ao_reconectar.append(resolver_todas)
+    try:
+        await resolver_todas(sessao.client)
+    except Exception as e:
+        await sessao.reconectar(f"resolução das máquinas falhou ({e})", sessao.geracao)
+
+    if modo == "assinatura":
+        tarefas = [coletar_assinatura(sessao, c, resolvidas, destino, intervalo_amostragem, tamanho_fila, prazo_s)
+                   for c in caminhos]
+        tarefas.append(vigiar_sessao(sessao))
+    else:
+        tarefas = [coletar_polling(sessao, c, resolvidas, destino, intervalo, prazo_s) for c in caminhos]
+
+    async def estatisticas():
+        while True:
+            await asyncio.sleep(10)
+            if filtro:
+                print(f"\n🔍 Filtro: {filtro.resumo()}")
+            print(f"\n📊 Gravação: {escritor.resumo()}")
+            print(f"🔌 Sessão: {sessao.resumo()}")
+
+    try:
+        await asyncio.gather(estatisticas(), *tarefas)
+    finally:
+        await escritor.fechar()
+        print(f"💾 Gravação: {escritor.resumo()}")
+        await sessao.desconectar()
+        print("✅ Desconectado do KepServer")
+        if buffer:
+            # Envia o que restou do buffer ao banco (o que não couber fica para o próximo início)
+            await asyncio.get_running_loop().run_in_executor(None, drenador.parar)
+            buffer.fechar()
+            print(f"📦 Buffer local: {buffer.resumo()}")
+            pool_banco.fechar()
+        else:
+            await pool.close()
+        print("✅ Desconectado do PostgreSQL")
+
+
+def executar_motor_async(endereco, caminhos, **opcoes):
+    """Ponto de entrada síncrono do motor assíncrono"""
+    try:
+        asyncio.run(executar(endereco, caminhos, **opcoes))
+    except KeyboardInterrupt:
+        print("\n👋 Interrompido pelo usuário.")
@@ -0,0 +1,386 @@
+from opcua import ua
+from collections import namedtuple
+import threading
+import time
+from metricas import METRICAS
+from snapshot_tags import diferenca
+
+# Limite usado quando o servidor não informa MaxNodesPerRead
+MAX_NODES_PADRAO = 1000
+
+# Máquina resolvida neste processo há menos que isso parte do snapshot sem validar de novo
+VALIDADE_SNAPSHOT_S = 60
+
+
+class CaminhoNaoEncontrado(RuntimeError):
+    """O caminho Matics → linha → máquina não existe no servidor"""
+
+
+# Metadados resolvidos de uma variável OPC UA (não mudam entre ciclos); tipo = NodeId do DataType
+TagOPC = namedtuple("TagOPC", ["node", "nodeid", "nome", "classe", "tipo"], defaults=(None,))
+
+
+def nodeid_da_referencia(expandido, modulo_ua=ua):
+    """ExpandedNodeId das respostas de Browse/Translate → NodeId (compara e vira texto como os demais)"""
+    return modulo_ua.NodeId(expandido.Identifier, expandido.NamespaceIndex, expandido.NodeIdType)
+
+
+def parametros_navegacao(nodeids, classes, modulo_ua=ua):
+    """BrowseParameters dos filhos hierárquicos de vários nós (usados pelos dois motores)"""
+    params = modulo_ua.BrowseParameters()
+    params.View = modulo_ua.ViewDescription()
+    params.RequestedMaxReferencesPerNode = 0
+    for nodeid in nodeids:
+        descricao = modulo_ua.BrowseDescription()
+        descricao.NodeId = nodeid
+        descricao.BrowseDirection = modulo_ua.BrowseDirection.Forward
+        descricao.ReferenceTypeId = modulo_ua.NodeId(modulo_ua.ObjectIds.HierarchicalReferences)
+        descricao.IncludeSubtypes = True
+        descricao.NodeClassMask = int(classes)
+        descricao.ResultMask = int(modulo_ua.BrowseResultMask.All)
+        params.NodesToBrowse.append(descricao)
+    return params
+
+
+def caminhos_de_navegacao(caminhos, namespace, modulo_ua=ua):
+    """BrowsePaths a partir de Objects para TranslateBrowsePathsToNodeIds (usados pelos dois motores)"""
+    caminhos_ua = []
+    for caminho in caminhos:
+        caminho_ua = modulo_ua.BrowsePath()
+        caminho_ua.StartingNode = modulo_ua.NodeId(modulo_ua.ObjectIds.ObjectsFolder)
+        for nome in caminho:
+            elemento = modulo_ua.RelativePathElement()
+            elemento.ReferenceTypeId = modulo_ua.NodeId(modulo_ua.ObjectIds.HierarchicalReferences)
+            elemento.IsInverse = False
+            elemento.IncludeSubtypes = True
+            elemento.TargetName = modulo_ua.QualifiedName(nome, namespace)
+            caminho_ua.RelativePath.Elements.append(elemento)
+        caminhos_ua.append(caminho_ua)
+    return caminhos_ua
+
+
+def variaveis_das_referencias(referencias, modulo_ua=ua):
+    """[(NodeId, nome, classe)] das variáveis de uma máquina, sem as internas do servidor (_System...)"""
+    variaveis = []
+    for ref in referencias:
+        nome = ref.DisplayName.Text or ref.BrowseName.Name
+        if not nome.startswith("_"):
+            variaveis.append((nodeid_da_referencia(ref.NodeId, modulo_ua), nome, ref.NodeClass))
+    return variaveis
+
+
+def navegar_filhos(client, nodeids, classes=ua.NodeClass.Variable):
+    """Browse de vários nós em uma requisição: cada filho já vem com NodeId, nomes e classe
+
+    Retorna uma lista de ReferenceDescription por nó (continuações seguidas com BrowseNext).
+    classes filtra no servidor (ua.NodeClass.Unspecified = todas).
+    """
+    resultados = []
+    for inicio in range(0, len(nodeids), MAX_NODES_PADRAO):
+        params = parametros_navegacao(nodeids[inicio:inicio + MAX_NODES_PADRAO], classes)
+        for resultado in client.uaclient.browse(params):
+            referencias = list(resultado.References) if resultado.StatusCode.is_good() else []
+            continuacao = resultado.ContinuationPoint
+            while continuacao:
+                proximo = ua.BrowseNextParameters()
+                proximo.ContinuationPoints = [continuacao]
+                seguinte = client.uaclient.browse_next(proximo)[0]
+                referencias.extend(seguinte.References)
+                continuacao = seguinte.ContinuationPoint
+            resultados.append(referencias)
+    return resultados
+
+
+def navegar_estrutura(client, caminho):
+    """Navega pelos nomes exibidos do caminho (ex.: Matics → Serac4 → Palletizer) e retorna os nós
+
+    Um Browse por nível, com os nomes na própria resposta (sem ler o nome de cada filho).
+    """
+    nodes = []
+    atual = client.get_objects_node().nodeid
+    for nome in caminho:
+        referencias = navegar_filhos(client, [atual], ua.NodeClass.Unspecified)[0]
+        encontrado = next((ref for ref in referencias if ref.DisplayName.Text == nome), None)
+        if not encontrado:
+            print(f"❌ Nó '{nome}' não encontrado!")
+            return None
+        atual = nodeid_da_referencia(encontrado.NodeId)
+        nodes.append(client.get_node(atual))
+    return nodes
+
+
+def namespace_da_pasta(client, pasta):
+    """Namespace do BrowseName da pasta raiz (ex.: Matics), usado nos caminhos traduzidos"""
+    for ref in navegar_filhos(client, [client.get_objects_node().nodeid], ua.NodeClass.Unspecified)[0]:
+        if ref.DisplayName.Text == pasta or ref.BrowseName.Name == pasta:
+            return ref.BrowseName.NamespaceIndex
+    return None
+
+
+def traduzir_caminhos(client, caminhos, namespace):
+    """Resolve vários caminhos a partir de Objects em uma chamada TranslateBrowsePathsToNodeIds
+
+    Retorna um NodeId por caminho (None se não casou); os nomes são BrowseNames no namespace dado.
+    """
+    nodeids = []
+    for inicio in range(0, len(caminhos), MAX_NODES_PADRAO):
+        caminhos_ua = caminhos_de_navegacao(caminhos[inicio:inicio + MAX_NODES_PADRAO], namespace)
+        for resultado in client.uaclient.translate_browsepaths_to_nodeids(caminhos_ua):
+            alvos = resultado.Targets if resultado.StatusCode.is_good() else []
+            nodeids.append(nodeid_da_referencia(alvos[0].TargetId) if alvos else None)
+    return nodeids
+
+
+def obter_max_nodes_por_leitura(client):
+    """Lê o limite MaxNodesPerRead do servidor (0 ou ausente = sem limite informado)"""
+    try:
+        node = client.get_node(ua.NodeId(ua.ObjectIds.Server_ServerCapabilities_OperationLimits_MaxNodesPerRead))
+        limite = node.get_value()
+        return limite if limite else MAX_NODES_PADRAO
+    except Exception:
+        return MAX_NODES_PADRAO
+
+
+def parametros_leitura(nodeids, atributo=None, modulo_ua=ua):
+    """ReadParameters de um bloco (valor atual, com os dois timestamps)
+
+    modulo_ua é o ua do opcua ou do asyncua: os dois motores montam a mesma requisição.
+    """
+    params = modulo_ua.ReadParameters()
+    params.MaxAge = 0
+    params.TimestampsToReturn = modulo_ua.TimestampsToReturn.Both
+    for nodeid in nodeids:
+        leitura = modulo_ua.ReadValueId()
+        leitura.NodeId = nodeid
+        leitura.AttributeId = modulo_ua.AttributeIds.Value if atributo is None else atributo
+        params.NodesToRead.append(leitura)
+    return params
+
+
+def ler_em_lote(client, nodeids, max_por_leitura=MAX_NODES_PADRAO, maquina="", atributo=ua.AttributeIds.Value):
+    """Lê o atributo Value (com status e timestamps) de vários nós em uma chamada Read por bloco"""
+    resultados = []
+    inicio = 0
+    while inicio < len(nodeids):
+        bloco = nodeids[inicio:inicio + max_por_leitura]
+        params = parametros_leitura(bloco, atributo)
+
+        try:
+            inicio_read = time.perf_counter()
+            resultados.extend(client.uaclient.read(params))
+            if atributo == ua.AttributeIds.Value:
+                METRICAS.observar("opcua_leitura_segundos", time.perf_counter() - inicio_read, maquina)
+        except ua.UaStatusCodeError as e:
+            # Servidor recusou o tamanho do bloco: divide pela metade e tenta de novo
+            if e.code == ua.StatusCodes.BadTooManyOperations and max_por_leitura > 1:
+                max_por_leitura = max(1, max_por_leitura // 2)
+                continue
+            raise
+        inicio += len(bloco)
+    return resultados
+
+
+def _tags_das_referencias(client, maquinas, max_por_leitura):
+    """{caminho: (NodeId da máquina, referências das variáveis)} → {caminho: (NodeId, [TagOPC])}
+
+    Os tipos de dado de todas as variáveis vêm de uma única requisição Read (dividida se necessário).
+    """
+    variaveis = [(caminho, nodeid, nome, classe) for caminho, (_, referencias) in maquinas.items()
+                 for nodeid, nome, classe in variaveis_das_referencias(referencias)]
+
+    tipos = ler_em_lote(client, [nodeid for _, nodeid, _, _ in variaveis], max_por_leitura,
+                        atributo=ua.AttributeIds.DataType)
+    resolvidas = {caminho: (nodeid, []) for caminho, (nodeid, _) in maquinas.items()}
+    for (caminho, nodeid, nome, classe), dv in zip(variaveis, tipos):
+        tipo = dv.Value.Value if dv.StatusCode.is_good() else None
+        resolvidas[caminho][1].append(TagOPC(client.get_node(nodeid), nodeid, nome, ua.NodeClass(classe), tipo))
+    return resolvidas
+
+
+def resolver_maquinas(client, caminhos, max_por_leitura=MAX_NODES_PADRAO):
+    """Resolve muitas máquinas de uma vez: um Translate para todos os caminhos, um Browse para
+    todas as máquinas e um Read para os tipos de dado
+
+    Retorna {caminho: (NodeId da máquina, [TagOPC])}; caminhos que não casaram ficam de fora
+    (ex.: BrowseName diferente do nome exibido).
+    """
+    caminhos = [tuple(caminho) for caminho in caminhos]
+    maquinas = {}
+    for pasta in dict.fromkeys(caminho[0] for caminho in caminhos):
+        namespace = namespace_da_pasta(client, pasta)
+        if namespace is None:
+            continue
+        da_pasta = [caminho for caminho in caminhos if caminho[0] == pasta]
+        for caminho, nodeid in zip(da_pasta, traduzir_caminhos(client, da_pasta, namespace)):
+            if nodeid is not None:
+                maquinas[caminho] = nodeid
+
+    referencias = navegar_filhos(client, list(maquinas.values()))
+    return _tags_das_referencias(client, {caminho: (nodeid, refs) for (caminho, nodeid), refs
+                                          in zip(maquinas.items(), referencias)}, max_por_leitura)
+
+
+def tag_para_snapshot(tag):
+    """Converte uma TagOPC no formato guardado no snapshot"""
+    return {
+        "nodeid": tag.nodeid.to_string(),
+        "nome": tag.nome,
+        "classe": int(tag.classe),
+        "tipo": tag.tipo.to_string() if tag.tipo is not None else None,
+    }
+
+
+def tag_do_snapshot(client, entrada):
+    """Reconstrói a TagOPC a partir do snapshot, sem nenhuma chamada ao servidor"""
+    nodeid = ua.NodeId.from_string(entrada["nodeid"])
+    tipo = ua.NodeId.from_string(entrada["tipo"]) if entrada.get("tipo") else None
+    return TagOPC(client.get_node(nodeid), nodeid, entrada["nome"], ua.NodeClass(entrada["classe"]), tipo)
+
+
+class RegistroTags:
+    """Cache dos nós de uma máquina: a navegação acontece uma vez, não a cada ciclo
+
+    Com um SnapshotTags, a partida usa os nós salvos da última navegação (sem chamadas ao
+    servidor) e uma thread de fundo navega de novo para validar; se algo mudou, as tags são
+    trocadas, o snapshot é regravado e ao_atualizar(tags) é chamado.
+    """
+
+    def __init__(self, client, caminho, snapshot=None):
+        self.client = client
+        self.caminho = tuple(caminho)
+        self.snapshot = snapshot
+        self.maquina_node = None
+        self.origem = None  # "snapshot" ou "navegacao"
+        self.ao_atualizar = None
+        self._tags = None
+        self._max_por_leitura = None
+        self._validacao = None
+
+    @property
+    def chave(self):
+        return "/".join(self.caminho)
+
+    @property
+    def linha(self):
+        return self.caminho[-2]
+
+    @property
+    def maquina(self):
+        return self.caminho[-1]
+
+    @property
+    def nome(self):
+        return f"{self.linha}/{self.maquina}"
+
+    @property
+    def tags(self):
+        """Lista de TagOPC da máquina, resolvida na primeira chamada"""
+        if self._tags is None:
+            self.resolver()
+        return self._tags
+
+    def resolver(self):
+        """Resolve as tags pelo snapshot (validando em segundo plano) ou, sem snapshot, navegando"""
+        entrada = self.snapshot.obter(self.chave) if self.snapshot is not None else None
+        if not entrada:
+            return self.navegar()
+
+        self.maquina_node = self.client.get_node(ua.NodeId.from_string(entrada["maquina"]))
+        self._tags = [tag_do_snapshot(self.client, tag) for tag in entrada["tags"]]
+        self.origem = "snapshot"
+        if self.snapshot.recente(self.chave, VALIDADE_SNAPSHOT_S):
+            return self._tags
+        self._validacao = threading.Thread(target=self._validar, args=(entrada["tags"],),
+                                           name=f"validacao-{self.nome}", daemon=True)
+        self._validacao.start()
+        return self._tags
+
+    def _navegar(self):
+        """Resolve a máquina pelo caminho traduzido (ou nível a nível pelos nomes exibidos) com tipos de dado"""
+        inicio = time.perf_counter()
+        if self._max_por_leitura is None:
+            self._max_por_leitura = obter_max_nodes_por_leitura(self.client)
+        resolvida = resolver_maquinas(self.client, [self.caminho], self._max_por_leitura).get(self.caminho)
+        if resolvida is None:
+            # BrowseName diferente do nome exibido: cai na navegação pelos DisplayNames
+            nodes = navegar_estrutura(self.client, self.caminho)
+            if not nodes:
+                raise CaminhoNaoEncontrado(f"Caminho {' → '.join(self.caminho)} não encontrado")
+            maquina = nodes[-1].nodeid
+            referencias = navegar_filhos(self.client, [maquina])[0]
+            resolvida = _tags_das_referencias(self.client, {self.caminho: (maquina, referencias)},
+                                              self._max_por_leitura)[self.caminho]
+        maquina, tags = resolvida
+        METRICAS.observar("opcua_browse_segundos", time.perf_counter() - inicio, self.nome)
+        return self.client.get_node(maquina), tags
+
+    def _salvar_snapshot(self, maquina_node, tags):
+        """Regrava a máquina no snapshot (se houver)"""
+        if self.snapshot is not None:
+            self.snapshot.salvar(self.chave, maquina_node.nodeid.to_string(), [tag_para_snapshot(t) for t in tags])
+
+    def navegar(self):
+        """Navega até a máquina, guarda NodeId, nome, classe e tipo de cada variável e salva o snapshot"""
+        self.maquina_node, self._tags = self._navegar()
+        self.origem = "navegacao"
+        self._salvar_snapshot(self.maquina_node, self._tags)
+        return self._tags
+
+    def _validar(self, salvas):
+        """Navega em segundo plano e troca as tags se o servidor mudou desde o snapshot"""
+        try:
+            maquina_node, tags = self._navegar()
+        except CaminhoNaoEncontrado as e:
+            # A máquina sumiu do servidor: a próxima partida navega em vez de usar o snapshot
+            self.snapshot.remover(self.chave)
+            print(f"⚠️ {self.nome}: {e}; removida do snapshot")
+            return
+        except Exception as e:
+            print(f"⚠️ {self.nome}: validação do snapshot falhou ({e}); mantendo os nós salvos")
+            return
+        adicionadas, removidas, alteradas = diferenca(salvas, [tag_para_snapshot(t) for t in tags])
+        self.maquina_node = maquina_node
+        if not (adicionadas or removidas or alteradas):
+            return
+        self._tags = tags
+        self._salvar_snapshot(maquina_node, tags)
+        print(f"♻️ {self.nome}: snapshot atualizado ({len(adicionadas)} novas, {len(removidas)} removidas, "
+              f"{len(alteradas)} alteradas)")
+        if self.ao_atualizar:
+            self.ao_atualizar(tags)
+
+    def aguardar_validacao(self, timeout=None):
+        """Espera a validação em segundo plano terminar (True se terminou)"""
+        if self._validacao:
+            self._validacao.join(timeout)
+            return not self._validacao.is_alive()
+        return True
+
+    def invalidar(self):
+        """Descarta o cache (usar após reconexão); a próxima consulta resolve de novo"""
+        self.maquina_node = None
+        self._tags = None
+        self._max_por_leitura = None
+
+    def reconectar(self, client):
+        """Passa a usar a nova sessão e refaz o cache nela (pelo snapshot, se houver, ou navegando)"""
+        self.client = client
+        self.invalidar()
+        return self.resolver()
+
+    def atualizar(self):
+        """Força uma nova navegação imediatamente (ignora o snapshot)"""
+        self.invalidar()
+        return self.navegar()
+
+    def ler_valores(self, tags=None):
+        """Lê o valor das tags (todas, por padrão) em uma única requisição Read (dividida se necessário)"""
+        tags = self.tags if tags is None else tags
+        if self._max_por_leitura is None:
+            self._max_por_leitura = obter_max_nodes_por_leitura(self.client)
+        valores = ler_em_lote(self.client, [tag.nodeid for tag in tags], self._max_por_leitura, self.nome)
+        return list(zip(tags, valores))
+
+    def nomes_por_nodeid(self):
+        """Mapa NodeId -> nome da variável"""
+        return {tag.nodeid: tag.nome for tag in self.tags}
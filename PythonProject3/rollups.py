@@ -0,0 +1,195 @@
+from datetime import datetime, timedelta
+
+# Tabelas de agregação de dados_opcua, da mais grossa para a mais fina: (tabela, segundos por intervalo)
+ROLLUPS = [
+    ("dados_opcua_1h", 3600),
+    ("dados_opcua_1min", 60),
+]
+
+COLUNAS_ROLLUP = ("tag_id", "inicio", "contagem", "contagem_num", "minimo", "maximo", "soma",
+                  "ultimo_timestamp", "ultimo_num", "ultimo_texto")
+
+# Valor numérico de uma leitura para min/max/média (booleanos contam como 0/1)
+EXPRESSAO_NUMERICA = "COALESCE(d.valor_num, d.valor_int, d.valor_bool::int)::double precision"
+
+
+def _inicio_intervalo(timestamp, segundos):
+    """Início do intervalo de agregação que contém o timestamp"""
+    if segundos == 60:
+        return timestamp.replace(second=0, microsecond=0)
+    if segundos == 3600:
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp - (timestamp - datetime(1970, 1, 1)) % timedelta(seconds=segundos)
+
+
+def agregar(registros, segundos):
+    """Agrega um lote por (tag_id, intervalo): contagem, min, max, soma e último valor
+
+    registros: (timestamp, tag_id, valor_num, valor_int, valor_bool, valor_texto, qualidade, ...)
+    Retorna as linhas no formato de COLUNAS_ROLLUP, ordenadas pela chave.
+    """
+    grupos = {}
+    for timestamp, tag_id, valor_num, valor_int, valor_bool, valor_texto, *_ in registros:
+        if valor_num is not None:
+            numero = valor_num
+        elif valor_int is not None:
+            numero = float(valor_int)
+        elif valor_bool is not None:
+            numero = float(valor_bool)
+        else:
+            numero = None
+
+        chave = (tag_id, _inicio_intervalo(timestamp, segundos))
+        grupo = grupos.get(chave)
+        if grupo is None:
+            grupo = grupos[chave] = [0, 0, None, None, 0.0, timestamp, numero, valor_texto]
+        grupo[0] += 1
+        if numero is not None:
+            grupo[1] += 1
+            grupo[2] = numero if grupo[2] is None else min(grupo[2], numero)
+            grupo[3] = numero if grupo[3] is None else max(grupo[3], numero)
+            grupo[4] += numero
+        if timestamp >= grupo[5]:
+            grupo[5], grupo[6], grupo[7] = timestamp, numero, valor_texto
+
+    return [chave + tuple(grupos[chave]) for chave in sorted(grupos)]
+
+
+def marcadores_unnest(tipos, marcador="%s"):
+    """Parâmetros de array tipados para unnest: "%s::tipo[]" (psycopg2) ou "$n::tipo[]" (asyncpg)"""
+    if marcador == "$":
+        return ", ".join(f"${i}::{tipo}[]" for i, tipo in enumerate(tipos, 1))
+    return ", ".join(f"%s::{tipo}[]" for tipo in tipos)
+
+
+def colunas_do_lote(linhas):
+    """Transpõe as linhas em uma lista por coluna (parâmetros dos unnest)"""
+    return [list(coluna) for coluna in zip(*linhas)]
+
+
+def sql_atualizar_rollup(tabela, marcador="%s"):
+    """INSERT que soma o lote ao que já existe no intervalo (marcador "%s" ou "$" para asyncpg)"""
+    tipos = ("integer", "timestamp", "integer", "integer", "double precision", "double precision",
+             "double precision", "timestamp", "double precision", "text")
+    return f"""
+        INSERT INTO {tabela} AS r ({', '.join(COLUNAS_ROLLUP)})
+        SELECT * FROM unnest({marcadores_unnest(tipos, marcador)})
+        ON CONFLICT (tag_id, inicio) DO UPDATE SET
+            contagem = r.contagem + EXCLUDED.contagem,
+            contagem_num = r.contagem_num + EXCLUDED.contagem_num,
+            minimo = LEAST(r.minimo, EXCLUDED.minimo),
+            maximo = GREATEST(r.maximo, EXCLUDED.maximo),
+            soma = r.soma + EXCLUDED.soma,
+            ultimo_timestamp = GREATEST(r.ultimo_timestamp, EXCLUDED.ultimo_timestamp),
+            ultimo_num = CASE WHEN EXCLUDED.ultimo_timestamp >= r.ultimo_timestamp
+                              THEN EXCLUDED.ultimo_num ELSE r.ultimo_num END,
+            ultimo_texto = CASE WHEN EXCLUDED.ultimo_timestamp >= r.ultimo_timestamp
+                                THEN EXCLUDED.ultimo_texto ELSE r.ultimo_texto END
+    """
+
+
+def rollups_do_lote(registros):
+    """[(tabela, parâmetros por coluna)] do lote para cada agregação que tiver linhas"""
+    lotes = []
+    for tabela, segundos in ROLLUPS:
+        linhas = agregar(registros, segundos)
+        if linhas:
+            lotes.append((tabela, colunas_do_lote(linhas)))
+    return lotes
+
+
+def atualizar_rollups(cursor, registros):
+    """Soma o lote às tabelas de agregação (chamar na mesma transação do COPY)"""
+    for tabela, colunas in rollups_do_lote(registros):
+        cursor.execute(sql_atualizar_rollup(tabela), colunas)
+
+
+def reconstruir_rollups(cursor, inicio=None, fim=None):
+    """Recalcula as agregações a partir do histórico (criação das tabelas, migração, correções)"""
+    # Alinha o período à hora cheia: só intervalos inteiros são recalculados
+    if inicio is not None:
+        inicio = _inicio_intervalo(inicio, 3600)
+    if fim is not None and _inicio_intervalo(fim, 3600) != fim:
+        fim = _inicio_intervalo(fim, 3600) + timedelta(hours=1)
+    filtro = []
+    parametros = []
+    if inicio is not None:
+        filtro.append("d.timestamp >= %s")
+        parametros.append(inicio)
+    if fim is not None:
+        filtro.append("d.timestamp < %s")
+        parametros.append(fim)
+    where = f"WHERE {' AND '.join(filtro)}" if filtro else ""
+
+    for tabela, segundos in ROLLUPS:
+        intervalo = f"'epoch'::timestamp + floor(extract(epoch FROM d.timestamp) / {segundos}) * interval '{segundos} seconds'"
+        if filtro:
+            cursor.execute(f"DELETE FROM {tabela} d {where.replace('d.timestamp', 'd.inicio')}", parametros)
+        else:
+            cursor.execute(f"TRUNCATE {tabela}")
+        cursor.execute(f"""
+            INSERT INTO {tabela} ({', '.join(COLUNAS_ROLLUP)})
+            SELECT d.tag_id, {intervalo} AS inicio,
+                   COUNT(*),
+                   COUNT({EXPRESSAO_NUMERICA}),
+                   MIN({EXPRESSAO_NUMERICA}),
+                   MAX({EXPRESSAO_NUMERICA}),
+                   COALESCE(SUM({EXPRESSAO_NUMERICA}), 0),
+                   MAX(d.timestamp),
+                   (array_agg({EXPRESSAO_NUMERICA} ORDER BY d.timestamp DESC))[1],
+                   (array_agg(d.valor_texto ORDER BY d.timestamp DESC))[1]
+            FROM dados_opcua d
+            {where}
+            GROUP BY d.tag_id, 2
+            ON CONFLICT (tag_id, inicio) DO NOTHING
+        """, parametros)
+
+
+def escolher_fonte(passo_s):
+    """Escolhe a agregação mais grossa que ainda cabe no passo pedido (None = histórico bruto)"""
+    for tabela, segundos in ROLLUPS:
+        if passo_s >= segundos and passo_s % segundos == 0:
+            return tabela, segundos
+    return None, None
+
+
+def consultar_serie(cursor, linha, maquina, funcao, inicio, fim, passo_s):
+    """Série agregada de uma tag: (início, contagem, mínimo, máximo, média, último) por passo
+
+    Lê da agregação mais grossa que atende o passo; só cai no histórico bruto para
+    passos menores que um minuto.
+    """
+    tabela, _ = escolher_fonte(passo_s)
+    intervalo = f"'epoch'::timestamp + floor(extract(epoch FROM {{coluna}}) / {int(passo_s)}) * interval '{int(passo_s)} seconds'"
+
+    if tabela:
+        cursor.execute(f"""
+            SELECT {intervalo.format(coluna='r.inicio')} AS passo,
+                   SUM(r.contagem),
+                   MIN(r.minimo),
+                   MAX(r.maximo),
+                   SUM(r.soma) / NULLIF(SUM(r.contagem_num), 0),
+                   (array_agg(COALESCE(r.ultimo_num::text, r.ultimo_texto) ORDER BY r.ultimo_timestamp DESC))[1]
+            FROM {tabela} r
+            JOIN tags_opcua t ON t.id = r.tag_id
+            WHERE t.linha = %s AND t.maquina = %s AND t.funcao = %s
+              AND r.inicio >= %s AND r.inicio < %s
+            GROUP BY 1
+            ORDER BY 1
+        """, (linha, maquina, funcao, inicio, fim))
+    else:
+        cursor.execute(f"""
+            SELECT {intervalo.format(coluna='d.timestamp')} AS passo,
+                   COUNT(*),
+                   MIN({EXPRESSAO_NUMERICA}),
+                   MAX({EXPRESSAO_NUMERICA}),
+                   AVG({EXPRESSAO_NUMERICA}),
+                   (array_agg(COALESCE({EXPRESSAO_NUMERICA}::text, d.valor_texto) ORDER BY d.timestamp DESC))[1]
+            FROM dados_opcua d
+            JOIN tags_opcua t ON t.id = d.tag_id
+            WHERE t.linha = %s AND t.maquina = %s AND t.funcao = %s
+              AND d.timestamp >= %s AND d.timestamp < %s
+            GROUP BY 1
+            ORDER BY 1
+        """, (linha, maquina, funcao, inicio, fim))
+    return cursor.fetchall()
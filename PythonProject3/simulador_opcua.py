@@ -0,0 +1,207 @@
+from opcua import Server, ua
+from datetime import datetime
+import argparse
+import random
+import threading
+import time
+
+# Nome base e tipo OPC UA de cada tipo de variável simulada
+TIPOS = {
+    "float": ("Temperatura", ua.VariantType.Double),
+    "int": ("Contador", ua.VariantType.Int32),
+    "bool": ("Alarme", ua.VariantType.Boolean),
+    "texto": ("Receita", ua.VariantType.String),
+}
+TIPOS_PADRAO = {"float": 60, "int": 20, "bool": 15, "texto": 5}
+MAQUINAS_PADRAO = ["Palletizer", "Enchedora", "Rotuladora", "Encaixotadora"]
+
+
+def ler_tipos(texto):
+    """Converte "float=60,int=20" em {"float": 60, "int": 20}"""
+    tipos = {}
+    for parte in texto.split(","):
+        nome, _, peso = parte.partition("=")
+        if nome.strip() not in TIPOS:
+            raise ValueError(f"Tipo '{nome}' desconhecido (use {', '.join(TIPOS)})")
+        tipos[nome.strip()] = float(peso or 1)
+    return tipos
+
+
+def montar_estrutura(linhas=1, maquinas=1, tags=100, tipos=None, semente=0):
+    """Define Matics/<linha>/<máquina>/<tag> com os tipos sorteados pelos pesos
+
+    Retorna [(linha, maquina, [(nome, tipo), ...]), ...]; as tags são divididas igualmente
+    entre as máquinas.
+    """
+    tipos = tipos or TIPOS_PADRAO
+    sorteio = random.Random(semente)
+    nomes_tipos = list(tipos)
+    pesos = [tipos[nome] for nome in nomes_tipos]
+
+    pares = []
+    for l in range(linhas):
+        for m in range(maquinas):
+            nome_maquina = MAQUINAS_PADRAO[m % len(MAQUINAS_PADRAO)]
+            if m >= len(MAQUINAS_PADRAO):
+                nome_maquina += str(m // len(MAQUINAS_PADRAO) + 1)
+            pares.append((f"Serac{l + 1}", nome_maquina))
+
+    estrutura = []
+    for i, (linha, maquina) in enumerate(pares):
+        quantidade = tags // len(pares) + (1 if i < tags % len(pares) else 0)
+        variaveis = []
+        for n in range(quantidade):
+            tipo = sorteio.choices(nomes_tipos, pesos)[0]
+            variaveis.append((f"{TIPOS[tipo][0]}_{n + 1:05d}", tipo))
+        estrutura.append((linha, maquina, variaveis))
+    return estrutura
+
+
+def valor_inicial(tipo, sorteio):
+    """Primeiro valor de uma variável do tipo"""
+    if tipo == "float":
+        return round(sorteio.uniform(0, 100), 3)
+    if tipo == "int":
+        return sorteio.randint(0, 1000)
+    if tipo == "bool":
+        return False
+    return "Receita 1"
+
+
+def proximo_valor(tipo, valor, sorteio):
+    """Novo valor de uma variável: passeio aleatório, contador, alternância ou troca de receita"""
+    if tipo == "float":
+        return round(valor + sorteio.uniform(-1, 1), 3)
+    if tipo == "int":
+        return valor + 1
+    if tipo == "bool":
+        return not valor
+    return f"Receita {int(valor.split()[-1]) % 20 + 1}"
+
+
+class SimuladorOPCUA:
+    """Servidor OPC UA que reproduz a hierarquia do KepServer (Matics/<linha>/<máquina>)
+
+    mudancas_s: mudanças por segundo de cada tag que varia (média)
+    fracao_estatica: parte das tags que nunca muda (exercita filtro e polling adaptativo)
+    """
+
+    def __init__(self, endereco="opc.tcp://127.0.0.1:4841", pasta="Matics", linhas=1, maquinas=1, tags=100,
+                 tipos=None, mudancas_s=1.0, fracao_estatica=0.0, passo_s=0.1, semente=0):
+        if not 1 <= tags <= 50000:
+            raise ValueError("O simulador aceita de 1 a 50000 tags")
+        self.endereco = endereco
+        self.pasta = pasta
+        self.estrutura = montar_estrutura(linhas, maquinas, tags, tipos, semente)
+        self.mudancas_s = mudancas_s
+        self.fracao_estatica = fracao_estatica
+        self.passo_s = passo_s
+        self._sorteio = random.Random(semente)
+
+        self.server = None
+        self._variaveis = []  # [node, tipo, valor] das tags que mudam
+        self._thread = None
+        self._parar = threading.Event()
+        self.mudancas = 0
+
+    @property
+    def total_tags(self):
+        return sum(len(variaveis) for _, _, variaveis in self.estrutura)
+
+    def iniciar(self):
+        """Cria o espaço de endereços, sobe o servidor e a thread que muda os valores"""
+        self.server = Server()
+        self.server.set_endpoint(self.endereco)
+        self.server.set_server_name("Simulador OPC UA Matics")
+        idx = self.server.register_namespace("urn:simulador:matics")
+
+        pasta = self.server.get_objects_node().add_folder(ua.NodeId(self.pasta, idx), f"{idx}:{self.pasta}")
+        nodes_linha = {}
+        for linha, maquina, variaveis in self.estrutura:
+            if linha not in nodes_linha:
+                nodes_linha[linha] = pasta.add_folder(ua.NodeId(linha, idx), f"{idx}:{linha}")
+            node_linha = nodes_linha[linha]
+            node_maquina = node_linha.add_object(ua.NodeId(f"{linha}.{maquina}", idx), f"{idx}:{maquina}")
+            # Como no KepServer: variáveis de sistema com "_" no nome, ignoradas pelo coletor
+            node_maquina.add_variable(ua.NodeId(f"{linha}.{maquina}._Status", idx), f"{idx}:_Status", "OK")
+            for nome, tipo in variaveis:
+                valor = valor_inicial(tipo, self._sorteio)
+                node = node_maquina.add_variable(ua.NodeId(f"{linha}.{maquina}.{nome}", idx), f"{idx}:{nome}",
+                                                 valor, TIPOS[tipo][1])
+                if self._sorteio.random() >= self.fracao_estatica:
+                    self._variaveis.append([node, tipo, valor])
+
+        self.server.start()
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._loop, name="simulador", daemon=True)
+        self._thread.start()
+        return self
+
+    def _loop(self):
+        """A cada passo muda em média mudancas_s * passo_s de cada tag variável, sem deriva"""
+        proximo = time.monotonic()
+        acumulado = 0.0
+        while not self._parar.is_set():
+            acumulado += len(self._variaveis) * self.mudancas_s * self.passo_s
+            quantidade = min(int(acumulado), len(self._variaveis))
+            acumulado -= quantidade
+            agora = datetime.utcnow()
+            for variavel in self._sorteio.sample(self._variaveis, quantidade):
+                node, tipo, valor = variavel
+                variavel[2] = proximo_valor(tipo, valor, self._sorteio)
+                valor_dv = ua.DataValue(ua.Variant(variavel[2], TIPOS[tipo][1]))
+                valor_dv.SourceTimestamp = valor_dv.ServerTimestamp = agora
+                node.set_value(valor_dv)
+            self.mudancas += quantidade
+            proximo += self.passo_s
+            self._parar.wait(max(0.0, proximo - time.monotonic()))
+
+    def parar(self):
+        """Para a thread de mudanças e o servidor"""
+        self._parar.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self.server:
+            self.server.stop()
+            self.server = None
+
+
+def ler_argumentos():
+    """Lê os argumentos de linha de comando"""
+    parser = argparse.ArgumentParser(description="Servidor OPC UA simulado com a hierarquia Matics/<linha>/<máquina>")
+    parser.add_argument("--endereco", default="opc.tcp://127.0.0.1:4841", help="endpoint do servidor")
+    parser.add_argument("--linhas", type=int, default=1, help="número de linhas (Serac1, Serac2, ...)")
+    parser.add_argument("--maquinas", type=int, default=1, help="máquinas por linha")
+    parser.add_argument("--tags", type=int, default=100, help="total de tags, divididas entre as máquinas (1 a 50000)")
+    parser.add_argument("--tipos", type=ler_tipos, default=TIPOS_PADRAO,
+                        help="pesos dos tipos, ex.: float=60,int=20,bool=15,texto=5")
+    parser.add_argument("--mudancas-s", type=float, default=1.0, help="mudanças por segundo de cada tag que varia")
+    parser.add_argument("--fracao-estatica", type=float, default=0.0, help="fração das tags que nunca muda (0 a 1)")
+    parser.add_argument("--semente", type=int, default=0, help="semente do sorteio (estrutura reprodutível)")
+    return parser.parse_args()
+
+
+def main():
+    """Função principal"""
+    args = ler_argumentos()
+    simulador = SimuladorOPCUA(args.endereco, linhas=args.linhas, maquinas=args.maquinas, tags=args.tags,
+                               tipos=args.tipos, mudancas_s=args.mudancas_s,
+                               fracao_estatica=args.fracao_estatica, semente=args.semente)
+    simulador.iniciar()
+    print(f"✅ Simulador em {args.endereco}: {simulador.total_tags} tags em "
+          f"{len(simulador.estrutura)} máquinas ({args.mudancas_s:g} mudanças/s por tag)")
+    for linha, maquina, variaveis in simulador.estrutura:
+        print(f"   {simulador.pasta}/{linha}/{maquina}: {len(variaveis)} tags")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"📊 {simulador.mudancas} mudanças publicadas")
+    except KeyboardInterrupt:
+        print("\n👋 Interrompido pelo usuário.")
+    finally:
+        simulador.parar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+# Versão do formato do arquivo; um arquivo de outra versão é ignorado (e refeito na navegação)
+VERSAO_SNAPSHOT = 1
+
+
+class SnapshotTags:
+    """Cópia local do espaço de endereços resolvido, por máquina, para o coletor partir sem navegar
+
+    Cada máquina ("Matics/Serac4/Palletizer") guarda o NodeId do nó da máquina e, de cada
+    variável, NodeId, nome, classe e tipo de dado (NodeIds em texto, ex.: "ns=2;s=Serac4.Palletizer.Temp").
+    Com caminho=None fica só em memória (compartilha a resolução em lote entre as máquinas).
+    """
+
+    def __init__(self, caminho="snapshot_opcua.json"):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._maquinas = self._carregar()
+        self._salvas_em = {}  # chave -> time.monotonic() do último salvar neste processo
+
+    def _carregar(self):
+        """Lê o arquivo (arquivo ausente, corrompido ou de outra versão = snapshot vazio)"""
+        if not self.caminho or not os.path.exists(self.caminho):
+            return {}
+        try:
+            with open(self.caminho, encoding="utf-8") as arquivo:
+                dados = json.load(arquivo)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Snapshot {self.caminho} ignorado: {e}")
+            return {}
+        if dados.get("versao") != VERSAO_SNAPSHOT:
+            print(f"⚠️ Snapshot {self.caminho} de outra versão ignorado")
+            return {}
+        return dados.get("maquinas", {})
+
+    def obter(self, chave):
+        """Entrada salva da máquina ({"maquina", "tags", "salvo_em"}) ou None"""
+        with self._lock:
+            return self._maquinas.get(chave)
+
+    def salvar(self, chave, maquina, tags):
+        """Guarda a máquina e regrava o arquivo (escrita atômica: temporário + rename)
+
+        tags: [{"nodeid", "nome", "classe", "tipo"}, ...]
+        """
+        with self._lock:
+            self._maquinas[chave] = {
+                "maquina": maquina,
+                "tags": tags,
+                "salvo_em": datetime.now().isoformat(timespec="seconds"),
+            }
+            self._salvas_em[chave] = time.monotonic()
+            self._gravar()
+
+    def _gravar(self):
+        """Regrava o arquivo inteiro (chamar com o lock); sem caminho, não faz nada"""
+        if not self.caminho:
+            return
+        temporario = f"{self.caminho}.tmp"
+        try:
+            with open(temporario, "w", encoding="utf-8") as arquivo:
+                json.dump({"versao": VERSAO_SNAPSHOT, "maquinas": self._maquinas}, arquivo, ensure_ascii=False)
+            os.replace(temporario, self.caminho)
+        except OSError as e:
+            print(f"⚠️ Não foi possível salvar o snapshot {self.caminho}: {e}")
+
+    def recente(self, chave, segundos):
+        """Indica se a máquina foi resolvida neste processo há menos de segundos (dispensa validar)"""
+        with self._lock:
+            salva_em = self._salvas_em.get(chave)
+        return salva_em is not None and time.monotonic() - salva_em < segundos
+
+    def remover(self, chave):
+        """Esquece a máquina (a próxima partida navega de novo)"""
+        with self._lock:
+            self._salvas_em.pop(chave, None)
+            existia = self._maquinas.pop(chave, None) is not None
+            if existia:
+                self._gravar()
+        return existia
+
+    def __len__(self):
+        with self._lock:
+            return len(self._maquinas)
+
+
+def diferenca(antigas, novas):
+    """Compara duas listas de tags do snapshot: (adicionadas, removidas, alteradas) por NodeId"""
+    antes = {tag["nodeid"]: tag for tag in antigas}
+    depois = {tag["nodeid"]: tag for tag in novas}
+    adicionadas = [nodeid for nodeid in depois if nodeid not in antes]
+    removidas = [nodeid for nodeid in antes if nodeid not in depois]
+    alteradas = [nodeid for nodeid in depois if nodeid in antes and depois[nodeid] != antes[nodeid]]
+    return adicionadas, removidas, alteradas
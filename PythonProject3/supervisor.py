@@ -0,0 +1,285 @@
+import random
+import threading
+import time
+from concurrent.futures import TimeoutError as TimeoutFuturo
+from contextlib import contextmanager
+import psycopg2
+import psycopg2.pool
+from opcua import Client, ua
+from database_manager import parametros_banco
+from metricas import METRICAS
+
+# Status OPC UA que indicam sessão ou canal perdidos (a sessão precisa ser refeita)
+CODIGOS_SESSAO_PERDIDA = {
+    getattr(ua.StatusCodes, nome) for nome in (
+        "BadSessionIdInvalid", "BadSessionClosed", "BadSessionNotActivated",
+        "BadSecureChannelIdInvalid", "BadSecureChannelClosed", "BadConnectionClosed",
+        "BadNotConnected", "BadServerNotConnected", "BadCommunicationError",
+        "BadServerHalted", "BadShutdown", "BadTimeout",
+    ) if hasattr(ua.StatusCodes, nome)
+}
+
+
+def falha_de_conexao(e):
+    """Indica se a exceção é de conexão perdida (socket, timeout, sessão) e não de uma tag ou de um dado"""
+    if isinstance(e, (OSError, TimeoutFuturo, psycopg2.OperationalError, psycopg2.InterfaceError)):
+        return True
+    if isinstance(e, ua.UaStatusCodeError):
+        return getattr(e, "code", None) in CODIGOS_SESSAO_PERDIDA
+    return False
+
+
+class EsperaExponencial:
+    """Espera entre tentativas que dobra a cada falha (com um pouco de aleatoriedade) até um máximo"""
+
+    def __init__(self, inicial_s=1.0, maximo_s=30.0, fator=2.0, variacao=0.2):
+        self.inicial_s = inicial_s
+        self.maximo_s = maximo_s
+        self.fator = fator
+        self.variacao = variacao  # ±20%: várias máquinas não tentam todas no mesmo instante
+        self.tentativas = 0
+
+    def proxima(self):
+        """Tempo a esperar antes da próxima tentativa"""
+        base = min(self.inicial_s * self.fator ** self.tentativas, self.maximo_s)
+        self.tentativas += 1
+        return base * random.uniform(1 - self.variacao, 1 + self.variacao)
+
+    def reiniciar(self):
+        """Volta à espera inicial (chamar quando a conexão der certo)"""
+        self.tentativas = 0
+
+
+class PoolBanco:
+    """Pool de conexões PostgreSQL (psycopg2.pool) que só empresta conexões saudáveis
+
+    Uma conexão parada há mais de verificar_apos_s passa por um SELECT 1 antes de ser
+    emprestada; a que falhar (ou cair durante o uso) é fechada e a próxima retirada abre outra.
+    """
+
+    def __init__(self, config=None, minimo=1, maximo=4, verificar_apos_s=30):
+        self.verificar_apos_s = verificar_apos_s
+        self._pool = psycopg2.pool.ThreadedConnectionPool(minimo, maximo, **parametros_banco(config))
+        self._vagas = threading.BoundedSemaphore(maximo)  # retirada espera em vez de estourar o pool
+        self._lock = threading.Lock()
+        self._usadas_em = {}  # conexão -> time.monotonic() do último uso sem erro
+
+        # Estatísticas
+        self.emprestimos = 0
+        self.verificacoes = 0
+        self.descartadas = 0
+
+    def _saudavel(self, conn):
+        """Confere a conexão com um SELECT 1 se ela ficou parada tempo demais"""
+        if conn.closed:
+            return False
+        with self._lock:
+            usada_em = self._usadas_em.get(conn)
+        if usada_em is not None and time.monotonic() - usada_em < self.verificar_apos_s:
+            return True
+        self.verificacoes += 1
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _devolver(self, conn, descartar=False):
+        """Devolve a conexão ao pool (fechando-a, se descartar)"""
+        with self._lock:
+            if descartar:
+                self._usadas_em.pop(conn, None)
+                self.descartadas += 1
+            else:
+                self._usadas_em[conn] = time.monotonic()
+        self._pool.putconn(conn, close=descartar or bool(conn.closed))
+
+    @contextmanager
+    def conexao(self):
+        """Empresta uma conexão saudável; se ela cair durante o uso, é descartada e o erro segue"""
+        with self._vagas:
+            conn = self._pool.getconn()
+            while not self._saudavel(conn):
+                self._devolver(conn, descartar=True)
+                conn = self._pool.getconn()  # abre outra; levanta exceção se o banco estiver fora
+            self.emprestimos += 1
+            try:
+                yield conn
+            except Exception as e:
+                self._devolver(conn, descartar=bool(conn.closed) or falha_de_conexao(e))
+                raise
+            self._devolver(conn)
+
+    def resumo(self):
+        """Retorna as estatísticas formatadas para exibição"""
+        return (f"{self.emprestimos} empréstimos, {self.verificacoes} verificações, "
+                f"{self.descartadas} conexões descartadas")
+
+    def fechar(self):
+        """Fecha todas as conexões do pool"""
+        self._pool.closeall()
+
+
+class SessaoOPCUA:
+    """Sessão OPC UA supervisionada: reconecta com backoff e refaz o que dependia da sessão
+
+    Quem guarda algo da sessão (assinaturas, cache de nós, filtro) registra uma função em
+    ao_reconectar; ela é chamada com o novo Client depois de cada reconexão.
+    """
+
+    def __init__(self, endereco, espera_inicial_s=1.0, espera_max_s=30.0, timeout_s=4):
+        self.endereco = endereco
+        self.timeout_s = timeout_s  # prazo de cada requisição ao servidor (Read, Browse, ...)
+        self.espera = EsperaExponencial(espera_inicial_s, espera_max_s)
+        self.client = None
+        self.ao_reconectar = []
+
+        # Estatísticas
+        self.conexoes = 0
+        self.reconexoes = 0
+        self.tentativas_falhas = 0
+        self.ultima_recuperacao_s = None
+
+    def conectar(self, parar=None):
+        """Conecta, tentando de novo com backoff até conseguir; None se parar for sinalizado antes"""
+        while parar is None or not parar.is_set():
+            client = Client(self.endereco, timeout=self.timeout_s)
+            try:
+                client.connect()
+            except Exception as e:
+                self.tentativas_falhas += 1
+                espera = self.espera.proxima()
+                print(f"⚠️ {self.endereco}: conexão falhou ({e}); nova tentativa em {espera:.1f} s")
+                if parar is not None:
+                    parar.wait(espera)
+                else:
+                    time.sleep(espera)
+                continue
+            self.client = client
+            self.espera.reiniciar()
+            self.conexoes += 1
+            return client
+        return None
+
+    def verificar(self):
+        """Lê o estado do servidor (ServerStatus.State); False se a sessão não responde ou o servidor não está Running"""
+        if not self.client:
+            return False
+        try:
+            estado = self.client.get_node(ua.ObjectIds.Server_ServerStatus_State).get_value()
+            return estado == ua.ServerState.Running
+        except Exception:
+            return False
+
+    def reconectar(self, motivo, parar=None):
+        """Descarta a sessão atual, conecta de novo e avisa os interessados; retorna o novo Client"""
+        inicio = time.monotonic()
+        print(f"🔌 {self.endereco}: reconectando ({motivo})")
+        self.desconectar()
+        client = self.conectar(parar)
+        if client is None:
+            return None
+        self.reconexoes += 1
+        for funcao in self.ao_reconectar:
+            funcao(client)
+        self.ultima_recuperacao_s = time.monotonic() - inicio
+        print(f"✅ {self.endereco}: sessão recuperada em {self.ultima_recuperacao_s:.1f} s")
+        return client
+
+    def abortar(self):
+        """Fecha o socket sem encerrar a sessão: quem estiver preso numa chamada recebe erro na hora
+
+        Chamado de outra thread (o vigia); a thread presa trata o erro e reconecta.
+        """
+        client = self.client
+        if client:
+            try:
+                client.disconnect_socket()
+            except Exception:
+                pass
+
+    def desconectar(self):
+        """Fecha a sessão (ignora erro: com o socket caído não há o que fechar)"""
+        client, self.client = self.client, None
+        if client:
+            try:
+                client.disconnect()
+            except Exception:
+                pass
+
+    def resumo(self):
+        """Retorna as estatísticas formatadas para exibição"""
+        texto = f"{self.conexoes} conexões, {self.reconexoes} reconexões, {self.tentativas_falhas} tentativas falhas"
+        if self.ultima_recuperacao_s is not None:
+            texto += f", última recuperação em {self.ultima_recuperacao_s:.1f} s"
+        return texto
+
+
+class Vigia:
+    """Watchdog das chamadas de aquisição: uma chamada que passa do prazo é abortada
+
+    Cada coletor envolve suas leituras e navegações em vigiar(nome, prazo_s, ao_travar); uma
+    thread confere a cada intervalo_s se alguma passou do prazo e, nesse caso, registra o
+    travamento em opcua_travamento_segundos e chama ao_travar() (normalmente sessao.abortar).
+    Só a máquina travada é reciclada: as outras seguem com suas sessões.
+    """
+
+    def __init__(self, intervalo_s=1.0):
+        self.intervalo_s = intervalo_s
+        self._vigiadas = {}  # id da chamada -> (nome, início, prazo_s, ao_travar)
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+        self.travamentos = 0
+
+    def iniciar(self):
+        """Inicia a thread do vigia"""
+        if self._thread is None:
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._loop, name="vigia", daemon=True)
+            self._thread.start()
+        return self
+
+    @contextmanager
+    def vigiar(self, nome, prazo_s, ao_travar):
+        """Vigia o bloco: se ele não terminar em prazo_s, ao_travar() é chamado pela thread do vigia"""
+        chave = object()
+        with self._lock:
+            self._vigiadas[chave] = (nome, time.monotonic(), prazo_s, ao_travar)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._vigiadas.pop(chave, None)
+
+    def verificar(self):
+        """Aborta as chamadas vencidas (uma vez cada); retorna quantas foram abortadas"""
+        agora = time.monotonic()
+        with self._lock:
+            vencidas = [(chave, dados) for chave, dados in self._vigiadas.items() if agora - dados[1] > dados[2]]
+            for chave, _ in vencidas:
+                del self._vigiadas[chave]
+        for _, (nome, inicio, prazo_s, ao_travar) in vencidas:
+            self.travamentos += 1
+            METRICAS.observar("opcua_travamento_segundos", agora - inicio, nome)
+            print(f"⛔ {nome}: chamada parada há {agora - inicio:.1f} s (prazo {prazo_s:g} s); abortando a sessão")
+            try:
+                ao_travar()
+            except Exception as e:
+                print(f"⚠️ {nome}: erro ao abortar a chamada travada: {e}")
+        return len(vencidas)
+
+    def _loop(self):
+        """Loop da thread do vigia"""
+        while not self._parar.wait(self.intervalo_s):
+            self.verificar()
+
+    def parar(self):
+        """Para a thread do vigia"""
+        if self._thread:
+            self._parar.set()
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,105 @@
+import heapq
+import time
+
+
+class TaxaAdaptativa:
+    """Período de leitura por tag, adaptado à frequência de mudança observada
+
+    - Tag que mudou desde a última leitura: o período cai pela metade (até periodo_min_s)
+    - Tag que não mudou: o período cresce fator_aumento vezes (até periodo_max_s)
+    - Se a soma das taxas (1 / período) passar de orcamento_leituras_s, todos os períodos
+      são esticados na mesma proporção para caber no orçamento
+    """
+
+    def __init__(self, tags, periodo_min_s=0.1, periodo_max_s=60, orcamento_leituras_s=None,
+                 fator_aumento=1.5, periodo_inicial_s=None, agora=None):
+        self.periodo_min_s = periodo_min_s
+        self.periodo_max_s = periodo_max_s
+        self.orcamento_leituras_s = orcamento_leituras_s
+        self.fator_aumento = fator_aumento
+
+        agora = time.monotonic() if agora is None else agora
+        inicial = min(periodo_max_s, max(periodo_min_s, periodo_inicial_s or periodo_min_s))
+        self.tags = list(tags)
+        self._indice = {tag: i for i, tag in enumerate(self.tags)}
+        self._periodo = [inicial] * len(self.tags)
+        self._ultimo = [None] * len(self.tags)
+        self._lido = [False] * len(self.tags)
+        self._proximo = [agora] * len(self.tags)
+        self._fila = [(agora, i) for i in range(len(self.tags))]  # (próxima leitura, índice)
+        self._demanda = len(self.tags) / inicial  # soma de 1 / período
+
+        # Estatísticas
+        self.leituras = 0
+        self.mudancas = 0
+
+    def _escala(self):
+        """Fator que estica os períodos para caber no orçamento de leituras/s"""
+        if not self.orcamento_leituras_s or self._demanda <= self.orcamento_leituras_s:
+            return 1.0
+        return self._demanda / self.orcamento_leituras_s
+
+    def periodo_efetivo(self, tag):
+        """Período aplicado à tag, já considerando o orçamento"""
+        i = self._indice[tag]
+        return min(self.periodo_max_s, self._periodo[i] * self._escala())
+
+    def devidas(self, agora=None):
+        """Retorna as tags cuja próxima leitura já venceu (e as reagenda provisoriamente)"""
+        agora = time.monotonic() if agora is None else agora
+        escala = self._escala()
+        tags = []
+        while self._fila and self._fila[0][0] <= agora:
+            previsto, i = heapq.heappop(self._fila)
+            if previsto != self._proximo[i]:
+                continue  # entrada antiga: a tag já foi reagendada
+            # Se a leitura falhar e registrar não for chamado, a tag volta no período atual
+            self._proximo[i] = agora + min(self.periodo_max_s, self._periodo[i] * escala)
+            heapq.heappush(self._fila, (self._proximo[i], i))
+            tags.append(self.tags[i])
+        return tags
+
+    def registrar(self, tag, valor, agora=None):
+        """Registra o valor lido, adapta o período da tag e agenda a próxima leitura"""
+        agora = time.monotonic() if agora is None else agora
+        i = self._indice[tag]
+        self.leituras += 1
+
+        anterior = self._periodo[i]
+        if self._lido[i] and valor != self._ultimo[i]:
+            self.mudancas += 1
+            novo = max(self.periodo_min_s, anterior / 2)
+        elif self._lido[i]:
+            novo = min(self.periodo_max_s, anterior * self.fator_aumento)
+        else:
+            novo = anterior
+        self._ultimo[i] = valor
+        self._lido[i] = True
+
+        if novo != anterior:
+            self._periodo[i] = novo
+            self._demanda += 1 / novo - 1 / anterior
+        self._proximo[i] = agora + min(self.periodo_max_s, novo * self._escala())
+        heapq.heappush(self._fila, (self._proximo[i], i))
+
+        # Evita que a fila cresça sem limite com entradas antigas
+        if len(self._fila) > 4 * len(self.tags) + 64:
+            self._fila = [(self._proximo[j], j) for j in range(len(self.tags))]
+            heapq.heapify(self._fila)
+
+    def leituras_por_segundo(self):
+        """Taxa de leitura prevista com os períodos atuais (já limitada pelo orçamento)"""
+        return sum(1 / min(self.periodo_max_s, p * self._escala()) for p in self._periodo)
+
+    def resumo(self):
+        """Retorna as estatísticas formatadas para exibição"""
+        if not self.tags:
+            return "nenhuma tag"
+        periodos = sorted(min(self.periodo_max_s, p * self._escala()) for p in self._periodo)
+        mediana = periodos[len(periodos) // 2]
+        texto = (f"{len(self.tags)} tags, {self.leituras_por_segundo():.1f} leituras/s previstas, "
+                 f"período {periodos[0]:g}–{periodos[-1]:g} s (mediana {mediana:g} s), "
+                 f"{self.mudancas} mudanças em {self.leituras} leituras")
+        if self._escala() > 1:
+            texto += f", limitado pelo orçamento de {self.orcamento_leituras_s:g} leituras/s"
+        return texto
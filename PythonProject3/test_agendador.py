@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import time
+from agendador import Agendador, CLASSE_PADRAO, agrupar_por_classe, executar_agendado
+
+def test_agendador():
+    """Testa a grade sem deriva, os overruns e as classes de varredura"""
+    print("🔧 Testando agendador de taxa fixa...")
+
+    # Sem deriva: 10 ciclos de 50 ms que levam 20 ms cada terminam em ~0.5 s (não 0.7 s)
+    agendador = Agendador({CLASSE_PADRAO: 0.05})
+    inicio = time.monotonic()
+    for _ in range(10):
+        agendador.aguardar()
+        time.sleep(0.02)
+        agendador.concluir(CLASSE_PADRAO)
+    agendador.aguardar()
+    decorrido = time.monotonic() - inicio
+    print(f"  10 ciclos de 50 ms: {decorrido:.3f} s")
+    assert 0.49 <= decorrido < 0.58
+    assert agendador.overruns[CLASSE_PADRAO] == 0
+
+    # Overrun: ciclo de 120 ms com período de 50 ms pula os pontos da grade perdidos
+    agendador = Agendador({CLASSE_PADRAO: 0.05})
+    agendador.aguardar()
+    time.sleep(0.12)
+    agendador.concluir(CLASSE_PADRAO)
+    print(f"  {agendador.resumo()}")
+    assert agendador.overruns[CLASSE_PADRAO] == 1
+    assert agendador.perdidos[CLASSE_PADRAO] == 2
+
+    # Classes de varredura por padrão de nome
+    classes = [{"nome": "rapida", "periodo_s": 0.02, "padroes": ["*Contador*"]},
+               {"nome": "lenta", "periodo_s": 0.1, "padroes": ["Serac4/Palletizer/Receita*"]}]
+    grupos = agrupar_por_classe(["ContadorCaixas", "ReceitaAtual", "Temperatura"], classes, "Serac4/Palletizer/")
+    print(f"  Grupos: {grupos}")
+    assert grupos == {"rapida": ["ContadorCaixas"], "lenta": ["ReceitaAtual"], CLASSE_PADRAO: ["Temperatura"]}
+
+    # Cada classe roda no seu período
+    agendador = Agendador({"rapida": 0.02, "lenta": 0.1})
+    ciclos = {"rapida": 0, "lenta": 0}
+    parar = threading.Event()
+    threading.Timer(0.35, parar.set).start()
+    executar_agendado(agendador, lambda classe: ciclos.__setitem__(classe, ciclos[classe] + 1), parar)
+    print(f"  Ciclos em 0.35 s: {ciclos}")
+    assert 16 <= ciclos["rapida"] <= 19 and ciclos["lenta"] == 4
+
+    print("✅ Agendador OK")
+
+def test_agendador_async():
+    """Testa a mesma grade no event loop (motor assíncrono)"""
+    print("🔧 Testando agendador no asyncio...")
+
+    async def ciclos(agendador, n, duracao_s):
+        inicio = asyncio.get_running_loop().time()
+        for _ in range(n):
+            classe = await agendador.aguardar_async()
+            await asyncio.sleep(duracao_s)
+            agendador.concluir(classe)
+        await agendador.aguardar_async()
+        return asyncio.get_running_loop().time() - inicio
+
+    # Sem deriva: 10 ciclos de 50 ms que levam 20 ms cada terminam em ~0.5 s
+    agendador = Agendador({CLASSE_PADRAO: 0.05})
+    decorrido = asyncio.run(ciclos(agendador, 10, 0.02))
+    print(f"  10 ciclos de 50 ms: {decorrido:.3f} s")
+    assert 0.49 <= decorrido < 0.58
+    assert agendador.overruns[CLASSE_PADRAO] == 0
+
+    # Overrun contado do mesmo jeito
+    agendador = Agendador({CLASSE_PADRAO: 0.05})
+    asyncio.run(ciclos(agendador, 1, 0.12))
+    assert agendador.overruns[CLASSE_PADRAO] == 1 and agendador.perdidos[CLASSE_PADRAO] == 2
+
+    print("✅ Agendador async OK")
+
+if __name__ == "__main__":
+    print("🧪 TESTE DO AGENDADOR")
+    print("=" * 40)
+
+    test_agendador()
+    test_agendador_async()
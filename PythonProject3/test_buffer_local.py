@@ -0,0 +1,109 @@
+import os
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+from buffer_local import BufferLocal, DrenadorBuffer
+
+class EscritorInstavel:
+    """Escritor falso: falha enquanto o 'banco' estiver fora e guarda o que foi gravado"""
+    def __init__(self):
+        self.fora = True
+        self.linhas = []
+
+    def gravar(self, linhas):
+        if self.fora:
+            raise ConnectionError("banco fora do ar")
+        self.linhas.extend(linhas)
+        return len(linhas)
+
+class DiscoCheio:
+    """Conexão SQLite falsa: o próximo INSERT falha como com o disco cheio"""
+    def __init__(self, db):
+        self.db = db
+
+    def executemany(self, *args):
+        raise sqlite3.OperationalError("database or disk is full")
+
+    def __getattr__(self, nome):
+        return getattr(self.db, nome)
+
+def test_buffer_local():
+    """Testa persistência, reinício, drenagem e limite de disco do buffer local"""
+    print("🔧 Testando buffer local...")
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "buffer.db")
+        agora = datetime.now()
+
+        # Leituras com tipos diferentes sobrevivem ao fechamento do arquivo
+        buffer = BufferLocal(caminho, max_linhas=2)
+        for funcao, valor in [("Ligado", True), ("Contador", 42), ("Temperatura", 21.5), ("Receita", "A1"), ("Vazio", None)]:
+            buffer.adicionar(agora, "Serac4", "Palletizer", funcao, valor, "Good")
+        buffer.fechar()
+        print(f"  Após fechar: {buffer.resumo()}")
+
+        buffer = BufferLocal(caminho)
+        assert buffer.pendentes() == 5
+
+        # Banco fora: nada sai do buffer
+        escritor = EscritorInstavel()
+        drenador = DrenadorBuffer(buffer, escritor, tamanho_lote=3)
+        try:
+            drenador.drenar_lote()
+            assert False, "deveria falhar com o banco fora"
+        except ConnectionError:
+            pass
+        assert buffer.pendentes() == 5
+
+        # Banco de volta: drena em lotes, na ordem e com o tipo original
+        escritor.fora = False
+        assert drenador.drenar_lote() == 3
+        assert drenador.drenar_lote() == 2
+        assert drenador.drenar_lote() == 0
+        valores = [(linha[3], linha[4]) for linha in escritor.linhas]
+        print(f"  Drenados: {valores}")
+        assert valores == [("Ligado", True), ("Contador", 42), ("Temperatura", 21.5), ("Receita", "A1"), ("Vazio", None)]
+        assert type(escritor.linhas[0][4]) is bool and escritor.linhas[0][0] == agora
+
+        # Marcas de tempo do OPC UA e tipo do Variant voltam do disco como foram gravados
+        origem, servidor = agora - timedelta(milliseconds=250), agora - timedelta(milliseconds=5)
+        buffer.adicionar(origem, "Serac4", "Palletizer", "Temperatura", 22.0, "Good", origem, servidor, "Double")
+        buffer.flush()
+        _, linhas = buffer.ler_lote(1)
+        assert linhas[0][0] == origem and linhas[0][6:] == (origem, servidor, "Double")
+        assert drenador.drenar_lote() == 1 and escritor.linhas[-1][6:] == (origem, servidor, "Double")
+        assert escritor.linhas[0][6:] == (None, None, None)
+
+        # Falha do SQLite: as leituras continuam em memória e entram na próxima tentativa
+        buffer._db = DiscoCheio(buffer._db)
+        buffer.adicionar(agora, "Serac4", "Palletizer", "Contador", 43, "Good")
+        try:
+            buffer.flush()
+            assert False, "deveria falhar com o disco cheio"
+        except sqlite3.OperationalError:
+            pass
+        assert buffer.pendentes() == 1
+        buffer._db = buffer._db.db
+        assert buffer.flush() == 1 and buffer.pendentes() == 1
+        assert drenador.drenar_lote() == 1 and escritor.linhas[-1][3:5] == ("Contador", 43)
+        buffer.fechar()
+
+        # Limite de disco: descarta as mais antigas
+        buffer = BufferLocal(os.path.join(pasta, "pequeno.db"), max_mb=0.1, max_linhas=500)
+        for i in range(20000):
+            buffer.adicionar(agora, "Serac4", "Palletizer", f"Tag_{i % 100}", i, "Good")
+        buffer.flush()
+        print(f"  Limite: {buffer.bytes_usados()} bytes, {buffer.resumo()}")
+        assert buffer.linhas_descartadas > 0
+        assert buffer.bytes_usados() <= buffer.max_bytes
+        _, linhas = buffer.ler_lote(1)
+        assert linhas[0][4] == buffer.linhas_descartadas  # a mais antiga que restou
+        buffer.fechar()
+
+    print("✅ Buffer local OK")
+
+if __name__ == "__main__":
+    print("🧪 TESTE DO BUFFER LOCAL")
+    print("=" * 40)
+
+    test_buffer_local()
@@ -0,0 +1,85 @@
+import psycopg2
+from datetime import datetime
+from escritor_lote import EscritorLote
+
+def test_escritor_lote():
+    """Testa a gravação em lote na tabela dados_opcua"""
+    try:
+        # Conectar ao banco
+        conn = psycopg2.connect(
+            dbname="new_bd1",
+            user="postgres",
+            password="postgres",
+            host="localhost",
+            port="5432"
+        )
+        cursor = conn.cursor()
+
+        print("🔧 Testando gravação em lote...")
+
+        cursor.execute("SELECT COUNT(*) FROM dados_opcua")
+        antes = cursor.fetchone()[0]
+
+        # Simular um ciclo com 300 tags (inclui caracteres que precisam de escape no COPY)
+        escritor = EscritorLote(conn, max_linhas=1000, max_ms=60000)
+        timestamp = datetime.now()
+        for i in range(300):
+            escritor.adicionar(timestamp, "Serac4", "Palletizer", f"Teste_Lote_{i}", f"{i}\tvalor\\{i}", "Good")
+
+        # Valores no tipo original vão para as colunas tipadas
+        escritor.adicionar(timestamp, "Serac4", "Palletizer", "Teste_Lote_Float", 123.45, "Good")
+        escritor.adicionar(timestamp, "Serac4", "Palletizer", "Teste_Lote_Int", 42, "Good")
+        escritor.adicionar(timestamp, "Serac4", "Palletizer", "Teste_Lote_Bool", True, "Good")
+
+        print(f"📋 Linhas pendentes antes do flush: {escritor.pendentes()}")
+        gravadas = escritor.flush()
+        print(f"✅ Linhas gravadas no flush: {gravadas}")
+
+        cursor.execute("SELECT COUNT(*) FROM dados_opcua")
+        depois = cursor.fetchone()[0]
+        print(f"📈 Novos registros: {depois - antes}")
+
+        cursor.execute("""
+            SELECT dado FROM vw_dados_opcua
+            WHERE funcao = 'Teste_Lote_7'
+            ORDER BY timestamp DESC
+            LIMIT 1
+        """)
+        print(f"🔍 Valor com escape: {cursor.fetchone()[0]!r}")
+
+        cursor.execute("""
+            SELECT t.funcao, d.valor_num, d.valor_int, d.valor_bool, d.valor_texto
+            FROM dados_opcua d
+            JOIN tags_opcua t ON t.id = d.tag_id
+            WHERE t.funcao IN ('Teste_Lote_Float', 'Teste_Lote_Int', 'Teste_Lote_Bool')
+            ORDER BY d.id DESC
+            LIMIT 3
+        """)
+        for funcao, num, inteiro, booleano, texto in cursor.fetchall():
+            print(f"🔍 {funcao}: num={num}, int={inteiro}, bool={booleano}, texto={texto}")
+
+        # Valores atuais: uma linha por tag, com o último valor gravado
+        cursor.execute("""
+            SELECT funcao, dado FROM vw_dados_opcua_atual
+            WHERE funcao IN ('Teste_Lote_Float', 'Teste_Lote_Int', 'Teste_Lote_Bool')
+            ORDER BY funcao
+        """)
+        for funcao, dado in cursor.fetchall():
+            print(f"📍 Atual {funcao} = {dado}")
+
+        print(f"💾 {escritor.resumo()}")
+
+        cursor.close()
+        conn.close()
+
+    except Exception as e:
+        print(f"❌ Erro: {e}")
+        if 'conn' in locals():
+            conn.rollback()
+            conn.close()
+
+if __name__ == "__main__":
+    print("🧪 TESTE DE GRAVAÇÃO EM LOTE")
+    print("=" * 40)
+
+    test_escritor_lote()
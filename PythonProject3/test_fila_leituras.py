@@ -0,0 +1,157 @@
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from buffer_local import BufferLocal
+from fila_leituras import FilaLeituras
+
+class DestinoLento:
+    """Escritor falso que demora a gravar enquanto 'liberado' não estiver setado"""
+    def __init__(self):
+        self.liberado = threading.Event()
+        self.linhas = []
+
+    def adicionar(self, timestamp, linha, maquina, funcao, dado, qualidade, origem=None, servidor=None, tipo=None):
+        self.liberado.wait()
+        self.linhas.append(dado)
+
+    def flush(self):
+        return 0
+
+    def gravar(self, linhas):
+        for leitura in linhas:
+            self.adicionar(*leitura)
+        return len(linhas)
+
+class DestinoFora:
+    """Escritor falso com o banco fora: gravar falha as primeiras 'falhas' vezes (None = sempre)"""
+    def __init__(self, falhas=None):
+        self.falhas = falhas
+        self.linhas = []
+
+    def adicionar(self, *leitura):
+        self.linhas.append(leitura[4])
+
+    def flush(self):
+        return 0
+
+    def gravar(self, linhas):
+        if self.falhas is None or self.falhas > 0:
+            self.falhas = None if self.falhas is None else self.falhas - 1
+            raise ConnectionError("banco fora do ar")
+        self.linhas.extend(leitura[4] for leitura in linhas)
+        return len(linhas)
+
+def transbordo_com(caminho, quantidade):
+    """Deixa 'quantidade' leituras no arquivo de transbordo, como após uma queda do processo"""
+    buffer = BufferLocal(caminho)
+    agora = datetime.now()
+    for i in range(quantidade):
+        buffer.adicionar(agora, "Serac4", "Palletizer", "Contador", i, "Good")
+    buffer.fechar()
+
+def produzir(fila, quantidade):
+    agora = datetime.now()
+    for i in range(quantidade):
+        fila.adicionar(agora, "Serac4", "Palletizer", "Contador", i, "Good")
+
+def test_fila_leituras():
+    """Testa as políticas de transbordo da fila entre leitura e gravação"""
+    print("🔧 Testando fila de leituras...")
+
+    # descartar_antigas: a leitura nunca espera, as mais antigas são perdidas
+    destino = DestinoLento()
+    fila = FilaLeituras(destino, capacidade=10, politica="descartar_antigas", tamanho_lote=1).iniciar()
+    produzir(fila, 100)
+    print(f"  descartar_antigas: {fila.resumo()}")
+    assert fila.descartadas > 0
+    destino.liberado.set()
+    fila.fechar()
+    assert destino.linhas[-1] == 99 and len(destino.linhas) + fila.descartadas == 100
+
+    # bloquear: a leitura espera, nada se perde
+    destino = DestinoLento()
+    fila = FilaLeituras(destino, capacidade=10, politica="bloquear", tamanho_lote=1).iniciar()
+    produtor = threading.Thread(target=produzir, args=(fila, 100))
+    produtor.start()
+    time.sleep(0.2)
+    assert produtor.is_alive() and fila.profundidade() == 10
+    destino.liberado.set()
+    produtor.join()
+    fila.fechar()
+    print(f"  bloquear: {fila.resumo()}")
+    assert destino.linhas == list(range(100)) and fila.bloqueios > 0
+
+    # disco: o excedente vai para o disco e volta na ordem
+    with tempfile.TemporaryDirectory() as pasta:
+        destino = DestinoLento()
+        fila = FilaLeituras(destino, capacidade=10, politica="disco", tamanho_lote=5,
+                            caminho_transbordo=os.path.join(pasta, "transbordo.db")).iniciar()
+        produzir(fila, 100)
+        print(f"  disco: {fila.resumo()}")
+        assert fila.transbordadas > 0 and fila.profundidade() > 10
+        destino.liberado.set()
+        fila.fechar()
+        assert destino.linhas == list(range(100))
+
+    # disco lento: a gravação no SQLite acontece sem o lock da fila (leitores e gravadores não esperam o disco)
+    with tempfile.TemporaryDirectory() as pasta:
+        fila = FilaLeituras(DestinoLento(), capacidade=1, politica="disco",
+                            caminho_transbordo=os.path.join(pasta, "lento.db"))
+        disco_liberado = threading.Event()
+        gravar_no_disco = fila.transbordo.adicionar
+        fila.transbordo.adicionar = lambda *leitura: (disco_liberado.wait(), gravar_no_disco(*leitura))
+        produtor = threading.Thread(target=produzir, args=(fila, 2), daemon=True)  # a segunda leitura transborda
+        produtor.start()
+        time.sleep(0.1)
+        try:
+            assert produtor.is_alive()                  # preso no disco...
+            livre = fila._cond.acquire(timeout=0.5)     # ...sem segurar a fila
+            assert livre, "a gravação no disco não pode segurar o lock da fila"
+            fila._cond.release()
+        finally:
+            disco_liberado.set()
+        produtor.join()
+        assert fila.transbordadas == 1 and fila.profundidade() == 2
+        fila.transbordo.fechar()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        # Reinício: o que ficou no arquivo de transbordo é drenado sem precisar de um novo transbordo
+        caminho = os.path.join(pasta, "reinicio.db")
+        transbordo_com(caminho, 7)
+        destino = DestinoLento()
+        destino.liberado.set()
+        fila = FilaLeituras(destino, capacidade=10, politica="disco", tamanho_lote=5,
+                            caminho_transbordo=caminho).iniciar()
+        fila.fechar()
+        print(f"  reinício: {destino.linhas}")
+        assert destino.linhas == list(range(7)) and fila.profundidade() == 0
+
+        # Falha no meio da drenagem: o lote é relido do disco e gravado uma vez só
+        transbordo_com(caminho, 7)
+        destino = DestinoFora(falhas=1)
+        fila = FilaLeituras(destino, politica="disco", tamanho_lote=5, caminho_transbordo=caminho).iniciar()
+        limite = time.monotonic() + 5
+        while fila.profundidade() and time.monotonic() < limite:  # a nova tentativa vem 1 s depois da falha
+            time.sleep(0.05)
+        fila.fechar()
+        assert destino.linhas == list(range(7)) and fila.erros == 1
+
+        # Encerrar com o banco fora não trava: as leituras ficam no disco para o próximo início
+        transbordo_com(caminho, 7)
+        fila = FilaLeituras(DestinoFora(), politica="disco", tamanho_lote=5, caminho_transbordo=caminho).iniciar()
+        time.sleep(0.1)
+        encerrar = threading.Thread(target=fila.fechar, daemon=True)
+        encerrar.start()
+        encerrar.join(5)
+        assert not encerrar.is_alive(), "fechar() não pode esperar o banco voltar"
+        assert BufferLocal(caminho).pendentes() == 7
+
+    print("✅ Fila de leituras OK")
+
+if __name__ == "__main__":
+    print("🧪 TESTE DA FILA DE LEITURAS")
+    print("=" * 40)
+
+    test_fila_leituras()
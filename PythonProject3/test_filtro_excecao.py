@@ -0,0 +1,56 @@
+from datetime import datetime
+from filtro_excecao import FiltroExcecao
+
+class DestinoMemoria:
+    """Escritor falso que só guarda as linhas recebidas"""
+    def __init__(self):
+        self.linhas = []
+
+    def adicionar(self, timestamp, linha, maquina, funcao, dado, qualidade, origem=None, servidor=None, tipo=None):
+        self.linhas.append((funcao, dado, qualidade))
+
+def test_filtro_excecao():
+    """Testa banda morta, mudança de valor e heartbeat do filtro por exceção"""
+    print("🔧 Testando filtro por exceção...")
+
+    destino = DestinoMemoria()
+    filtro = FiltroExcecao(destino, deadband_abs=0.5, heartbeat_s=10,
+                           regras=[{"padrao": "Serac4/Palletizer/Pct*", "deadband_abs": None, "deadband_pct": 10}])
+
+    # Banda morta absoluta: só variações acima de 0.5 passam
+    valores = [20.0, 20.2, 20.4, 20.6, 21.0, 21.2]
+    gravados = [filtro.deve_gravar("Serac4", "Palletizer", "Temperatura", v, "Good", agora=0) for v in valores]
+    print(f"  Temperatura {valores} -> {gravados}")
+    assert gravados == [True, False, False, True, False, True]
+
+    # Discretos: grava só na mudança
+    estados = [False, False, True, True, False]
+    gravados = [filtro.deve_gravar("Serac4", "Palletizer", "Ligado", v, "Good", agora=0) for v in estados]
+    print(f"  Ligado {estados} -> {gravados}")
+    assert gravados == [True, False, True, False, True]
+
+    # Regra por padrão: banda morta percentual
+    gravados = [filtro.deve_gravar("Serac4", "Palletizer", "PctCarga", v, "Good", agora=0) for v in [100, 105, 111]]
+    print(f"  PctCarga [100, 105, 111] -> {gravados}")
+    assert gravados == [True, False, True]
+
+    # Mudança de qualidade sempre passa
+    assert filtro.deve_gravar("Serac4", "Palletizer", "Ligado", False, "Bad", agora=1)
+
+    # Heartbeat: sem mudança, grava de novo após 10 s
+    assert not filtro.deve_gravar("Serac4", "Palletizer", "Temperatura", 21.2, "Good", agora=5)
+    assert filtro.deve_gravar("Serac4", "Palletizer", "Temperatura", 21.2, "Good", agora=12)
+
+    # Interface de escritor: repassa só o que passa no filtro
+    filtro.adicionar(datetime.now(), "Serac4", "Palletizer", "Novo", 1, "Good")
+    filtro.adicionar(datetime.now(), "Serac4", "Palletizer", "Novo", 1, "Good")
+    print(f"  Repassados ao destino: {destino.linhas}")
+    assert destino.linhas == [("Novo", 1, "Good")]
+
+    print(f"✅ {filtro.resumo()}")
+
+if __name__ == "__main__":
+    print("🧪 TESTE DO FILTRO POR EXCEÇÃO")
+    print("=" * 40)
+
+    test_filtro_excecao()
@@ -21,20 +21,32 @@ def test_insert():
         linha = "Serac4"
         maquina = "Palletizer"
         funcao = "Teste_Variavel"
-        dado = "123.45"
+        dado = 123.45
         qualidade = "Good"
         
+        # Cadastrar a tag e buscar o id
+        cursor.execute("""
+            INSERT INTO tags_opcua (linha, maquina, funcao)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (linha, maquina, funcao) DO NOTHING
+        """, (linha, maquina, funcao))
+        cursor.execute("""
+            SELECT id FROM tags_opcua
+            WHERE linha = %s AND maquina = %s AND funcao = %s
+        """, (linha, maquina, funcao))
+        tag_id = cursor.fetchone()[0]
+        
         # Testar inserção
         cursor.execute("""
-            INSERT INTO dados_opcua (timestamp, linha, maquina, funcao, dado, qualidade)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (timestamp, linha, maquina, funcao, dado, qualidade))
+            INSERT INTO dados_opcua (timestamp, tag_id, valor_num, qualidade)
+            VALUES (%s, %s, %s, %s)
+        """, (timestamp, tag_id, dado, qualidade))
         
         conn.commit()
         print("✅ Inserção realizada com sucesso!")
         
         # Verificar se foi inserido
-        cursor.execute("SELECT * FROM dados_opcua ORDER BY timestamp DESC LIMIT 1")
+        cursor.execute("SELECT * FROM vw_dados_opcua ORDER BY timestamp DESC LIMIT 1")
         resultado = cursor.fetchone()
         
         if resultado:
@@ -84,7 +96,7 @@ def test_select():
         # Teste 2: Últimos 5 registros
         cursor.execute("""
             SELECT id, timestamp, linha, maquina, funcao, dado, qualidade 
-            FROM dados_opcua 
+            FROM vw_dados_opcua 
             ORDER BY timestamp DESC 
             LIMIT 5
         """)
@@ -96,8 +108,9 @@ def test_select():
         # Teste 3: Filtrar por linha
         cursor.execute("""
             SELECT COUNT(*) 
-            FROM dados_opcua 
-            WHERE linha = 'Serac4'
+            FROM dados_opcua d
+            JOIN tags_opcua t ON t.id = d.tag_id
+            WHERE t.linha = 'Serac4'
         """)
         count_serac4 = cursor.fetchone()[0]
         print(f"✅ Registros da linha Serac4: {count_serac4}")
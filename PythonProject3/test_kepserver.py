@@ -1,7 +1,11 @@
 from opcua import Client, ua
 from datetime import datetime
+import os
 import time
 
+# Endereço do servidor (ex.: OPCUA_ENDERECO=opc.tcp://127.0.0.1:4841 com o simulador_opcua.py)
+ENDERECO_OPCUA = os.environ.get("OPCUA_ENDERECO", "opc.tcp://127.0.0.1:49320")
+
 def test_kepserver_connection():
     """Testa a conexão com o KepServer"""
     print("🔍 TESTE DE CONEXÃO COM KEPSERVER")
@@ -10,7 +14,7 @@ def test_kepserver_connection():
     try:
         # Tentar conectar ao KepServer
         print("1️⃣ Tentando conectar ao KepServer...")
-        client = Client("opc.tcp://127.0.0.1:49320")
+        client = Client(ENDERECO_OPCUA)
         client.connect()
         print("✅ Conectado ao KepServer!")
         
@@ -0,0 +1,79 @@
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from types import SimpleNamespace
+from escritor_lote import _hora_local, hora_do_evento, leitura_ruim, marcas_de_tempo, tipo_variante
+
+class VariantType(Enum):
+    """Mesmos nomes do ua.VariantType (só os usados no teste)"""
+    Boolean = 1
+    Int32 = 6
+    Double = 11
+
+def data_value(origem=None, servidor=None, valor=None):
+    """DataValue mínimo: só os campos que marcas_de_tempo e tipo_variante leem"""
+    return SimpleNamespace(SourceTimestamp=origem, ServerTimestamp=servidor, Value=valor or SimpleNamespace())
+
+def test_marcas_de_tempo():
+    """Testa a conversão UTC -> hora local, o "sem data" do OPC UA e o tipo do Variant"""
+    print("🔧 Testando marcas de tempo do OPC UA...")
+
+    fuso_original = os.environ.get("TZ")
+    os.environ["TZ"] = "America/Sao_Paulo"  # UTC-3, sem horário de verão
+    time.tzset()
+    try:
+        utc = datetime(2025, 1, 10, 11, 0, 0)
+        assert _hora_local(utc) == datetime(2025, 1, 10, 8, 0, 0)
+        assert _hora_local(utc.replace(tzinfo=timezone.utc)) == datetime(2025, 1, 10, 8, 0, 0)  # asyncua
+        assert _hora_local(None) is None
+        assert _hora_local(datetime(1601, 1, 1)) is None                  # DateTime nulo do OPC UA
+
+        # timestamp continua a hora da coleta, mesmo com o SourceTimestamp parado no passado
+        agora = datetime(2025, 1, 10, 9, 0, 0)
+        coleta, origem, servidor = marcas_de_tempo(data_value(utc - timedelta(days=30), utc), agora)
+        print(f"  coleta={coleta}, origem={origem}, servidor={servidor}")
+        assert coleta == agora
+        assert origem == datetime(2024, 12, 11, 8, 0, 0) and servidor == datetime(2025, 1, 10, 8, 0, 0)
+
+        coleta, origem, servidor = marcas_de_tempo(data_value(datetime(1601, 1, 1)))
+        assert origem is None and servidor is None
+        assert abs((datetime.now() - coleta).total_seconds()) < 5
+    finally:
+        if fuso_original is None:
+            del os.environ["TZ"]
+        else:
+            os.environ["TZ"] = fuso_original
+        time.tzset()
+
+    # Ordem de evento: origem, senão servidor, senão a coleta
+    t = lambda minuto: datetime(2025, 1, 10, 8, minuto)
+    assert hora_do_evento((t(5), "L", "M", "F", 1, "Good", t(1), t(2), "Int32")) == t(1)
+    assert hora_do_evento((t(5), "L", "M", "F", 1, "Good", None, t(2), "Int32")) == t(2)
+    assert hora_do_evento((t(5), "L", "M", "F", 1, "Good", None, None, None)) == t(5)
+
+    assert tipo_variante(data_value(valor=SimpleNamespace(Value=1.5, VariantType=VariantType.Double))) == "Double"
+    assert tipo_variante(data_value(valor=SimpleNamespace(Value=True, VariantType=VariantType.Boolean))) == "Boolean"
+    assert tipo_variante(data_value()) is None
+
+    print("✅ Marcas de tempo OK")
+
+def test_leitura_ruim():
+    """Good e Uncertain são gravados; só Bad é descartado (mesma regra nos dois motores)"""
+    print("🔧 Testando a regra de qualidade...")
+
+    status = lambda valor: SimpleNamespace(StatusCode=SimpleNamespace(value=valor))
+    assert not leitura_ruim(status(0))                  # Good
+    assert not leitura_ruim(status(0x40000000))         # Uncertain
+    assert not leitura_ruim(status(0x408F0000))         # UncertainLastUsableValue
+    assert leitura_ruim(status(0x80000000))             # Bad
+    assert leitura_ruim(status(0x80340000))             # BadNodeIdUnknown
+
+    print("✅ Regra de qualidade OK")
+
+if __name__ == "__main__":
+    print("🧪 TESTE DAS MARCAS DE TEMPO OPC UA")
+    print("=" * 40)
+
+    test_marcas_de_tempo()
+    test_leitura_ruim()
@@ -0,0 +1,59 @@
+import json
+import os
+import tempfile
+import urllib.request
+from metricas import Metricas, percentil_buckets
+
+def test_metricas():
+    """Testa os histogramas, o texto Prometheus, o endpoint HTTP e o JSON final"""
+    print("🔧 Testando métricas...")
+
+    metricas = Metricas()
+    for ms in (2, 3, 4, 40, 300):
+        metricas.observar("opcua_leitura_segundos", ms / 1000, "Serac4/Palletizer")
+    metricas.observar("escritor_lote_linhas", 1000)
+    metricas.observar("escritor_lote_linhas", 60000)   # acima do último limite: bucket +Inf
+
+    # Percentis por interpolação dentro do bucket
+    assert percentil_buckets((1, 2, 4), [0, 4, 0, 0], 0.5) == 1.5
+    assert percentil_buckets((1, 2, 4), [0, 0, 0, 0], 0.5) is None
+    p50 = metricas.histogramas["opcua_leitura_segundos"].percentil(0.5, "Serac4/Palletizer")
+    print(f"  p50 da leitura: {p50 * 1000:.2f} ms")
+    assert 0.0025 <= p50 <= 0.005
+
+    texto = metricas.texto_prometheus()
+    assert "# TYPE opcua_leitura_segundos histogram" in texto
+    assert 'opcua_leitura_segundos_bucket{maquina="Serac4/Palletizer",le="0.005"} 3' in texto
+    assert 'opcua_leitura_segundos_bucket{maquina="Serac4/Palletizer",le="+Inf"} 5' in texto
+    assert 'opcua_leitura_segundos_count{maquina="Serac4/Palletizer"} 5' in texto
+    assert 'escritor_lote_linhas_bucket{le="50000"} 1' in texto
+    assert "escritor_lote_linhas_sum 61000.0" in texto
+
+    # Endpoint local em porta livre
+    host, porta = metricas.iniciar_servidor(porta=0)
+    try:
+        with urllib.request.urlopen(f"http://{host}:{porta}/metrics", timeout=5) as resposta:
+            assert resposta.status == 200
+            assert resposta.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert resposta.read().decode("utf-8") == metricas.texto_prometheus()
+    finally:
+        metricas.parar_servidor()
+    print(f"  Endpoint respondeu em {host}:{porta}")
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "metricas.json")
+        metricas.salvar_json(caminho)
+        with open(caminho, encoding="utf-8") as arquivo:
+            dados = json.load(arquivo)["histogramas"]
+    serie = dados["opcua_leitura_segundos"]["series"][0]
+    assert serie["rotulos"] == {"maquina": "Serac4/Palletizer"} and serie["contagem"] == 5
+    assert dados["escritor_lote_linhas"]["series"][0]["buckets"]["+Inf"] == 1
+    assert dados["fila_profundidade"]["series"] == []
+
+    print("✅ Métricas OK")
+
+if __name__ == "__main__":
+    print("🧪 TESTE DAS MÉTRICAS")
+    print("=" * 40)
+
+    test_metricas()
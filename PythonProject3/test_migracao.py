@@ -0,0 +1,70 @@
+from datetime import datetime
+from database_manager import conectar_banco, criar_tabelas, migrar_dados_legados
+
+# Linha fictícia: só as tags dela são criadas e removidas pelo teste
+LINHA_TESTE = "TesteMigracao"
+
+def test_migrar_dados_legados():
+    """Testa a conversão do texto legado para os tipos originais (inclusive notação científica)"""
+    print("🔧 Testando migração de dados legados...")
+
+    conn = conectar_banco()
+    cursor = conn.cursor()
+    criar_tabelas(conn)
+    cursor.execute("SELECT to_regclass('dados_opcua_legado')")
+    if cursor.fetchone()[0] is not None:
+        print("⚠️ Já existe uma dados_opcua_legado de verdade; teste não executado")
+        conn.close()
+        return
+
+    try:
+        cursor.execute("""
+            CREATE TABLE dados_opcua_legado (
+                id SERIAL PRIMARY KEY, timestamp TIMESTAMP NOT NULL, linha VARCHAR(50), maquina VARCHAR(50),
+                funcao VARCHAR(100), dado TEXT, qualidade VARCHAR(50)
+            )
+        """)
+        agora = datetime.now().replace(microsecond=0)
+        casos = {"Expoente": "1e-05", "Decimal": "2.5", "Ponto": "3.", "SoFracao": ".25",
+                 "Inteiro": "42", "Booleano": "True", "Texto": "Receita A"}
+        cursor.executemany("INSERT INTO dados_opcua_legado (timestamp, linha, maquina, funcao, dado, qualidade) "
+                           "VALUES (%s, %s, 'M1', %s, %s, 'Good')",
+                           [(agora, LINHA_TESTE, funcao, dado) for funcao, dado in casos.items()])
+        conn.commit()
+
+        migrar_dados_legados()
+
+        cursor.execute("""
+            SELECT t.funcao, d.valor_num, d.valor_int, d.valor_bool, d.valor_texto
+            FROM dados_opcua d JOIN tags_opcua t ON t.id = d.tag_id
+            WHERE t.linha = %s
+        """, (LINHA_TESTE,))
+        migrados = {linha[0]: linha[1:] for linha in cursor.fetchall()}
+        print(f"  Migrados: {migrados}")
+        assert migrados["Expoente"] == (1e-05, None, None, None)
+        assert migrados["Decimal"] == (2.5, None, None, None)
+        assert migrados["Ponto"] == (3.0, None, None, None)
+        assert migrados["SoFracao"] == (0.25, None, None, None)
+        assert migrados["Inteiro"] == (None, 42, None, None)
+        assert migrados["Booleano"] == (None, None, True, None)
+        assert migrados["Texto"] == (None, None, None, "Receita A")
+    finally:
+        conn.rollback()
+        cursor.execute("SELECT id FROM tags_opcua WHERE linha = %s", (LINHA_TESTE,))
+        ids = [linha[0] for linha in cursor.fetchall()]
+        if ids:
+            for tabela in ("dados_opcua", "dados_opcua_atual", "dados_opcua_1min", "dados_opcua_1h"):
+                cursor.execute(f"DELETE FROM {tabela} WHERE tag_id = ANY(%s)", (ids,))
+            cursor.execute("DELETE FROM tags_opcua WHERE id = ANY(%s)", (ids,))
+        cursor.execute("DROP TABLE IF EXISTS dados_opcua_legado")
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+    print("✅ Migração de dados legados OK")
+
+if __name__ == "__main__":
+    print("🧪 TESTE DA MIGRAÇÃO DE DADOS LEGADOS")
+    print("=" * 40)
+
+    test_migrar_dados_legados()
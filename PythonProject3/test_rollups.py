@@ -0,0 +1,46 @@
+from datetime import datetime
+from rollups import agregar, escolher_fonte
+
+def test_rollups():
+    """Testa a agregação de um lote por minuto/hora e a escolha da tabela de consulta"""
+    print("🔧 Testando agregações...")
+
+    t = lambda minuto, segundo: datetime(2025, 1, 10, 8, minuto, segundo)
+    # (timestamp, tag_id, valor_num, valor_int, valor_bool, valor_texto, qualidade)
+    registros = [
+        (t(0, 10), 1, 20.0, None, None, None, "Good"),
+        (t(0, 50), 1, 24.0, None, None, None, "Good"),
+        (t(0, 30), 1, 22.0, None, None, None, "Good"),   # fora de ordem: não é o último
+        (t(1, 5), 1, 30.0, None, None, None, "Good"),
+        (t(0, 20), 2, None, 7, None, None, "Good"),
+        (t(0, 40), 3, None, None, True, None, "Good"),
+        (t(0, 45), 3, None, None, False, None, "Good"),
+        (t(0, 15), 4, None, None, None, "Receita A", "Good"),
+    ]
+
+    por_minuto = agregar(registros, 60)
+    for linha in por_minuto:
+        print(f"  1min: {linha}")
+    # tag_id, inicio, contagem, contagem_num, minimo, maximo, soma, ultimo_timestamp, ultimo_num, ultimo_texto
+    assert por_minuto[0] == (1, t(0, 0), 3, 3, 20.0, 24.0, 66.0, t(0, 50), 24.0, None)
+    assert por_minuto[1] == (1, t(1, 0), 1, 1, 30.0, 30.0, 30.0, t(1, 5), 30.0, None)
+    assert por_minuto[2][2:7] == (1, 1, 7.0, 7.0, 7.0)
+    assert por_minuto[3][2:9] == (2, 2, 0.0, 1.0, 1.0, t(0, 45), 0.0)   # booleanos contam como 0/1
+    assert por_minuto[4][2:4] == (1, 0) and por_minuto[4][9] == "Receita A"
+
+    por_hora = agregar(registros, 3600)
+    print(f"  1h tag 1: {por_hora[0]}")
+    assert por_hora[0] == (1, datetime(2025, 1, 10, 8), 4, 4, 20.0, 30.0, 96.0, t(1, 5), 30.0, None)
+
+    assert escolher_fonte(7200) == ("dados_opcua_1h", 3600)
+    assert escolher_fonte(300) == ("dados_opcua_1min", 60)
+    assert escolher_fonte(90) == (None, None)
+    assert escolher_fonte(10) == (None, None)
+
+    print("✅ Agregações OK")
+
+if __name__ == "__main__":
+    print("🧪 TESTE DAS AGREGAÇÕES")
+    print("=" * 40)
+
+    test_rollups()
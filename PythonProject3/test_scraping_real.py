@@ -1,7 +1,12 @@
 from opcua import Client, ua
 import psycopg2
 from datetime import datetime
+import os
 import time
+from escritor_lote import EscritorLote
+
+# Endereço do servidor (ex.: OPCUA_ENDERECO=opc.tcp://127.0.0.1:4841 com o simulador_opcua.py)
+ENDERECO_OPCUA = os.environ.get("OPCUA_ENDERECO", "opc.tcp://127.0.0.1:49320")
 
 def test_scraping_real():
     """Testa o scraping real e salva dados no banco"""
@@ -20,7 +25,7 @@ def test_scraping_real():
         cursor = conn.cursor()
         
         # Conectar ao KepServer
-        client = Client("opc.tcp://127.0.0.1:49320")
+        client = Client(ENDERECO_OPCUA)
         client.connect()
         print("✅ Conectado ao KepServer")
         
@@ -54,6 +59,7 @@ def test_scraping_real():
         print("\n🔄 Iniciando scraping por 10 segundos...")
         start_time = time.time()
         leituras = 0
+        escritor = EscritorLote(conn)
         
         while time.time() - start_time < 10:
             for node in palletizer_node.get_children():
@@ -65,24 +71,20 @@ def test_scraping_real():
                     if display_name.startswith("_"):
                         continue
                     
-                    value = str(node.get_value())
+                    value = node.get_value()
                     quality = node.get_data_value().StatusCode.name
                     timestamp = datetime.now()
                     
-                    # Salvar no banco
-                    cursor.execute("""
-                        INSERT INTO dados_opcua (timestamp, linha, maquina, funcao, dado, qualidade)
-                        VALUES (%s, %s, %s, %s, %s, %s)
-                    """, (timestamp, "Serac4", "Palletizer", display_name, value, quality))
-                    
-                    conn.commit()
+                    # Acumular no lote do ciclo
+                    escritor.adicionar(timestamp, "Serac4", "Palletizer", display_name, value, quality)
                     leituras += 1
                     print(f"  {timestamp.strftime('%H:%M:%S')} - {display_name} = {value}")
                     
                 except Exception as e:
                     print(f"  ❌ Erro ao ler/salvar {display_name}: {e}")
-                    conn.rollback()
             
+            # Salvar o ciclo no banco
+            escritor.flush()
             time.sleep(2)  # Pausa de 2 segundos
         
         # Contar registros depois
@@ -95,7 +97,7 @@ def test_scraping_real():
         # Verificar últimos registros
         cursor.execute("""
             SELECT id, timestamp, linha, maquina, funcao, dado, qualidade 
-            FROM dados_opcua 
+            FROM vw_dados_opcua 
             ORDER BY timestamp DESC 
             LIMIT 5
         """)
@@ -0,0 +1,57 @@
+import time
+from opcua import Client
+from registro_tags import RegistroTags, resolver_maquinas
+from simulador_opcua import SimuladorOPCUA
+
+def test_simulador():
+    """Testa a hierarquia, os tipos e as mudanças do simulador com o RegistroTags do coletor"""
+    print("🔧 Testando simulador OPC UA...")
+
+    simulador = SimuladorOPCUA("opc.tcp://127.0.0.1:4842", linhas=2, maquinas=2, tags=40,
+                               tipos={"float": 1, "int": 1, "bool": 1, "texto": 1}, mudancas_s=5).iniciar()
+    client = Client("opc.tcp://127.0.0.1:4842")
+    try:
+        client.connect()
+        assert [(l, m) for l, m, _ in simulador.estrutura] == [
+            ("Serac1", "Palletizer"), ("Serac1", "Enchedora"), ("Serac2", "Palletizer"), ("Serac2", "Enchedora")]
+
+        registro = RegistroTags(client, ("Matics", "Serac2", "Enchedora"))
+        tags = registro.resolver()
+        print(f"  {registro.nome}: {len(tags)} tags")
+        assert len(tags) == 10                                   # 40 tags em 4 máquinas, sem o _Status
+        assert not any(tag.nome.startswith("_") for tag in tags)
+        assert all(tag.tipo is not None for tag in tags)
+
+        # Todas as máquinas (e uma inexistente) em um Translate, um Browse e um Read
+        caminhos = [("Matics", l, m) for l, m, _ in simulador.estrutura] + [("Matics", "Serac9", "Palletizer")]
+        resolvidas = resolver_maquinas(client, caminhos)
+        print(f"  Resolução em lote: {len(resolvidas)} de {len(caminhos)} caminhos")
+        assert sorted(resolvidas) == sorted(caminhos[:-1])
+        assert all(len(tags_maquina) == 10 for _, tags_maquina in resolvidas.values())
+        assert [t.nome for t in resolvidas[("Matics", "Serac2", "Enchedora")][1]] == [t.nome for t in tags]
+
+        antes = {tag.nome: dv.Value.Value for tag, dv in registro.ler_valores()}
+        tipos = {type(valor).__name__ for valor in antes.values()}
+        print(f"  Tipos lidos: {sorted(tipos)}")
+        assert tipos <= {"float", "int", "bool", "str"} and len(tipos) > 1
+
+        time.sleep(1)
+        depois = {tag.nome: dv for tag, dv in registro.ler_valores()}
+        mudaram = sum(1 for nome, dv in depois.items() if dv.Value.Value != antes[nome])
+        print(f"  Mudaram em 1 s: {mudaram} de {len(depois)}")
+        assert mudaram > 0
+        assert all(dv.SourceTimestamp for dv in depois.values())
+    finally:
+        try:
+            client.disconnect()
+        except Exception:
+            pass
+        simulador.parar()
+
+    print("✅ Simulador OK")
+
+if __name__ == "__main__":
+    print("🧪 TESTE DO SIMULADOR OPC UA")
+    print("=" * 40)
+
+    test_simulador()
@@ -0,0 +1,59 @@
+import os
+import tempfile
+from snapshot_tags import SnapshotTags, diferenca
+
+def test_snapshot_tags():
+    """Testa a gravação, a releitura e a comparação do snapshot do espaço de endereços"""
+    print("🔧 Testando snapshot de tags...")
+
+    tags = [
+        {"nodeid": "ns=2;s=Serac4.Palletizer.Temp", "nome": "Temp", "classe": 2, "tipo": "i=11"},
+        {"nodeid": "ns=2;s=Serac4.Palletizer.Contador", "nome": "Contador", "classe": 2, "tipo": "i=6"},
+    ]
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "snapshot.json")
+
+        snapshot = SnapshotTags(caminho)
+        assert len(snapshot) == 0 and snapshot.obter("Matics/Serac4/Palletizer") is None
+        snapshot.salvar("Matics/Serac4/Palletizer", "ns=2;s=Serac4.Palletizer", tags)
+        assert not os.path.exists(caminho + ".tmp")
+
+        # Uma nova instância (nova partida) enxerga o que foi salvo
+        entrada = SnapshotTags(caminho).obter("Matics/Serac4/Palletizer")
+        print(f"  Releitura: {len(entrada['tags'])} tags, salvo em {entrada['salvo_em']}")
+        assert entrada["maquina"] == "ns=2;s=Serac4.Palletizer" and entrada["tags"] == tags
+
+        assert snapshot.recente("Matics/Serac4/Palletizer", 60)
+        assert not SnapshotTags(caminho).recente("Matics/Serac4/Palletizer", 60)   # salvo em outro processo
+
+        assert snapshot.remover("Matics/Serac4/Palletizer")
+        assert not snapshot.remover("Matics/Serac4/Palletizer")
+        assert len(SnapshotTags(caminho)) == 0                                     # remoção vai para o arquivo
+
+        # Só em memória: nada é gravado
+        memoria = SnapshotTags(None)
+        memoria.salvar("Matics/Serac3/Palletizer", "ns=2;s=Serac3.Palletizer", tags)
+        assert memoria.obter("Matics/Serac3/Palletizer")["tags"] == tags
+        assert os.listdir(pasta) == ["snapshot.json"]
+
+        # Arquivo corrompido não impede a partida: vira snapshot vazio
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            arquivo.write("{corrompido")
+        assert len(SnapshotTags(caminho)) == 0
+
+    novas = [dict(tags[0], tipo="i=10"), {"nodeid": "ns=2;s=Serac4.Palletizer.Receita", "nome": "Receita",
+                                          "classe": 2, "tipo": "i=12"}]
+    adicionadas, removidas, alteradas = diferenca(tags, novas)
+    print(f"  Diferença: +{adicionadas} -{removidas} ~{alteradas}")
+    assert adicionadas == ["ns=2;s=Serac4.Palletizer.Receita"]
+    assert removidas == ["ns=2;s=Serac4.Palletizer.Contador"]
+    assert alteradas == ["ns=2;s=Serac4.Palletizer.Temp"]
+    assert diferenca(tags, list(tags)) == ([], [], [])
+
+    print("✅ Snapshot de tags OK")
+
+if __name__ == "__main__":
+    print("🧪 TESTE DO SNAPSHOT DE TAGS")
+    print("=" * 40)
+
+    test_snapshot_tags()
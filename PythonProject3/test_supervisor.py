@@ -0,0 +1,97 @@
+import time
+import psycopg2
+from opcua import ua
+from database_manager import conectar_banco
+from metricas import METRICAS
+from supervisor import EsperaExponencial, PoolBanco, Vigia, falha_de_conexao
+
+def test_supervisor():
+    """Testa o backoff, a classificação dos erros e a troca de uma conexão derrubada no pool"""
+    print("🔧 Testando supervisor de conexões...")
+
+    espera = EsperaExponencial(1, 8, variacao=0)
+    esperas = [espera.proxima() for _ in range(6)]
+    print(f"  Backoff: {esperas}")
+    assert esperas == [1, 2, 4, 8, 8, 8]
+    espera.reiniciar()
+    assert espera.proxima() == 1
+    com_variacao = EsperaExponencial(10, 10, variacao=0.2)
+    assert all(8 <= com_variacao.proxima() <= 12 for _ in range(50))
+
+    assert falha_de_conexao(ConnectionResetError())
+    assert falha_de_conexao(ua.UaStatusCodeError(ua.StatusCodes.BadSessionIdInvalid))
+    assert not falha_de_conexao(ua.UaStatusCodeError(ua.StatusCodes.BadNodeIdUnknown))
+    assert not falha_de_conexao(ValueError("valor inválido"))
+
+    pool = PoolBanco(minimo=1, maximo=2, verificar_apos_s=30)
+    administrador = conectar_banco()
+    administrador.autocommit = True
+    try:
+        with pool.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT pg_backend_pid()")
+            pid = cursor.fetchone()[0]
+            cursor.close()
+
+        # Derruba a conexão do pool por fora (como uma queda de rede ou restart do banco)
+        cursor = administrador.cursor()
+        cursor.execute("SELECT pg_terminate_backend(%s)", (pid,))
+        cursor.close()
+        try:
+            with pool.conexao() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT 1")
+            assert False, "a conexão derrubada deveria falhar"
+        except psycopg2.Error:
+            pass
+        assert pool.descartadas == 1
+
+        # A próxima retirada já abre uma conexão nova
+        with pool.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT pg_backend_pid()")
+            novo_pid = cursor.fetchone()[0]
+            cursor.close()
+        print(f"  Pool: {pool.resumo()} (conexão {pid} trocada por {novo_pid})")
+        assert novo_pid != pid
+    finally:
+        administrador.close()
+        pool.fechar()
+
+    print("✅ Supervisor de conexões OK")
+
+def test_vigia():
+    """Testa o vigia: só a chamada que passa do prazo é abortada, uma vez, e vira métrica"""
+    print("🔧 Testando vigia de chamadas travadas...")
+
+    abortadas = []
+    vigia = Vigia()  # sem a thread: verificar() é chamado direto
+    with vigia.vigiar("Serac4/Palletizer", 0.05, lambda: abortadas.append("Palletizer")):
+        with vigia.vigiar("Serac4/Enchedora", 30, lambda: abortadas.append("Enchedora")):
+            time.sleep(0.1)
+            assert vigia.verificar() == 1
+            assert vigia.verificar() == 0                           # cada chamada é abortada uma vez
+    assert vigia.verificar() == 0                                   # blocos encerrados saem da vigilância
+    print(f"  Abortadas: {abortadas}, travamentos: {vigia.travamentos}")
+    assert abortadas == ["Palletizer"] and vigia.travamentos == 1
+
+    contagens, soma = METRICAS.histogramas["opcua_travamento_segundos"].series()[("Serac4/Palletizer",)]
+    assert sum(contagens) == 1 and soma >= 0.05
+
+    # Com a thread: o vigia age sozinho enquanto a chamada está presa
+    vigia = Vigia(intervalo_s=0.02).iniciar()
+    try:
+        with vigia.vigiar("Serac3/Palletizer", 0.05, lambda: abortadas.append("Serac3")):
+            time.sleep(0.2)
+    finally:
+        vigia.parar()
+    assert abortadas[-1] == "Serac3" and vigia.travamentos == 1
+
+    print("✅ Vigia OK")
+
+if __name__ == "__main__":
+    print("🧪 TESTE DO SUPERVISOR DE CONEXÕES")
+    print("=" * 40)
+
+    test_supervisor()
+    test_vigia()
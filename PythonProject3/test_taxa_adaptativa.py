@@ -0,0 +1,43 @@
+from taxa_adaptativa import TaxaAdaptativa
+
+def simular(taxa, valores, duracao, passo):
+    """Roda o agendamento em tempo simulado; valores(tag, t) dá o valor da tag no instante t"""
+    leituras = {tag: 0 for tag in taxa.tags}
+    t = 0.0
+    while t < duracao:
+        for tag in taxa.devidas(t):
+            taxa.registrar(tag, valores(tag, t), t)
+            leituras[tag] += 1
+        t += passo
+    return leituras
+
+def test_taxa_adaptativa():
+    """Testa a adaptação do período pela frequência de mudança e o orçamento de leituras/s"""
+    print("🔧 Testando polling adaptativo...")
+
+    # Contador muda a cada 0.2 s, setpoint nunca muda
+    valores = lambda tag, t: int(t / 0.2) if tag == "Contador" else 50.0
+    taxa = TaxaAdaptativa(["Contador", "Setpoint"], periodo_min_s=0.1, periodo_max_s=10, agora=0)
+    leituras = simular(taxa, valores, 60, 0.05)
+    print(f"  Leituras em 60 s: {leituras}")
+    print(f"  {taxa.resumo()}")
+    assert taxa.periodo_efetivo("Contador") <= 0.4
+    assert taxa.periodo_efetivo("Setpoint") == 10
+    assert leituras["Contador"] > 10 * leituras["Setpoint"]
+
+    # Orçamento: 100 tags mudando sempre com período mínimo de 0.1 s pediriam 1000 leituras/s
+    tags = [f"Tag_{i}" for i in range(100)]
+    taxa = TaxaAdaptativa(tags, periodo_min_s=0.1, periodo_max_s=10, orcamento_leituras_s=200, agora=0)
+    leituras = simular(taxa, lambda tag, t: t, 20, 0.05)
+    por_segundo = sum(leituras.values()) / 20
+    print(f"  Com orçamento de 200/s: {por_segundo:.0f} leituras/s ({taxa.resumo()})")
+    assert taxa.leituras_por_segundo() <= 200.01
+    assert 150 <= por_segundo <= 230
+
+    print("✅ Polling adaptativo OK")
+
+if __name__ == "__main__":
+    print("🧪 TESTE DO POLLING ADAPTATIVO")
+    print("=" * 40)
+
+    test_taxa_adaptativa()